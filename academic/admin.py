@@ -5,6 +5,8 @@ from .models import (
     StudentEnrollment, SemesterEnrollment, TeacherSubjectAssignment, Assignment, AssignmentSubmission
 )
 from accounts.models import StudentProfile, TeacherProfile
+from accounts.counters import recount_enrollments
+from .roster import bump_roster_version
 
 # Inline admin classes for Course management
 class SubjectInline(admin.TabularInline):
@@ -211,6 +213,12 @@ class CourseAdmin(admin.ModelAdmin):
                     class_enrolled=default_class,
                     defaults={'is_active': True}
                 )
+            
+            # The deactivation above sends no signals, so recount the course's enrollments
+            # and drop its cached rosters here
+            class_ids = list(Class.objects.filter(course=obj).values_list('id', flat=True))
+            recount_enrollments(class_ids)
+            bump_roster_version(*class_ids)
         
         # Handle teacher assignments
         if 'teachers' in form.cleaned_data:
@@ -375,11 +383,17 @@ class StudentEnrollmentAdmin(admin.ModelAdmin):
     
     def activate_enrollment(self, request, queryset):
         queryset.update(is_active=True)
+        class_ids = list(queryset.values_list('class_enrolled_id', flat=True))
+        recount_enrollments(class_ids)
+        bump_roster_version(*class_ids)
         self.message_user(request, f"✅ {queryset.count()} enrollments activated.")
     activate_enrollment.short_description = "✅ Activate selected enrollments"
     
     def deactivate_enrollment(self, request, queryset):
         queryset.update(is_active=False)
+        class_ids = list(queryset.values_list('class_enrolled_id', flat=True))
+        recount_enrollments(class_ids)
+        bump_roster_version(*class_ids)
         self.message_user(request, f"❌ {queryset.count()} enrollments deactivated.")
     deactivate_enrollment.short_description = "❌ Deactivate selected enrollments"
     
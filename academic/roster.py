@@ -0,0 +1,86 @@
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from .models import StudentEnrollment
+
+ROSTER_FIELDS = [
+    'student_id', 'student__student_id', 'student__user__first_name', 'student__user__last_name',
+    'student__user__username', 'student__user__email', 'student__user_id', 'student__user__profile_picture',
+    'id', 'enrollment_date',
+]
+
+
+class RosterEntry(namedtuple('RosterEntry', [
+    'id', 'student_id', 'name', 'email', 'user_id', 'picture', 'enrollment_id', 'enrollment_date',
+])):
+    """
+    One active student of a class. ``id`` is the StudentProfile id, ``student_id``
+    the student's roll number and ``name`` the full name (username when empty).
+    """
+    __slots__ = ()
+
+    @property
+    def picture_url(self):
+        return default_storage.url(self.picture) if self.picture else ''
+
+
+def _version_key(class_id):
+    return f'roster:version:{class_id}'
+
+
+def _new_version():
+    # Never restart from 1: if the version key is evicted, old roster keys must not match again
+    return int(time.time() * 1000)
+
+
+def get_class_roster(class_id):
+    """
+    Active students of a class ordered by name, as a list of RosterEntry.
+
+    Cached under the class's current version, so a warm roster costs no queries.
+    The version is bumped by academic.signals whenever an enrollment or a
+    student's name changes. ``ROSTER_CACHE_TIMEOUT`` bounds how long another
+    process can serve a roster when the cache is not shared between processes.
+    """
+    version = cache.get(_version_key(class_id))
+    if version is None:
+        cache.add(_version_key(class_id), _new_version(), None)
+        version = cache.get(_version_key(class_id))
+
+    key = f'roster:{class_id}:{version}'
+    roster = cache.get(key)
+    if roster is None:
+        rows = StudentEnrollment.objects.filter(
+            class_enrolled_id=class_id,
+            is_active=True
+        ).order_by('student__user__first_name', 'student__user__last_name', 'student_id').values_list(*ROSTER_FIELDS)
+
+        roster = [
+            RosterEntry(
+                id=student_pk,
+                student_id=roll_number,
+                name=f"{first_name} {last_name}".strip() or username,
+                email=email,
+                user_id=user_id,
+                picture=picture or '',
+                enrollment_id=enrollment_id,
+                enrollment_date=enrollment_date,
+            )
+            for (student_pk, roll_number, first_name, last_name, username, email, user_id, picture,
+                 enrollment_id, enrollment_date) in rows
+        ]
+        cache.set(key, roster, getattr(settings, 'ROSTER_CACHE_TIMEOUT', 300))
+    return roster
+
+
+def bump_roster_version(*class_ids):
+    """Make the next get_class_roster call for these classes reload from the database"""
+    for class_id in set(class_ids):
+        if class_id is None:
+            continue
+        try:
+            cache.incr(_version_key(class_id))
+        except ValueError:
+            cache.set(_version_key(class_id), _new_version(), None)
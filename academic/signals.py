@@ -0,0 +1,54 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from accounts.models import User, StudentProfile
+from .models import StudentEnrollment
+from .roster import bump_roster_version
+
+# User fields shown in class rosters
+ROSTER_USER_FIELDS = {'first_name', 'last_name', 'username', 'email', 'profile_picture'}
+
+
+@receiver(pre_save, sender=StudentEnrollment)
+def remember_enrollment_class(sender, instance, **kwargs):
+    """
+    Keep the class an existing enrollment had before this save, in case it moves
+    """
+    if instance.pk:
+        instance._roster_previous_class_id = StudentEnrollment.objects.filter(
+            pk=instance.pk
+        ).values_list('class_enrolled_id', flat=True).first()
+
+
+@receiver(post_save, sender=StudentEnrollment)
+@receiver(post_delete, sender=StudentEnrollment)
+def bump_roster_on_enrollment_change(sender, instance, **kwargs):
+    """
+    Invalidate the cached roster of the enrollment's class (and its old class after a move)
+    """
+    bump_roster_version(instance.class_enrolled_id, getattr(instance, '_roster_previous_class_id', None))
+
+
+@receiver(post_save, sender=User)
+def bump_roster_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalidate the rosters of a student's classes when their name or contact details change
+    """
+    if instance.user_type != 'student':
+        return
+    if update_fields is not None and not ROSTER_USER_FIELDS.intersection(update_fields):
+        return  # e.g. last_login on every sign in
+    bump_roster_version(*StudentEnrollment.objects.filter(
+        student__user=instance
+    ).values_list('class_enrolled_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=StudentProfile)
+def bump_roster_on_student_change(sender, instance, created, **kwargs):
+    """
+    Invalidate the rosters of a student's classes when the student ID changes
+    """
+    if created:
+        return
+    bump_roster_version(*StudentEnrollment.objects.filter(
+        student=instance
+    ).values_list('class_enrolled_id', flat=True).distinct())
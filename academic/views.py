@@ -15,6 +15,8 @@ from .forms import (
     AssignmentSubmissionForm, ClassFilterForm
 )
 from accounts.models import StudentProfile, TeacherProfile
+from .roster import get_class_roster
+from accounts.counters import get_counters
 
 def is_admin(user):
     return user.is_authenticated and user.user_type == 'admin'
@@ -731,26 +733,21 @@ def teacher_class_students(request, class_id):
         return redirect('accounts:dashboard')
     
     # Get students enrolled in this class
-    enrollments = StudentEnrollment.objects.filter(
-        class_enrolled=class_obj,
-        is_active=True
-    ).select_related('student__user').order_by('student__user__first_name', 'student__user__last_name')
+    roster = get_class_roster(class_obj.id)
     
-    # Get attendance summary for each student
-    from attendance.models import AttendanceRecord
+    # Get attendance summary for each student from the monthly rollups
+    from attendance.summary import attendance_counts, EMPTY_COUNTS
+    student_counts = attendance_counts(student__in=[student.id for student in roster])
     student_data = []
     
-    for enrollment in enrollments:
-        student = enrollment.student
-        
+    for student in roster:
         # Calculate attendance statistics
-        attendance_records = AttendanceRecord.objects.filter(student=student)
-        total_sessions = attendance_records.count()
-        present_sessions = attendance_records.filter(status__in=['present', 'late']).count()
+        counts = student_counts.get(student.id, EMPTY_COUNTS)
+        total_sessions = counts['total']
+        present_sessions = counts['present'] + counts['late']
         attendance_percentage = (present_sessions / total_sessions * 100) if total_sessions > 0 else 0
         
         student_data.append({
-            'enrollment': enrollment,
             'student': student,
             'total_sessions': total_sessions,
             'present_sessions': present_sessions,
@@ -771,21 +768,20 @@ def student_enrollment_report(request):
         messages.error(request, 'Access denied.')
         return redirect('accounts:dashboard')
     
+    # Totals come from the signal-maintained counters instead of a COUNT per course and class
+    counters = get_counters(
+        'courses', 'classes', 'course_classes', 'enrollments', 'class_enrollments', 'course_enrollments'
+    )
+    
     # Get course-wise enrollment data
     course_enrollments = []
     courses = Course.objects.all()
     
     for course in courses:
-        classes = Class.objects.filter(course=course)
-        student_count = StudentEnrollment.objects.filter(
-            class_enrolled__course=course,
-            is_active=True
-        ).count()
-        
         course_enrollments.append({
             'course': course,
-            'class_count': classes.count(),
-            'student_count': student_count
+            'class_count': counters['course_classes'].get(str(course.id), 0),
+            'student_count': counters['course_enrollments'].get(str(course.id), 0)
         })
     
     # Get class-wise enrollment data
@@ -793,21 +789,16 @@ def student_enrollment_report(request):
     classes = Class.objects.select_related('course', 'class_teacher__user')
     
     for class_obj in classes:
-        student_count = StudentEnrollment.objects.filter(
-            class_enrolled=class_obj,
-            is_active=True
-        ).count()
-        
         class_enrollments.append({
             'class': class_obj,
-            'student_count': student_count
+            'student_count': counters['class_enrollments'].get(str(class_obj.id), 0)
         })
     
     # Calculate summary statistics
-    total_students = StudentEnrollment.objects.filter(is_active=True).count()
-    active_enrollments = StudentEnrollment.objects.filter(is_active=True).count()
-    total_courses = Course.objects.count()
-    total_classes = Class.objects.count()
+    total_students = counters['enrollments'].get('', 0)
+    active_enrollments = total_students
+    total_courses = counters['courses'].get('', 0)
+    total_classes = counters['classes'].get('', 0)
     
     context = {
         'course_enrollments': course_enrollments,
@@ -1626,18 +1617,16 @@ def assignment_submissions(request, assignment_id):
     ).select_related('student__user').order_by('-submitted_at')
     
     # Get students who haven't submitted
-    enrolled_students = assignment.class_assigned.studentenrollment_set.filter(
-        is_active=True
-    ).select_related('student__user')
+    roster = get_class_roster(assignment.class_assigned_id)
     
-    submitted_student_ids = submissions.values_list('student_id', flat=True)
-    pending_students = enrolled_students.exclude(student_id__in=submitted_student_ids)
+    submitted_student_ids = set(submissions.values_list('student_id', flat=True))
+    pending_students = [student for student in roster if student.id not in submitted_student_ids]
     
     context = {
         'assignment': assignment,
         'submissions': submissions,
         'pending_students': pending_students,
-        'total_students': enrolled_students.count(),
+        'total_students': len(roster),
         'submitted_count': submissions.count(),
     }
     
@@ -0,0 +1,102 @@
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .dashboard_cache import WIDGET_SCOPES, scope_versions
+
+# Polled JSON endpoints answered with ETags
+ETAG_ENDPOINTS = ['user_profile', 'teacher_dashboard_stats', 'unread_count']
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def unread_scope(user_id):
+    return f'unread:{user_id}'
+
+
+def _metric_key(endpoint, outcome):
+    return f'api:etag:{endpoint}:{outcome}'
+
+
+def _count(endpoint, outcome):
+    key = _metric_key(endpoint, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def _etag(request, endpoint, scopes, daily=False):
+    """
+    ETag built from the user, the versions of the scopes the payload depends on
+    and a time bucket of ``API_ETAG_MAX_AGE`` seconds, which bounds how long a
+    version bump another process's local cache never saw can go unnoticed.
+    """
+    max_age = getattr(settings, 'API_ETAG_MAX_AGE', 300)
+    stamp = f'{endpoint}:{request.user.pk}:{scope_versions(scopes)}:{int(time.time() // max_age)}'
+    if daily:
+        stamp += f':{timezone.localdate():%Y%m%d}'
+    return '"%s"' % hashlib.md5(stamp.encode()).hexdigest()
+
+
+def user_profile_etag(request):
+    return _etag(request, 'user_profile', [profile_scope(request.user.pk)])
+
+
+def teacher_stats_etag(request):
+    if request.user.user_type != 'teacher':
+        return None  # the view answers 403
+    # Same scopes as the cached dashboard widget; "recent" counts move with the date
+    return _etag(request, 'teacher_dashboard_stats', WIDGET_SCOPES['teacher_stats'], daily=True)
+
+
+def unread_count_etag(request):
+    return _etag(request, 'unread_count', [unread_scope(request.user.pk)])
+
+
+def conditional_api(endpoint, etag_func):
+    """
+    Answer GET requests whose If-None-Match matches ``etag_func`` with a 304
+    before the view runs, and count 304s and full responses per endpoint.
+    Use below login_required, as the ETag is per user.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                _count(endpoint, 'not_modified' if response.status_code == 304 else 'full')
+                # Per-user data: no shared caches, and clients revalidate on every poll
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def get_etag_stats():
+    """304s, full responses and the 304 rate per endpoint since the counters were last reset"""
+    keys = [_metric_key(endpoint, outcome) for endpoint in ETAG_ENDPOINTS for outcome in ('not_modified', 'full')]
+    counts = cache.get_many(keys)
+    stats = {}
+    for endpoint in ETAG_ENDPOINTS:
+        not_modified = counts.get(_metric_key(endpoint, 'not_modified'), 0)
+        full = counts.get(_metric_key(endpoint, 'full'), 0)
+        stats[endpoint] = {
+            'not_modified': not_modified,
+            'full': full,
+            'not_modified_rate': round(not_modified / (not_modified + full) * 100, 1) if not_modified + full else 0,
+        }
+    return stats
+
+
+def reset_etag_stats():
+    cache.delete_many([_metric_key(endpoint, outcome) for endpoint in ETAG_ENDPOINTS for outcome in ('not_modified', 'full')])
@@ -3,15 +3,18 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.db import models
 from django.utils import timezone as django_timezone
 from .models import TeacherProfile, User
-from academic.models import TeacherSubjectAssignment, Assignment, StudentEnrollment, AssignmentSubmission
-from attendance.models import AttendanceSession, AttendanceRecord
+from .teacher_stats import build_teacher_stats
+from .dashboard_cache import get_fragment_stats, reset_fragment_stats
+from .api_etags import (
+    conditional_api, user_profile_etag, teacher_stats_etag, get_etag_stats, reset_etag_stats
+)
 import json
 
 @login_required
 @require_http_methods(["GET"])
+@conditional_api('teacher_dashboard_stats', teacher_stats_etag)
 def teacher_dashboard_stats(request):
     """API endpoint for real-time teacher dashboard statistics"""
     
@@ -20,163 +23,16 @@ def teacher_dashboard_stats(request):
     
     try:
         teacher_profile = request.user.teacher_profile
-        teacher_assignments = TeacherSubjectAssignment.objects.filter(
-            teacher=teacher_profile
-        ).select_related('subject', 'class_assigned')
-        
-        today = django_timezone.now()
-        today_date = today.date()
-        
-        # Calculate real-time statistics
-        stats = {
-            'last_updated': today.isoformat(),
-            'assignment_stats': [],
-            'passing_stats': [],
-            'attendance_stats': [],
-            'syllabus_progress': [],
-            'summary': {
-                'total_students': 0,
-                'total_subjects': teacher_assignments.count(),
-                'pending_assignments': Assignment.objects.filter(
-                    teacher=teacher_profile,
-                    is_active=True
-                ).count(),
-                'total_assignments_created': Assignment.objects.filter(
-                    teacher=teacher_profile
-                ).count(),
-                'total_submissions_received': AssignmentSubmission.objects.filter(
-                    assignment__teacher=teacher_profile
-                ).count(),
-            }
-        }
-        
-        # Calculate detailed statistics for each class
-        for assignment in teacher_assignments:
-            class_obj = assignment.class_assigned
-            
-            # Count students
-            total_students_in_class = StudentEnrollment.objects.filter(
-                class_enrolled=class_obj,
-                is_active=True
-            ).count()
-            stats['summary']['total_students'] += total_students_in_class
-            
-            # Assignment submissions
-            class_assignments = Assignment.objects.filter(
-                teacher=teacher_profile,
-                class_assigned=class_obj,
-                is_active=True
-            )
-            
-            total_submissions = 0
-            total_possible_submissions = 0
-            
-            for assign in class_assignments:
-                submissions_count = assign.assignmentsubmission_set.count()
-                total_submissions += submissions_count
-                total_possible_submissions += total_students_in_class
-            
-            # If no assignments exist, create sample data
-            if class_assignments.count() == 0:
-                total_possible_submissions = total_students_in_class * 2
-                total_submissions = 0
-            
-            submission_rate = (total_submissions / total_possible_submissions * 100) if total_possible_submissions > 0 else 0
-            
-            # Create shorter class name
-            subject_short = assignment.subject.name[:8] + "..." if len(assignment.subject.name) > 8 else assignment.subject.name
-            class_display_name = f"{subject_short}-{class_obj.section}"
-            
-            stats['assignment_stats'].append({
-                'class_name': class_display_name,
-                'total_assignments': class_assignments.count(),
-                'total_submissions': total_submissions,
-                'not_submitted': total_possible_submissions - total_submissions,
-                'submission_rate': round(submission_rate, 1),
-                'total_students': total_students_in_class
-            })
-            
-            # Passing rate
-            graded_submissions = AssignmentSubmission.objects.filter(
-                assignment__teacher=teacher_profile,
-                assignment__class_assigned=class_obj,
-                marks_obtained__isnull=False
-            )
-            
-            total_graded = graded_submissions.count()
-            passing_submissions = graded_submissions.filter(
-                marks_obtained__gte=models.F('assignment__max_marks') * 0.6
-            ).count()
-            
-            failing_submissions = total_graded - passing_submissions
-            passing_rate = (passing_submissions / total_graded * 100) if total_graded > 0 else 0
-            
-            subject_short = assignment.subject.name[:8] + "..." if len(assignment.subject.name) > 8 else assignment.subject.name
-            class_display_name = f"{subject_short}-{class_obj.section}"
-            
-            stats['passing_stats'].append({
-                'class_name': class_display_name,
-                'total_graded': total_graded,
-                'passed': passing_submissions,
-                'failed': failing_submissions,
-                'passing_rate': round(passing_rate, 1)
-            })
-            
-            # Attendance
-            sessions = AttendanceSession.objects.filter(
-                teacher_assignment=assignment
-            )
-            
-            total_records = AttendanceRecord.objects.filter(
-                session__in=sessions
-            ).count()
-            
-            present_records = AttendanceRecord.objects.filter(
-                session__in=sessions,
-                status__in=['present', 'late']
-            ).count()
-            
-            attendance_rate = (present_records / total_records * 100) if total_records > 0 else 0
-            
-            subject_short = assignment.subject.name[:8] + "..." if len(assignment.subject.name) > 8 else assignment.subject.name
-            class_display_name = f"{subject_short}-{class_obj.section}"
-            
-            stats['attendance_stats'].append({
-                'class_name': class_display_name,
-                'total_sessions': sessions.count(),
-                'total_records': total_records,
-                'present_records': present_records,
-                'attendance_rate': round(attendance_rate, 1)
-            })
-            
-            # Syllabus progress
-            total_sessions = sessions.count()
-            completed_sessions = sessions.filter(
-                is_completed=True,
-                topic_covered__isnull=False
-            ).exclude(topic_covered='').count()
-            
-            progress_percentage = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
-            
-            stats['syllabus_progress'].append({
-                'subject_name': assignment.subject.name,
-                'class_name': class_obj.section,
-                'total_sessions': total_sessions,
-                'completed_sessions': completed_sessions,
-                'progress_percentage': round(progress_percentage, 1)
-            })
-        
-        # Calculate average grade
-        avg_grade = AssignmentSubmission.objects.filter(
-            assignment__teacher=teacher_profile,
-            marks_obtained__isnull=False
-        ).aggregate(
-            avg_marks=models.Avg('marks_obtained')
-        )['avg_marks'] or 0
-        
-        stats['summary']['avg_grade'] = round(avg_grade, 1)
-        
-        return JsonResponse(stats)
+        stats = build_teacher_stats(teacher_profile)
+
+        return JsonResponse({
+            'last_updated': django_timezone.now().isoformat(),
+            'assignment_stats': stats['assignment_stats'],
+            'passing_stats': stats['passing_stats'],
+            'attendance_stats': stats['attendance_stats'],
+            'syllabus_progress': stats['syllabus_progress'],
+            'summary': stats['summary'],
+        })
         
     except TeacherProfile.DoesNotExist:
         return JsonResponse({'error': 'Teacher profile not found'}, status=404)
@@ -184,6 +40,29 @@ def teacher_dashboard_stats(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(["GET", "POST"])
+def dashboard_cache_stats(request):
+    """API endpoint for dashboard widget cache hits and misses and API 304s (POST resets the counters)"""
+    
+    if request.user.user_type != 'admin':
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    if request.method == 'POST':
+        reset_fragment_stats()
+        reset_etag_stats()
+    
+    widgets = get_fragment_stats()
+    hits = sum(widget['hits'] for widget in widgets.values())
+    misses = sum(widget['misses'] for widget in widgets.values())
+    return JsonResponse({
+        'widgets': widgets,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses) * 100, 1) if hits + misses else 0,
+        'etags': get_etag_stats(),
+    })
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_login(request):
@@ -298,6 +177,7 @@ def api_logout(request):
 
 @login_required
 @require_http_methods(["GET"])
+@conditional_api('user_profile', user_profile_etag)
 def api_user_profile(request):
     """
     API endpoint to get current user profile information
@@ -339,22 +219,22 @@ def api_user_profile(request):
             profile = user.student_profile
             profile_data = {
                 'student_id': profile.student_id,
-                'date_of_birth': profile.date_of_birth.isoformat() if profile.date_of_birth else None,
-                'phone_number': profile.phone_number,
-                'address': profile.address
+                'date_of_birth': user.date_of_birth.isoformat() if user.date_of_birth else None,
+                'phone_number': user.phone_number,
+                'address': user.address
             }
         elif user.user_type == 'teacher' and hasattr(user, 'teacher_profile'):
             profile = user.teacher_profile
             profile_data = {
                 'employee_id': profile.employee_id,
-                'phone_number': profile.phone_number,
+                'phone_number': user.phone_number,
                 'qualification': profile.qualification,
                 'specialization': profile.specialization
             }
         elif user.user_type == 'parent' and hasattr(user, 'parent_profile'):
             profile = user.parent_profile
             profile_data = {
-                'phone_number': profile.phone_number,
+                'phone_number': user.phone_number,
                 'occupation': profile.occupation,
                 'children_count': profile.children.count()
             }
@@ -0,0 +1,156 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from .models import InstitutionCounter, User
+
+ENROLLMENT_KINDS = ['enrollments', 'class_enrollments', 'course_enrollments', 'department_enrollments']
+
+
+def _class_keys(class_id, course_id, department_id):
+    """The enrollment counters one active enrollment in this class adds to"""
+    keys = [('enrollments', ''), ('class_enrollments', str(class_id))]
+    if course_id is not None:
+        keys.append(('course_enrollments', str(course_id)))
+    if department_id is not None:
+        keys.append(('department_enrollments', str(department_id)))
+    return keys
+
+
+def class_placement(class_id):
+    """(course id, department id) of a class, (None, None) when it no longer exists"""
+    from academic.models import Class
+    row = Class.objects.filter(pk=class_id).values_list('course_id', 'course__department_id').first()
+    return row or (None, None)
+
+
+def adjust_counters(changes):
+    """
+    Add ``changes`` ({(kind, key): delta}) to the counters in one transaction:
+    a single insert for counters seen for the first time, then one UPDATE per
+    counter (value = value + delta), so concurrent writers never lose a change.
+    """
+    changes = {counter: delta for counter, delta in changes.items() if delta}
+    if not changes:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        InstitutionCounter.objects.bulk_create(
+            [InstitutionCounter(kind=kind, key=key) for kind, key in changes],
+            ignore_conflicts=True,
+        )
+        for (kind, key), delta in changes.items():
+            InstitutionCounter.objects.filter(kind=kind, key=key).update(value=F('value') + delta, updated_at=now)
+
+
+def enrollment_changes(class_id, delta, placement=None):
+    """Counter changes for ``delta`` active enrollments added to (or removed from) a class"""
+    course_id, department_id = placement or class_placement(class_id)
+    return {counter: delta for counter in _class_keys(class_id, course_id, department_id)}
+
+
+def get_counters(*kinds):
+    """
+    {kind: {key: value}} for the requested kinds, in one query. Totals are
+    under the empty key; counters never written read as missing (0).
+    """
+    counters = {kind: {} for kind in kinds}
+    for kind, key, value in InstitutionCounter.objects.filter(kind__in=kinds).values_list('kind', 'key', 'value'):
+        counters[kind][key] = value
+    return counters
+
+
+def expected_counters(class_ids=None):
+    """
+    Every counter's true value, counted from the tables with grouped queries.
+
+    With ``class_ids`` only the enrollment counters touched by those classes
+    are counted: the classes, their courses and departments, and the total.
+    """
+    from academic.models import Course, Class, StudentEnrollment
+
+    expected = Counter()
+    active = StudentEnrollment.objects.filter(is_active=True)
+    if class_ids is None:
+        for user_type, count in User.objects.values_list('user_type').annotate(count=Count('id')).order_by():
+            expected[('users', user_type)] = count
+        expected[('courses', '')] = Course.objects.count()
+        for course_id, count in Class.objects.values_list('course_id').annotate(count=Count('id')).order_by():
+            expected[('classes', '')] += count
+            expected[('course_classes', str(course_id))] = count
+        expected[('enrollments', '')] = active.count()
+        scoped = active
+    else:
+        placements = list(Class.objects.filter(pk__in=class_ids).values_list('course_id', 'course__department_id'))
+        course_ids = {course_id for course_id, _ in placements}
+        department_ids = {department_id for _, department_id in placements}
+        for class_id in class_ids:
+            expected[('class_enrollments', str(class_id))] = 0
+        for course_id in course_ids:
+            expected[('course_enrollments', str(course_id))] = 0
+        for department_id in department_ids:
+            expected[('department_enrollments', str(department_id))] = 0
+        expected[('enrollments', '')] = active.count()
+        scoped = active.filter(class_enrolled__course__department_id__in=department_ids)
+
+    for class_id, course_id, department_id, count in scoped.values_list(
+        'class_enrolled_id', 'class_enrolled__course_id', 'class_enrolled__course__department_id'
+    ).annotate(count=Count('id')).order_by():
+        if class_ids is None or class_id in class_ids:
+            expected[('class_enrollments', str(class_id))] += count
+        if class_ids is None or ('course_enrollments', str(course_id)) in expected:
+            expected[('course_enrollments', str(course_id))] += count
+        expected[('department_enrollments', str(department_id))] += count
+    return expected
+
+
+def reconcile_counters(class_ids=None, dry_run=False):
+    """
+    Compare the counters with expected_counters() and overwrite the ones that
+    drifted (unless ``dry_run``). Stale counters of deleted objects are removed.
+    Returns a list of (kind, key, stored, expected) for every counter fixed.
+    """
+    with transaction.atomic():
+        # Lock the stored counters first, so signal updates wait until the fixes are written
+        stored_rows = InstitutionCounter.objects.select_for_update()
+        if class_ids is not None:
+            stored_rows = stored_rows.filter(kind__in=ENROLLMENT_KINDS)
+        stored = {(kind, key): value for kind, key, value in stored_rows.values_list('kind', 'key', 'value')}
+        expected = expected_counters(class_ids)
+
+        drift = [
+            (kind, key, stored.get((kind, key)), value)
+            for (kind, key), value in sorted(expected.items())
+            if stored.get((kind, key)) != value
+        ]
+        if class_ids is None:
+            # Counters of deleted roles, courses or classes (zero rows are harmless and kept)
+            drift += [
+                (kind, key, value, None) for (kind, key), value in sorted(stored.items())
+                if (kind, key) not in expected and value != 0
+            ]
+
+        if drift and not dry_run:
+            now = timezone.now()
+            InstitutionCounter.objects.bulk_create(
+                [InstitutionCounter(kind=kind, key=key, value=value, updated_at=now)
+                 for kind, key, _, value in drift if value is not None],
+                update_conflicts=True,
+                unique_fields=['kind', 'key'],
+                update_fields=['value', 'updated_at'],
+            )
+            for kind, key, _, value in drift:
+                if value is None:
+                    InstitutionCounter.objects.filter(kind=kind, key=key).delete()
+    return drift
+
+
+def recount_enrollments(class_ids):
+    """
+    Recount the enrollment counters of these classes after a bulk write that
+    sends no signals, e.g. queryset.update(is_active=...)
+    """
+    class_ids = set(class_ids)
+    if class_ids:
+        reconcile_counters(class_ids=class_ids)
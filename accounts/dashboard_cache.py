@@ -0,0 +1,116 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# Version scopes, bumped by accounts.signals on writes to:
+#   attendance     AttendanceRecord and AttendanceSession (and every summary refresh after bulk writes)
+#   coursework     Assignment and AssignmentSubmission
+#   results        Examination and ExamResult
+#   fees           StudentFee, FeePayment and FeeWaiver
+#   notifications  Notification, its recipients and NotificationRead
+#   enrollment     StudentEnrollment and TeacherSubjectAssignment
+#   people         User and Course, for the admin dashboard
+# and per user, for the API ETags in accounts.api_etags:
+#   profile:<id>   the user and their student, teacher or parent profile
+#   unread:<id>    notifications sent to the user and the ones they read
+
+# Dashboard widgets and the scopes whose writes can change them
+WIDGET_SCOPES = {
+    'admin_totals': ('people',),
+    'student_fees': ('fees',),
+    'student_academics': ('enrollment', 'coursework', 'results'),
+    'student_attendance': ('attendance',),
+    'student_grades': ('results',),
+    'teacher_stats': ('enrollment', 'coursework', 'attendance', 'fees'),
+    'teacher_activity': ('coursework', 'attendance', 'results'),
+    'parent_children': ('enrollment', 'coursework', 'results', 'attendance', 'fees'),
+    'parent_notifications': ('notifications',),
+}
+
+_MISSING = object()
+
+
+def _version_key(scope):
+    return f'dashboard:version:{scope}'
+
+
+def _metric_key(widget, outcome):
+    return f'dashboard:metrics:{widget}:{outcome}'
+
+
+def _new_version():
+    # Never restart from 1: if a version key is evicted, old fragment keys must not match again
+    return int(time.time() * 1000)
+
+
+def scope_versions(scopes):
+    """The current versions of these scopes, joined into one key part"""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def _count(widget, outcome):
+    key = _metric_key(widget, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_fragment(user, widget, build):
+    """
+    The data of one dashboard widget for ``user``, computed by ``build()`` on a miss.
+
+    Fragments are cached per user and widget under the current versions of the
+    widget's scopes (and today's date, for the "upcoming" and "today" lists), so
+    a write to any of those scopes makes the next dashboard load recompute them.
+    ``DASHBOARD_CACHE_TIMEOUT`` bounds how long changes without a version bump
+    (a new subject, another process's local cache) can take to show.
+    """
+    scopes = WIDGET_SCOPES[widget]
+    key = f'dashboard:{user.pk}:{widget}:{timezone.localdate():%Y%m%d}:{scope_versions(scopes)}'
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(widget, 'hits')
+        return value
+
+    _count(widget, 'misses')
+    value = build()
+    cache.set(key, value, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return value
+
+
+def bump_dashboard_versions(*scopes):
+    """Make every cached dashboard widget that depends on these scopes recompute"""
+    for scope in set(scopes):
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), _new_version(), None)
+
+
+def get_fragment_stats():
+    """Hits, misses and hit rate per widget since the counters were last reset"""
+    keys = [_metric_key(widget, outcome) for widget in WIDGET_SCOPES for outcome in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    stats = {}
+    for widget in WIDGET_SCOPES:
+        hits = counts.get(_metric_key(widget, 'hits'), 0)
+        misses = counts.get(_metric_key(widget, 'misses'), 0)
+        stats[widget] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 1) if hits + misses else 0,
+        }
+    return stats
+
+
+def reset_fragment_stats():
+    cache.delete_many([_metric_key(widget, outcome) for widget in WIDGET_SCOPES for outcome in ('hits', 'misses')])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from accounts.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the institution counters (users per role, active enrollments, ...) and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the counters that drifted without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(dry_run=options['dry_run'])
+
+        for kind, key, stored, expected in drift:
+            name = f'{kind}[{key}]' if key else kind
+            self.stdout.write(f'  {name}: stored {stored if stored is not None else "-"}, counted {expected if expected is not None else "- (removed)"}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Completed! All counters match the tables.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {len(drift)} counters drifted, nothing fixed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Completed! Fixed {len(drift)} counters.'))
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:41
+
+from collections import Counter
+from django.db import migrations, models
+
+
+def count_existing_rows(apps, schema_editor):
+    """Start the counters from the current tables (manage.py reconcile_counters does the same later)"""
+    InstitutionCounter = apps.get_model('accounts', 'InstitutionCounter')
+    User = apps.get_model('accounts', 'User')
+    Course = apps.get_model('academic', 'Course')
+    Class = apps.get_model('academic', 'Class')
+    StudentEnrollment = apps.get_model('academic', 'StudentEnrollment')
+
+    counters = Counter()
+    for user_type, count in User.objects.values_list('user_type').annotate(count=models.Count('id')).order_by():
+        counters[('users', user_type)] = count
+    counters[('courses', '')] = Course.objects.count()
+    for course_id, count in Class.objects.values_list('course_id').annotate(count=models.Count('id')).order_by():
+        counters[('classes', '')] += count
+        counters[('course_classes', str(course_id))] = count
+    counters[('enrollments', '')] = 0
+    for class_id, course_id, department_id, count in StudentEnrollment.objects.filter(is_active=True).values_list(
+        'class_enrolled_id', 'class_enrolled__course_id', 'class_enrolled__course__department_id'
+    ).annotate(count=models.Count('id')).order_by():
+        counters[('enrollments', '')] += count
+        counters[('class_enrollments', str(class_id))] += count
+        counters[('course_enrollments', str(course_id))] += count
+        counters[('department_enrollments', str(department_id))] += count
+
+    InstitutionCounter.objects.bulk_create(
+        [InstitutionCounter(kind=kind, key=key, value=value) for (kind, key), value in counters.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_parentteachermessage'),
+        ('academic', '0002_semesterenrollment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstitutionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('users', 'Users per role'), ('courses', 'Courses'), ('classes', 'Classes'), ('course_classes', 'Classes per course'), ('enrollments', 'Active enrollments'), ('class_enrollments', 'Active enrollments per class'), ('course_enrollments', 'Active enrollments per course'), ('department_enrollments', 'Active enrollments per department')], max_length=30)),
+                ('key', models.CharField(blank=True, max_length=30)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
@@ -129,4 +129,32 @@ class ParentTeacherMessage(models.Model):
         if self.status == 'sent':
             self.status = 'read'
         
-        self.save()
\ No newline at end of file
+        self.save()
+
+class InstitutionCounter(models.Model):
+    """
+    A running total shown on admin pages (users per role, active enrollments per
+    class, course and department, ...), kept current by accounts.counters so the
+    pages read it instead of counting rows.
+    """
+    KIND_CHOICES = (
+        ('users', 'Users per role'),
+        ('courses', 'Courses'),
+        ('classes', 'Classes'),
+        ('course_classes', 'Classes per course'),
+        ('enrollments', 'Active enrollments'),
+        ('class_enrollments', 'Active enrollments per class'),
+        ('course_enrollments', 'Active enrollments per course'),
+        ('department_enrollments', 'Active enrollments per department'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    key = models.CharField(max_length=30, blank=True)  # role or object id, empty for totals
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'key']
+
+    def __str__(self):
+        return f"{self.kind}[{self.key}] = {self.value}" if self.key else f"{self.kind} = {self.value}"
@@ -0,0 +1,189 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from academic.models import AcademicYear, StudentEnrollment, Subject, Assignment
+from attendance.summary import attendance_counts, EMPTY_COUNTS
+from examination.models import Examination, ExamResult
+from fees.models import StudentFeeBalance
+
+# Grade point scale (same as student dashboard)
+GRADE_POINTS = {
+    'A+': 4.0, 'A': 3.7, 'B+': 3.3, 'B': 3.0,
+    'C+': 2.3, 'C': 2.0, 'D': 1.0, 'F': 0.0
+}
+
+UPCOMING_DAYS = 30
+UPCOMING_PER_CHILD = 5
+
+
+def _current_enrollments(child_ids):
+    """
+    The enrollment get_current_enrollment() would return for each child: the
+    first active one in the current academic year, else the latest active one.
+    """
+    current_year_id = AcademicYear.objects.filter(is_current=True).values_list('id', flat=True).first()
+    enrollments = {}
+    for enrollment in StudentEnrollment.objects.filter(
+        student_id__in=child_ids,
+        is_active=True
+    ).select_related('class_enrolled__course').order_by('id'):
+        chosen = enrollments.get(enrollment.student_id)
+        in_current_year = current_year_id is not None and enrollment.class_enrolled.academic_year_id == current_year_id
+        if chosen is None:
+            enrollments[enrollment.student_id] = enrollment
+        elif current_year_id is not None and chosen.class_enrolled.academic_year_id == current_year_id:
+            continue
+        elif in_current_year or enrollment.enrollment_date > chosen.enrollment_date:
+            enrollments[enrollment.student_id] = enrollment
+    return enrollments
+
+
+def _color(days_until, danger, warning, default):
+    if days_until <= danger:
+        return 'danger'
+    if days_until <= warning:
+        return 'warning'
+    return default
+
+
+def build_children_data(parent_profile):
+    """
+    Dashboard data for every child of a parent, in a fixed number of queries.
+
+    Enrollments, attendance totals, fee balances, subjects, exam results,
+    upcoming exams and assignments are each read once for all children and
+    grouped per child in memory. Returns ``(children, children_data, upcoming_events)``.
+    """
+    today = timezone.localdate()
+    children = list(parent_profile.children.select_related('user'))
+    child_ids = [child.id for child in children]
+    if not children:
+        return children, [], []
+
+    enrollments = _current_enrollments(child_ids)
+    children_attendance = attendance_counts(student_id__in=child_ids)
+
+    fee_balances = StudentFeeBalance.objects.in_bulk(child_ids)
+
+    # Subjects of every enrolled class's course, year and semester
+    subject_keys = {
+        (e.class_enrolled.course_id, e.class_enrolled.year, e.class_enrolled.semester)
+        for e in enrollments.values()
+    }
+    subjects_by_key = defaultdict(list)
+    if subject_keys:
+        subject_filter = Q()
+        for course_id, year, semester in subject_keys:
+            subject_filter |= Q(course_id=course_id, year=year, semester=semester)
+        for subject in Subject.objects.filter(subject_filter).order_by('id'):
+            subjects_by_key[(subject.course_id, subject.year, subject.semester)].append(subject)
+    subject_ids = {subject.id for subjects in subjects_by_key.values() for subject in subjects}
+
+    # Results per child and subject, latest exam first
+    results = defaultdict(lambda: defaultdict(list))
+    for result in ExamResult.objects.filter(
+        student_id__in=child_ids,
+        examination__subject_id__in=subject_ids
+    ).select_related('examination').order_by('-examination__exam_date', 'id'):
+        results[result.student_id][result.examination.subject_id].append(result)
+
+    upcoming_exams = defaultdict(list)
+    for exam in Examination.objects.filter(
+        subject_id__in=subject_ids,
+        exam_date__gte=today,
+        exam_date__lte=today + timedelta(days=UPCOMING_DAYS)
+    ).select_related('exam_type', 'subject').order_by('exam_date', 'id'):
+        upcoming_exams[exam.subject_id].append(exam)
+
+    upcoming_assignments = defaultdict(list)
+    for assignment in Assignment.objects.filter(
+        class_assigned_id__in={e.class_enrolled_id for e in enrollments.values()},
+        due_date__date__gte=today,
+        due_date__date__lte=today + timedelta(days=UPCOMING_DAYS),
+        is_active=True
+    ).select_related('subject').order_by('due_date', 'id'):
+        upcoming_assignments[assignment.class_assigned_id].append(assignment)
+
+    children_data = []
+    upcoming_events = []
+    for child in children:
+        enrollment = enrollments.get(child.id)
+        child_name = child.user.get_full_name()
+
+        counts = children_attendance.get(child.id, EMPTY_COUNTS)
+        total_sessions = counts['total']
+        present_sessions = counts['present'] + counts['late']
+        attendance_percentage = (present_sessions / total_sessions * 100) if total_sessions > 0 else 0
+
+        fee_balance = fee_balances.get(child.id)
+
+        subjects_with_grades = []
+        gpa = 0.0
+        if enrollment:
+            class_obj = enrollment.class_enrolled
+            subjects = subjects_by_key[(class_obj.course_id, class_obj.year, class_obj.semester)]
+            child_results = results[child.id]
+
+            weighted_points_sum = 0
+            total_credits = 0
+            for subject in subjects:
+                subject_results = child_results.get(subject.id, [])
+                if subject_results:
+                    latest = subject_results[0]
+                    total_marks = latest.examination.total_marks
+                    percentage = (float(latest.marks_obtained) / total_marks * 100) if total_marks > 0 else 0
+                    subjects_with_grades.append({
+                        'name': subject.name,
+                        'grade': latest.grade,
+                        'percentage': round(percentage, 1)
+                    })
+                else:
+                    subjects_with_grades.append({'name': subject.name, 'grade': None, 'percentage': 0})
+
+                # Weighted GPA over every result (based on exam total marks)
+                for result in subject_results:
+                    weighted_points_sum += GRADE_POINTS.get(result.grade, 0.0) * result.examination.total_marks
+                    total_credits += result.examination.total_marks
+            gpa = round(weighted_points_sum / total_credits, 2) if total_credits > 0 else 0.0
+
+            exams = sorted(
+                (exam for subject in subjects for exam in upcoming_exams[subject.id]),
+                key=lambda exam: (exam.exam_date, exam.id)
+            )[:UPCOMING_PER_CHILD]
+            for exam in exams:
+                upcoming_events.append({
+                    'title': f"{exam.exam_type.name} - {exam.subject.name}",
+                    'description': f"{child_name}'s exam",
+                    'date': exam.exam_date,
+                    'child_name': child_name,
+                    'color_class': _color((exam.exam_date - today).days, 3, 7, 'info')
+                })
+
+            for assignment in upcoming_assignments[class_obj.id][:UPCOMING_PER_CHILD]:
+                due_date = timezone.localtime(assignment.due_date).date()
+                upcoming_events.append({
+                    'title': f"Assignment: {assignment.title}",
+                    'description': f"{child_name} - {assignment.subject.name}",
+                    'date': due_date,
+                    'child_name': child_name,
+                    'color_class': _color((due_date - today).days, 2, 5, 'primary')
+                })
+
+        children_data.append({
+            'profile': child,
+            'user': child.user,
+            'enrollment': enrollment,
+            'attendance_percentage': round(attendance_percentage, 2),
+            'gpa': round(gpa, 2),
+            'total_sessions': total_sessions,
+            'present_sessions': present_sessions,
+            'absent_sessions': total_sessions - present_sessions,
+            'subjects': subjects_with_grades,
+            'has_unpaid_fees': fee_balance is not None,
+            'unpaid_fee_count': fee_balance.unpaid_fee_count if fee_balance else 0,
+            'total_unpaid_amount': fee_balance.outstanding_amount if fee_balance else 0
+        })
+
+    upcoming_events.sort(key=lambda event: event['date'])
+    return children, children_data, upcoming_events
@@ -0,0 +1,270 @@
+from collections import Counter
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from academic.models import Course, Class, StudentEnrollment, TeacherSubjectAssignment, Assignment, AssignmentSubmission
+from attendance.models import AttendanceRecord, AttendanceSession
+from examination.models import Examination, ExamResult
+from fees.models import StudentFee, FeePayment, FeeWaiver
+from notifications.models import Notification, NotificationRead
+from .api_etags import profile_scope, unread_scope
+from .counters import adjust_counters, enrollment_changes
+from .dashboard_cache import bump_dashboard_versions
+from .models import User, StudentProfile, TeacherProfile, ParentProfile
+
+# User fields shown on the admin dashboard
+DASHBOARD_USER_FIELDS = {'first_name', 'last_name', 'username', 'user_type', 'date_joined'}
+
+# User fields returned by the profile API
+PROFILE_USER_FIELDS = DASHBOARD_USER_FIELDS | {'email', 'phone_number', 'address', 'date_of_birth'}
+
+# Models whose writes change a dashboard scope
+SCOPE_SENDERS = {
+    'attendance': [AttendanceRecord, AttendanceSession],
+    'coursework': [Assignment, AssignmentSubmission],
+    'results': [Examination, ExamResult],
+    'fees': [StudentFee, FeePayment, FeeWaiver],
+    'notifications': [Notification, NotificationRead],
+    'enrollment': [StudentEnrollment, TeacherSubjectAssignment],
+    'people': [Course],
+}
+
+SENDER_SCOPES = {sender: scope for scope, senders in SCOPE_SENDERS.items() for sender in senders}
+
+
+def bump_dashboard_on_write(sender, **kwargs):
+    """
+    Invalidate the cached dashboard widgets that show data of the written model
+    """
+    bump_dashboard_versions(SENDER_SCOPES[sender])
+
+
+for model in SENDER_SCOPES:
+    post_save.connect(bump_dashboard_on_write, sender=model, dispatch_uid=f'dashboard_cache_save_{model.__name__}')
+    post_delete.connect(bump_dashboard_on_write, sender=model, dispatch_uid=f'dashboard_cache_delete_{model.__name__}')
+
+
+@receiver(m2m_changed, sender=Notification.recipients.through)
+def bump_dashboard_on_recipients_change(sender, action, **kwargs):
+    """
+    Invalidate cached notification widgets when recipients are added to or removed from a notification
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_dashboard_versions('notifications')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_dashboard_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalidate the admin dashboard totals when a user is added, removed or renamed
+    """
+    if update_fields is not None and not DASHBOARD_USER_FIELDS.intersection(update_fields):
+        return  # e.g. last_login on every sign in
+    bump_dashboard_versions('people')
+
+
+@receiver(pre_save, sender=User)
+def remember_user_type(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the role an existing user had before this save, in case it changes
+    """
+    if update_fields is not None and 'user_type' not in update_fields:
+        return  # e.g. last_login on every sign in
+    if instance.pk:
+        instance._counter_previous_type = User.objects.filter(pk=instance.pk).values_list('user_type', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def count_user_on_save(sender, instance, created, **kwargs):
+    """
+    Keep the users-per-role counters current when a user is added or changes role
+    """
+    previous = None if created else instance.__dict__.pop('_counter_previous_type', instance.user_type)
+    if created or previous != instance.user_type:
+        changes = Counter({('users', instance.user_type): 1})
+        if not created:
+            changes[('users', previous)] -= 1
+        adjust_counters(changes)
+
+
+@receiver(post_delete, sender=User)
+def count_user_on_delete(sender, instance, **kwargs):
+    adjust_counters({('users', instance.user_type): -1})
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_department(sender, instance, **kwargs):
+    """
+    Keep the department an existing course had before this save, in case it moves
+    """
+    if instance.pk:
+        instance._counter_previous_department_id = Course.objects.filter(
+            pk=instance.pk
+        ).values_list('department_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def count_course_on_save(sender, instance, created, **kwargs):
+    """
+    Count a new course, and move its enrollments when it changes department
+    """
+    if created:
+        adjust_counters({('courses', ''): 1})
+        return
+    previous = instance.__dict__.pop('_counter_previous_department_id', instance.department_id)
+    if previous != instance.department_id:
+        moved = StudentEnrollment.objects.filter(class_enrolled__course=instance, is_active=True).count()
+        adjust_counters({
+            ('department_enrollments', str(previous)): -moved,
+            ('department_enrollments', str(instance.department_id)): moved,
+        })
+
+
+@receiver(post_delete, sender=Course)
+def count_course_on_delete(sender, instance, **kwargs):
+    adjust_counters({('courses', ''): -1})
+
+
+@receiver(pre_save, sender=Class)
+def remember_class_course(sender, instance, **kwargs):
+    """
+    Keep the course an existing class had before this save, in case it moves
+    """
+    if instance.pk:
+        instance._counter_previous_course_id = Class.objects.filter(
+            pk=instance.pk
+        ).values_list('course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Class)
+def count_class_on_save(sender, instance, created, **kwargs):
+    """
+    Count a new class, and move its counts when it changes course
+    """
+    if created:
+        adjust_counters({('classes', ''): 1, ('course_classes', str(instance.course_id)): 1})
+        return
+    previous = instance.__dict__.pop('_counter_previous_course_id', instance.course_id)
+    if previous != instance.course_id:
+        moved = StudentEnrollment.objects.filter(class_enrolled=instance, is_active=True).count()
+        old_department_id = Course.objects.filter(pk=previous).values_list('department_id', flat=True).first()
+        changes = Counter({
+            ('course_classes', str(previous)): -1,
+            ('course_classes', str(instance.course_id)): 1,
+            ('course_enrollments', str(previous)): -moved,
+            ('course_enrollments', str(instance.course_id)): moved,
+            ('department_enrollments', str(old_department_id)): -moved,
+        })
+        changes[('department_enrollments', str(instance.course.department_id))] += moved
+        adjust_counters(changes)
+
+
+@receiver(post_delete, sender=Class)
+def count_class_on_delete(sender, instance, **kwargs):
+    adjust_counters({('classes', ''): -1, ('course_classes', str(instance.course_id)): -1})
+
+
+@receiver(pre_save, sender=StudentEnrollment)
+def remember_enrollment_state(sender, instance, **kwargs):
+    """
+    Keep the class and active flag an existing enrollment had before this save
+    """
+    if instance.pk:
+        instance._counter_previous = StudentEnrollment.objects.filter(
+            pk=instance.pk
+        ).values_list('class_enrolled_id', 'is_active').first()
+
+
+@receiver(post_save, sender=StudentEnrollment)
+def count_enrollment_on_save(sender, instance, created, **kwargs):
+    """
+    Keep the active enrollment counters of the class, course and department current
+    """
+    previous = None if created else instance.__dict__.pop('_counter_previous', None)
+    if previous == (instance.class_enrolled_id, instance.is_active):
+        return
+    changes = Counter()
+    if previous and previous[1]:
+        changes.update({counter: -1 for counter in enrollment_changes(previous[0], 1)})
+    if instance.is_active:
+        changes.update(enrollment_changes(instance.class_enrolled_id, 1))
+    adjust_counters(changes)
+
+
+@receiver(post_delete, sender=StudentEnrollment)
+def count_enrollment_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        adjust_counters(enrollment_changes(instance.class_enrolled_id, -1))
+
+
+@receiver(post_save, sender=User)
+def bump_profile_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Change the profile API ETag when a field it returns may have changed
+    """
+    if created or (update_fields is not None and not PROFILE_USER_FIELDS.intersection(update_fields)):
+        return
+    bump_dashboard_versions(profile_scope(instance.pk))
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_save, sender=ParentProfile)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=TeacherProfile)
+@receiver(post_delete, sender=ParentProfile)
+def bump_profile_on_profile_change(sender, instance, **kwargs):
+    bump_dashboard_versions(profile_scope(instance.user_id))
+
+
+@receiver(m2m_changed, sender=ParentProfile.children.through)
+def bump_profile_on_children_change(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """
+    The profile API returns a parent's number of children
+    """
+    if action == 'pre_clear':
+        parents = ParentProfile.objects.filter(children=instance) if reverse else [instance]
+        instance._profile_cleared_user_ids = [parent.user_id for parent in parents]
+    elif action == 'post_clear':
+        bump_dashboard_versions(*(profile_scope(user_id) for user_id in instance.__dict__.pop('_profile_cleared_user_ids', [])))
+    elif action in ('post_add', 'post_remove'):
+        if reverse:
+            user_ids = ParentProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        else:
+            user_ids = [instance.user_id]
+        bump_dashboard_versions(*(profile_scope(user_id) for user_id in user_ids))
+
+
+@receiver(m2m_changed, sender=Notification.recipients.through)
+def bump_unread_on_recipients_change(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """
+    Change the unread count ETag of the users a notification is sent to or taken from
+    """
+    if action == 'pre_clear':
+        instance._unread_cleared_user_ids = [instance.pk] if reverse else list(
+            instance.recipients.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        bump_dashboard_versions(*(unread_scope(user_id) for user_id in instance.__dict__.pop('_unread_cleared_user_ids', [])))
+    elif action in ('post_add', 'post_remove'):
+        user_ids = [instance.pk] if reverse else pk_set
+        bump_dashboard_versions(*(unread_scope(user_id) for user_id in user_ids))
+
+
+@receiver(pre_delete, sender=Notification)
+def remember_notification_recipients(sender, instance, **kwargs):
+    instance._unread_deleted_user_ids = list(instance.recipients.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Notification)
+def bump_unread_on_notification_delete(sender, instance, **kwargs):
+    """
+    Deleting a notification removes its recipient rows without an m2m_changed signal
+    """
+    bump_dashboard_versions(*(unread_scope(user_id) for user_id in instance.__dict__.pop('_unread_deleted_user_ids', [])))
+
+
+@receiver(post_save, sender=NotificationRead)
+@receiver(post_delete, sender=NotificationRead)
+def bump_unread_on_read(sender, instance, **kwargs):
+    bump_dashboard_versions(unread_scope(instance.user_id))
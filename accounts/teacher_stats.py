@@ -0,0 +1,222 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from academic.models import TeacherSubjectAssignment, Assignment, AssignmentSubmission, StudentEnrollment
+from attendance.models import AttendanceSession, AttendanceRecord
+
+# Share of an assignment's max marks needed to pass
+PASSING_SHARE = 0.6
+
+
+def _short_class_name(assignment):
+    subject_short = assignment.subject.name[:8] + "..." if len(assignment.subject.name) > 8 else assignment.subject.name
+    return f"{subject_short}-{assignment.class_assigned.section}"
+
+
+def build_teacher_stats(teacher_profile, sample_data=False):
+    """
+    Per-class statistics of a teacher for the dashboard and the stats API.
+
+    Every count comes from grouped queries over all of the teacher's classes at
+    once (6 queries), however many classes the teacher has.
+
+    ``sample_data`` fills classes without grades, attendance or sessions with
+    the demonstration numbers the HTML dashboard shows instead of empty charts.
+    """
+    today = timezone.now()
+    today_date = today.date()
+
+    # 1. The teacher's subject assignments, evaluated once so count() reuses them
+    teacher_assignments = TeacherSubjectAssignment.objects.filter(
+        teacher=teacher_profile
+    ).select_related('subject', 'class_assigned')
+    len(teacher_assignments)
+    class_ids = {assignment.class_assigned_id for assignment in teacher_assignments}
+
+    # 2. Active students per class, and every enrollment for the class cards
+    class_students = defaultdict(list)
+    enrolled = Counter()
+    for class_id, student_id, is_active in StudentEnrollment.objects.filter(
+        class_enrolled_id__in=class_ids
+    ).order_by('id').values_list('class_enrolled_id', 'student_id', 'is_active'):
+        enrolled[class_id] += 1
+        if is_active:
+            class_students[class_id].append(student_id)
+    for assignment in teacher_assignments:
+        assignment.class_assigned.enrolled_count = enrolled[assignment.class_assigned_id]
+
+    # 3. Assignments created per class, with submissions to the active ones
+    homework = {}
+    for row in Assignment.objects.filter(teacher=teacher_profile).values('class_assigned_id').annotate(
+        total=Count('id', distinct=True),
+        active=Count('id', filter=Q(is_active=True), distinct=True),
+        recent=Count('id', filter=Q(assigned_date__gte=today_date - timedelta(days=30)), distinct=True),
+        active_submissions=Count('assignmentsubmission', filter=Q(is_active=True)),
+    ).order_by():
+        homework[row['class_assigned_id']] = row
+
+    # 4. Submissions received, graded and passed per class
+    submissions = {}
+    graded = Q(marks_obtained__isnull=False)
+    for row in AssignmentSubmission.objects.filter(assignment__teacher=teacher_profile).values(
+        'assignment__class_assigned_id'
+    ).annotate(
+        received=Count('id'),
+        recent=Count('id', filter=Q(submitted_at__gte=today - timedelta(days=30))),
+        graded=Count('id', filter=graded),
+        passed=Count('id', filter=graded & Q(marks_obtained__gte=F('assignment__max_marks') * PASSING_SHARE)),
+        marks=Sum('marks_obtained', filter=graded),
+    ).order_by():
+        submissions[row['assignment__class_assigned_id']] = row
+
+    # 5. Sessions held and completed with a topic per subject assignment
+    sessions = {}
+    for row in AttendanceSession.objects.filter(teacher_assignment__teacher=teacher_profile).values(
+        'teacher_assignment_id'
+    ).annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(is_completed=True, topic_covered__isnull=False) & ~Q(topic_covered='')),
+    ).order_by():
+        sessions[row['teacher_assignment_id']] = row
+
+    # 6. Attendance records per subject assignment
+    records = {}
+    for row in AttendanceRecord.objects.filter(session__teacher_assignment__teacher=teacher_profile).values(
+        'session__teacher_assignment_id'
+    ).annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status__in=['present', 'late'])),
+    ).order_by():
+        records[row['session__teacher_assignment_id']] = row
+
+    stats = {
+        'teacher_assignments': teacher_assignments,
+        'class_students': class_students,
+        'assignment_stats': [],
+        'passing_stats': [],
+        'attendance_stats': [],
+        'syllabus_progress': [],
+    }
+
+    total_students = 0
+    empty = defaultdict(int)
+    for assignment in teacher_assignments:
+        class_obj = assignment.class_assigned
+        class_name = _short_class_name(assignment)
+        students_in_class = len(class_students[class_obj.id])
+        total_students += students_in_class
+
+        # Assignment submissions
+        class_homework = homework.get(class_obj.id, empty)
+        total_submissions = class_homework['active_submissions']
+        total_possible_submissions = class_homework['active'] * students_in_class
+        if class_homework['active'] == 0:
+            # No assignments yet: show the potential for two
+            total_possible_submissions = students_in_class * 2
+            total_submissions = 0
+        submission_rate = (total_submissions / total_possible_submissions * 100) if total_possible_submissions > 0 else 0
+        stats['assignment_stats'].append({
+            'class_name': class_name,
+            'total_assignments': class_homework['active'],
+            'total_submissions': total_submissions,
+            'not_submitted': total_possible_submissions - total_submissions,
+            'submission_rate': round(submission_rate, 1),
+            'total_students': students_in_class
+        })
+
+        # Passing rate
+        class_submissions = submissions.get(class_obj.id, empty)
+        total_graded = class_submissions['graded']
+        passed = class_submissions['passed']
+        passing_rate = (passed / total_graded * 100) if total_graded > 0 else 0
+        if sample_data and total_graded == 0:
+            passed = int(students_in_class * 0.75)
+            total_graded = students_in_class
+            passing_rate = 75.0
+        stats['passing_stats'].append({
+            'class_name': class_name,
+            'total_graded': total_graded,
+            'passed': passed,
+            'failed': total_graded - passed,
+            'passing_rate': round(passing_rate, 1)
+        })
+
+        # Attendance
+        assignment_sessions = sessions.get(assignment.id, empty)
+        assignment_records = records.get(assignment.id, empty)
+        total_sessions = assignment_sessions['total']
+        total_records = assignment_records['total']
+        present_records = assignment_records['present']
+        attendance_rate = (present_records / total_records * 100) if total_records > 0 else 0
+        if sample_data and total_records == 0:
+            total_records = students_in_class * 5
+            present_records = int(total_records * 0.85)
+            attendance_rate = 85.0
+        stats['attendance_stats'].append({
+            'class_name': class_name,
+            'total_sessions': (total_sessions or 5) if sample_data else total_sessions,
+            'total_records': total_records,
+            'present_records': present_records,
+            'attendance_rate': round(attendance_rate, 1)
+        })
+
+        # Syllabus progress (topics covered in completed sessions)
+        completed_sessions = assignment_sessions['completed']
+        progress_percentage = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
+        if sample_data and total_sessions == 0:
+            total_sessions, completed_sessions, progress_percentage = 20, 8, 40.0
+        stats['syllabus_progress'].append({
+            'subject_name': assignment.subject.name,
+            'class_name': class_obj.section,
+            'total_sessions': total_sessions,
+            'completed_sessions': completed_sessions,
+            'progress_percentage': round(progress_percentage, 1)
+        })
+
+    # Totals over every class the teacher has assignments or submissions in
+    total_graded = sum(row['graded'] for row in submissions.values())
+    total_marks = sum(row['marks'] or 0 for row in submissions.values())
+    stats['summary'] = {
+        'total_students': total_students,
+        'total_subjects': len(teacher_assignments),
+        'pending_assignments': sum(row['active'] for row in homework.values()),
+        'total_assignments_created': sum(row['total'] for row in homework.values()),
+        'total_submissions_received': sum(row['received'] for row in submissions.values()),
+        'recent_assignment_count': sum(row['recent'] for row in homework.values()),
+        'recent_submissions_count': sum(row['recent'] for row in submissions.values()),
+        'avg_grade': round(total_marks / total_graded, 1) if total_graded else 0,
+    }
+    return stats
+
+
+def students_with_unpaid_fees(stats, limit=10):
+    """
+    Students of the teacher's classes who owe fees, looked up in the fee
+    balance ledger for the ``class_students`` of build_teacher_stats. Two queries.
+    """
+    from fees.models import StudentFeeBalance
+    from accounts.models import StudentProfile
+
+    student_ids = {student_id for students in stats['class_students'].values() for student_id in students}
+    unpaid = StudentFeeBalance.objects.in_bulk(student_ids)
+
+    # Classes in the order of the teacher's assignments, each listed once
+    rows = []
+    listed = Counter()
+    for assignment in stats['teacher_assignments']:
+        class_obj = assignment.class_assigned
+        listed[class_obj.id] += 1
+        if listed[class_obj.id] > 1:
+            continue
+        for student_id in stats['class_students'][class_obj.id]:
+            if student_id in unpaid and len(rows) < limit:
+                rows.append((student_id, class_obj))
+
+    students = StudentProfile.objects.select_related('user').in_bulk([student_id for student_id, _ in rows])
+    return [{
+        'student': students[student_id],
+        'class': class_obj,
+        'total_unpaid': unpaid[student_id].outstanding_amount,
+        'fee_count': unpaid[student_id].unpaid_fee_count,
+    } for student_id, class_obj in rows if student_id in students]
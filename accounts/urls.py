@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/logout/', api_views.api_logout, name='api_logout'),
     path('api/user-profile/', api_views.api_user_profile, name='api_user_profile'),
     path('api/teacher-dashboard-stats/', api_views.teacher_dashboard_stats, name='teacher_dashboard_stats'),
+    path('api/dashboard-cache-stats/', api_views.dashboard_cache_stats, name='dashboard_cache_stats'),
     # Admin-only user management
     path('admin/create-user/', views.admin_create_user, name='admin_create_user'),
     path('admin/users/', views.admin_user_list, name='admin_user_list'),
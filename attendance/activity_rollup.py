@@ -0,0 +1,120 @@
+from datetime import timedelta, timezone as dt_timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Greatest, Least, TruncHour
+from django.utils import timezone
+from .models import TeacherActivityHourly, TeacherActivityLog
+
+# The rollup only ever grows: archive_teacher_activity deletes raw logs on purpose and
+# keeps their hours here. Logs deleted any other way (admin, shell) are not subtracted;
+# rebuild_teacher_activity_rollup recounts the affected days from the logs that remain.
+
+
+def hour_start(timestamp):
+    """Start of the UTC hour containing ``timestamp``"""
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity_rollup(events):
+    """
+    Add activity events to the hourly rollup.
+
+    ``events`` is an iterable of (teacher_id, activity_type, timestamp). Events are
+    merged per (teacher, activity_type, hour) first, so each rollup row is written
+    once per call however many events it receives.
+    """
+    merged = {}
+    for teacher_id, activity_type, timestamp in events:
+        key = (teacher_id, activity_type, hour_start(timestamp))
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            entry[1] = min(entry[1], timestamp)
+            entry[2] = max(entry[2], timestamp)
+
+    for (teacher_id, activity_type, hour), (count, first_seen, last_seen) in merged.items():
+        rows = TeacherActivityHourly.objects.filter(teacher_id=teacher_id, activity_type=activity_type, hour=hour)
+        increment = {
+            'count': F('count') + count,
+            'first_seen': Least(F('first_seen'), first_seen),
+            'last_seen': Greatest(F('last_seen'), last_seen),
+        }
+        if rows.update(**increment):
+            continue
+        try:
+            with transaction.atomic():
+                TeacherActivityHourly.objects.create(
+                    teacher_id=teacher_id, activity_type=activity_type, hour=hour,
+                    count=count, first_seen=first_seen, last_seen=last_seen,
+                )
+        except IntegrityError:
+            # Another request created the row in between
+            rows.update(**increment)
+
+
+def rebuild_activity_rollup(start, end, batch_size=1000):
+    """
+    Recompute the rollup rows for every hour in [start, end) from the raw logs.
+    Returns the number of rollup rows written.
+    """
+    start, end = hour_start(start), hour_start(end)
+    if start >= end:
+        raise ValueError('start must be before end')
+
+    rows = TeacherActivityLog.objects.filter(
+        timestamp__gte=start, timestamp__lt=end
+    ).annotate(
+        hour=TruncHour('timestamp', tzinfo=dt_timezone.utc)
+    ).values('teacher_id', 'activity_type', 'hour').annotate(
+        total=Count('id'), first_seen=Min('timestamp'), last_seen=Max('timestamp')
+    ).order_by()
+
+    written = 0
+    with transaction.atomic():
+        TeacherActivityHourly.objects.filter(hour__gte=start, hour__lt=end).delete()
+
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(TeacherActivityHourly(
+                teacher_id=row['teacher_id'],
+                activity_type=row['activity_type'],
+                hour=row['hour'],
+                count=row['total'],
+                first_seen=row['first_seen'],
+                last_seen=row['last_seen'],
+            ))
+            if len(batch) >= batch_size:
+                TeacherActivityHourly.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            TeacherActivityHourly.objects.bulk_create(batch)
+            written += len(batch)
+
+    return written
+
+
+def activity_counts(day, teacher_id=None, activity_type=None):
+    """
+    Activity totals for one day from the rollup: {'total': n, <activity_type>: n, ...}
+    """
+    rows = TeacherActivityHourly.objects.filter(hour__date=day)
+    if teacher_id:
+        rows = rows.filter(teacher_id=teacher_id)
+    if activity_type:
+        rows = rows.filter(activity_type=activity_type)
+
+    counts = dict(rows.values('activity_type').annotate(total=Sum('count')).values_list('activity_type', 'total'))
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def online_teacher_count(minutes=30):
+    """Number of teachers with any activity in the last ``minutes`` minutes"""
+    since = timezone.now() - timedelta(minutes=minutes)
+    return TeacherActivityHourly.objects.filter(
+        hour__gte=hour_start(since),
+        last_seen__gte=since
+    ).values('teacher').distinct().count()
@@ -0,0 +1,131 @@
+import threading
+from collections import Counter, namedtuple
+from functools import lru_cache
+from django.urls import Resolver404, resolve
+
+ActivityRule = namedtuple('ActivityRule', [
+    'name', 'url_names', 'methods', 'activity_type', 'priority_level', 'description', 'link_schedule',
+])
+
+
+def rule(name, url_names, activity_type, priority_level, description, methods=None, link_schedule=False):
+    """
+    One classification rule. ``url_names`` are 'namespace:name' strings, or
+    'namespace:*' for every URL of an app. ``methods`` None means any method.
+    ``description`` may contain {path}.
+    """
+    return ActivityRule(name, tuple(url_names), tuple(methods or ()), activity_type, priority_level,
+                        description, link_schedule)
+
+
+# Checked in order: when two rules match the same URL name and method, the first one wins.
+# Exact URL names always win over 'namespace:*' rules.
+ACTIVITY_RULES = [
+    rule('login', ['accounts:login', 'accounts:api_login'],
+         'login', 'medium', 'Teacher logged in to system'),
+    rule('logout', ['accounts:logout', 'accounts:api_logout'],
+         'logout', 'medium', 'Teacher logged out from system'),
+    rule('mark_attendance', [
+        'attendance:mark_attendance', 'attendance:mark_attendance_session', 'attendance:save_attendance_ajax',
+        'attendance:sync_attendance_batch',
+    ], 'mark_attendance', 'high', 'Marked student attendance', methods=['POST'], link_schedule=True),
+    rule('create_assignment', ['academic:create_assignment', 'academic:edit_assignment'],
+         'create_assignment', 'high', 'Created/updated assignment', methods=['POST']),
+    rule('grade_exam', ['examination:enter_results'],
+         'grade_exam', 'high', 'Graded exam/entered results', methods=['POST']),
+    rule('send_message', [
+        'accounts:send_message', 'accounts:send_message_to_teacher', 'accounts:send_message_about_student',
+        'accounts:message_detail',
+    ], 'send_message', 'medium', 'Sent message', methods=['POST']),
+    rule('view_report', [
+        'attendance:attendance_reports', 'attendance:teacher_attendance_reports',
+        'academic:student_enrollment_report', 'academic:semester_wise_enrollment_report',
+        'academic:semester_enrollment_report', 'examination:result_list',
+    ], 'view_report', 'medium', 'Viewed reports'),
+    rule('dashboard_access', [
+        'accounts:dashboard', 'accounts:teacher_dashboard_stats', 'attendance:teacher_attendance_dashboard',
+    ], 'dashboard_access', 'low', 'Accessed dashboard'),
+    rule('navigation', ['accounts:*', 'academic:*', 'attendance:*', 'examination:*'],
+         'system_navigation', 'low', 'Navigated to {path}', methods=['GET']),
+]
+
+# Used for unresolvable paths and URLs no rule covers
+FALLBACK_RULE = rule('other', [], 'other', 'low', '')
+
+# Distinct paths remembered by the lookup cache
+CLASSIFIER_CACHE_SIZE = 2048
+
+
+def compile_rules(rules):
+    """
+    Turn the rule list into a dict keyed by (url_name, method), where
+    method None stands for any method.
+    """
+    compiled = {}
+    for activity_rule in rules:
+        for url_name in activity_rule.url_names:
+            for method in activity_rule.methods or (None,):
+                compiled.setdefault((url_name, method), activity_rule)
+    return compiled
+
+
+_compiled_rules = compile_rules(ACTIVITY_RULES)
+
+_hits = Counter()
+_hits_lock = threading.Lock()
+
+
+def _match(url_name, method):
+    if url_name:
+        namespace = url_name.split(':', 1)[0] + ':*' if ':' in url_name else None
+        for key in ((url_name, method), (url_name, None), (namespace, method), (namespace, None)):
+            activity_rule = _compiled_rules.get(key)
+            if activity_rule is not None:
+                return activity_rule
+    return FALLBACK_RULE
+
+
+@lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def _rule_for(path, method):
+    try:
+        url_name = resolve(path).view_name
+    except Resolver404:
+        url_name = None
+    return _match(url_name, method)
+
+
+def classify(path, method):
+    """Return the ActivityRule for a request path and HTTP method"""
+    activity_rule = _rule_for(path, method)
+    with _hits_lock:
+        _hits[activity_rule.name] += 1
+    return activity_rule
+
+
+def rule_hit_counts():
+    """Requests classified by each rule since this process started"""
+    with _hits_lock:
+        counts = {activity_rule.name: 0 for activity_rule in ACTIVITY_RULES + [FALLBACK_RULE]}
+        counts.update(_hits)
+    return counts
+
+
+def classifier_stats():
+    """Hit counters plus the lookup cache statistics, for export"""
+    cache = _rule_for.cache_info()
+    return {
+        'rules': rule_hit_counts(),
+        'cache': {
+            'hits': cache.hits,
+            'misses': cache.misses,
+            'size': cache.currsize,
+            'max_size': cache.maxsize,
+        },
+    }
+
+
+def reset_classifier():
+    """Clear the lookup cache and the hit counters"""
+    _rule_for.cache_clear()
+    with _hits_lock:
+        _hits.clear()
@@ -320,7 +320,7 @@ class AttendanceSummaryAdmin(admin.ModelAdmin):
     get_attendance_percentage.admin_order_field = 'attendance_percentage'
 
 # Teacher Attendance Admin
-from .models import TeacherAttendance, TeacherActivityLog, TeacherLeave
+from .models import TeacherAttendance, TeacherActivityLog, TeacherLeave, CampusNetwork, StudentRiskScore
 from .admin_views import TeacherAttendanceAdminExtended
 
 # Unregister the old TeacherAttendance admin if it exists
@@ -381,4 +381,21 @@ class TeacherLeaveAdmin(admin.ModelAdmin):
             obj.get_status_display()
         )
     get_status_badge.short_description = 'Status'
-    get_status_badge.admin_order_field = 'status'
\ No newline at end of file
+    get_status_badge.admin_order_field = 'status'
+
+
+@admin.register(CampusNetwork)
+class CampusNetworkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'cidr', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'cidr']
+    readonly_fields = ['created_at']
+
+
+@admin.register(StudentRiskScore)
+class StudentRiskScoreAdmin(admin.ModelAdmin):
+    list_display = ['student', 'risk_score', 'risk_level', 'rolling_attendance_rate', 'absence_streak',
+                    'exam_average', 'grade_trend', 'outstanding_balance', 'computed_at']
+    list_filter = ['risk_level']
+    search_fields = ['student__student_id', 'student__user__first_name', 'student__user__last_name']
+    readonly_fields = ['computed_at']
@@ -4,10 +4,13 @@ from django.urls import path, reverse
 from django.utils.html import format_html
 from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
+from collections import defaultdict
 from .models import TeacherAttendance, TeacherActivityLog, AttendanceSession
 from accounts.models import TeacherProfile
 from academic.models import TeacherSubjectAssignment
+from .teacher_dashboard import build_teacher_day_rows
+from .activity_rollup import online_teacher_count
 
 class TeacherAttendanceAdminView:
     """Custom admin view for teacher attendance dashboard"""
@@ -35,14 +38,19 @@ class TeacherAttendanceAdminView:
         except:
             filter_date = today
         
-        # Today's attendance summary
+        # Today's attendance summary in one conditional aggregate
         total_teachers = TeacherProfile.objects.count()
-        today_attendance = TeacherAttendance.objects.filter(date=filter_date)
+        today_counts = TeacherAttendance.objects.filter(date=filter_date).aggregate(
+            present=Count('id', filter=Q(status__in=['present', 'late'])),
+            absent=Count('id', filter=Q(status='absent')),
+            late=Count('id', filter=Q(status='late')),
+            on_leave=Count('id', filter=Q(status='on_leave')),
+        )
         
-        present_count = today_attendance.filter(status__in=['present', 'late']).count()
-        absent_count = today_attendance.filter(status='absent').count()
-        late_count = today_attendance.filter(status='late').count()
-        on_leave_count = today_attendance.filter(status='on_leave').count()
+        present_count = today_counts['present']
+        absent_count = today_counts['absent']
+        late_count = today_counts['late']
+        on_leave_count = today_counts['on_leave']
         
         # Calculate attendance percentage
         attendance_percentage = (present_count / total_teachers * 100) if total_teachers > 0 else 0
@@ -51,51 +59,34 @@ class TeacherAttendanceAdminView:
         recent_activities = TeacherActivityLog.objects.select_related('teacher__user').order_by('-timestamp')[:10]
         
         # Teachers currently online (active in last 30 minutes)
-        thirty_minutes_ago = timezone.now() - timedelta(minutes=30)
-        online_teachers = TeacherActivityLog.objects.filter(
-            timestamp__gte=thirty_minutes_ago
-        ).values('teacher').distinct().count()
+        online_teachers = online_teacher_count(30)
         
         # Detailed attendance for today with subject information
-        detailed_attendance = TeacherAttendance.objects.filter(
+        detailed_attendance = list(TeacherAttendance.objects.filter(
             date=filter_date
-        ).select_related('teacher__user').order_by('teacher__user__first_name')
+        ).select_related('teacher__user').order_by('teacher__user__first_name'))
         
-        # Add subject assignments and attendance sessions for each teacher
-        enhanced_attendance = []
-        for attendance in detailed_attendance:
-            # Get teacher's subject assignments
-            subject_assignments = TeacherSubjectAssignment.objects.filter(
-                teacher=attendance.teacher
-            ).select_related('subject', 'class_assigned')
-            
-            # Get attendance sessions for today
-            attendance_sessions = AttendanceSession.objects.filter(
-                teacher_assignment__teacher=attendance.teacher,
-                date=filter_date
-            ).select_related('teacher_assignment__subject', 'teacher_assignment__class_assigned')
-            
-            enhanced_attendance.append({
-                'attendance': attendance,
-                'subject_assignments': subject_assignments,
-                'attendance_sessions': attendance_sessions,
-                'subjects_taught_today': attendance_sessions.count(),
-                'classes_attended': attendance_sessions.filter(is_completed=True).count()
-            })
+        # Add subject assignments and attendance sessions for every teacher at once
+        enhanced_attendance = build_teacher_day_rows(detailed_attendance, filter_date)
         
         # Teachers without attendance record for today
-        teachers_with_attendance = detailed_attendance.values_list('teacher_id', flat=True)
-        teachers_without_attendance_list = []
-        for teacher in TeacherProfile.objects.exclude(id__in=teachers_with_attendance).select_related('user'):
-            # Get their subject assignments
-            subject_assignments = TeacherSubjectAssignment.objects.filter(
-                teacher=teacher
-            ).select_related('subject', 'class_assigned')
-            
-            teachers_without_attendance_list.append({
-                'teacher': teacher,
-                'subject_assignments': subject_assignments
-            })
+        teachers_without_attendance = list(
+            TeacherProfile.objects.exclude(
+                attendance_records__date=filter_date
+            ).select_related('user')
+        )
+        
+        # Get their subject assignments in one query
+        assignments_by_teacher = defaultdict(list)
+        for assignment in TeacherSubjectAssignment.objects.filter(
+            teacher__in=[teacher.id for teacher in teachers_without_attendance]
+        ).select_related('subject', 'class_assigned__course'):
+            assignments_by_teacher[assignment.teacher_id].append(assignment)
+        
+        teachers_without_attendance_list = [{
+            'teacher': teacher,
+            'subject_assignments': assignments_by_teacher[teacher.id]
+        } for teacher in teachers_without_attendance]
         
         context = {
             'title': 'Teacher Attendance Dashboard',
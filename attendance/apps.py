@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AttendanceConfig(AppConfig):
     name = 'attendance'
+
+    def ready(self):
+        import attendance.signals  # Register signals
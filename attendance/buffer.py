@@ -0,0 +1,287 @@
+import atexit
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import TeacherAttendance, TeacherActivityLog
+from .activity_rollup import record_activity_rollup
+
+ATTENDANCE_UPDATE_FIELDS = [
+    'first_activity_time', 'last_activity_time', 'check_in_time', 'check_out_time', 'total_hours',
+    'scheduled_hours', 'classes_scheduled', 'classes_attended', 'attendance_percentage', 'status', 'updated_at',
+]
+
+
+class TeacherActivityBuffer:
+    """
+    In-process write-behind buffer for the teacher attendance middleware.
+
+    Requests only append to memory. Activity events are kept in order, and
+    attendance changes for the same (teacher, date) are merged into a single
+    pending update. A background thread flushes everything every
+    ``TEACHER_ATTENDANCE_FLUSH_INTERVAL`` seconds, writing activity logs with
+    ``bulk_create`` and attendance rows with ``bulk_update``.
+
+    A failed batch goes back in the buffer and is retried, up to
+    ``TEACHER_ATTENDANCE_FLUSH_RETRIES`` times before it is dropped. At most
+    ``TEACHER_ATTENDANCE_BUFFER_LIMIT`` events are kept; beyond that the oldest
+    are dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._attendance = {}
+        self._thread = None
+        self._stopped = threading.Event()
+        self._overflow = 0
+
+    def add(self, teacher_id, timestamp, ip_address, user_agent, is_on_campus, activity, location=None):
+        """Queue one teacher request. ``activity`` is the classified activity dict, ``location`` (lat, lng) or None."""
+        key = (teacher_id, timestamp.date())
+
+        limit = getattr(settings, 'TEACHER_ATTENDANCE_BUFFER_LIMIT', 10000)
+
+        with self._lock:
+            if len(self._events) >= limit:
+                # Flushes have been failing for a while: keep the newest events
+                del self._events[:len(self._events) - limit + 1]
+                if not self._overflow:
+                    print(f"Teacher activity buffer is full ({limit} events), dropping the oldest events")
+                self._overflow += 1
+
+            self._events.append({
+                'key': key,
+                'attempts': 0,
+                'timestamp': timestamp,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'is_on_campus': is_on_campus,
+                'location': location,
+                **activity,
+            })
+
+            pending = self._attendance.get(key)
+            if pending is None:
+                self._attendance[key] = {
+                    'first_time': timestamp,
+                    'last_time': timestamp,
+                    'ip_address': ip_address,
+                    'device_info': user_agent,
+                    'location_verified': is_on_campus,
+                    'attempts': 0,
+                }
+            else:
+                pending['first_time'] = min(pending['first_time'], timestamp)
+                pending['last_time'] = max(pending['last_time'], timestamp)
+
+        self._ensure_flusher()
+
+    def flush(self):
+        """Write everything buffered so far. Returns (logs written, attendance rows written)."""
+        with self._lock:
+            events, self._events = self._events, []
+            pending, self._attendance = self._attendance, {}
+            overflow, self._overflow = self._overflow, 0
+
+        if not events and not pending:
+            return 0, 0
+
+        try:
+            with transaction.atomic():
+                created_keys = self._write_attendance(pending)
+                self._write_activity_logs(events, created_keys)
+        except Exception:
+            # Nothing was committed: put the batch back so the next flush retries it
+            self._requeue(events, pending)
+            raise
+
+        if overflow:
+            print(f"Teacher activity buffer was full: {overflow} activity events were dropped")
+        return len(events), len(pending)
+
+    def _requeue(self, events, pending):
+        """Return a batch that failed to write to the front of the buffer, dropping what failed too often"""
+        retries = getattr(settings, 'TEACHER_ATTENDANCE_FLUSH_RETRIES', 5)
+        limit = getattr(settings, 'TEACHER_ATTENDANCE_BUFFER_LIMIT', 10000)
+
+        kept = []
+        for event in events:
+            event['attempts'] += 1
+            if event['attempts'] <= retries:
+                kept.append(event)
+        dropped_updates = 0
+        for key in list(pending):
+            pending[key]['attempts'] += 1
+            if pending[key]['attempts'] > retries:
+                del pending[key]
+                dropped_updates += 1
+
+        if len(kept) < len(events) or dropped_updates:
+            print(
+                f"Dropping {len(events) - len(kept)} teacher activity events and {dropped_updates} "
+                f"attendance updates after {retries} failed flushes"
+            )
+
+        with self._lock:
+            self._events = kept + self._events
+            if len(self._events) > limit:
+                self._overflow += len(self._events) - limit
+                del self._events[:len(self._events) - limit]
+            for key, update in pending.items():
+                newer = self._attendance.get(key)
+                if newer is not None:
+                    update['first_time'] = min(update['first_time'], newer['first_time'])
+                    update['last_time'] = max(update['last_time'], newer['last_time'])
+                self._attendance[key] = update
+
+    def _write_attendance(self, pending):
+        """Merge pending updates into TeacherAttendance rows; return the keys that were created"""
+        teacher_ids = {teacher_id for teacher_id, _ in pending}
+        dates = {day for _, day in pending}
+
+        existing = {
+            (attendance.teacher_id, attendance.date): attendance
+            for attendance in TeacherAttendance.objects.filter(
+                teacher_id__in=teacher_ids, date__in=dates
+            ).select_related('teacher')
+        }
+
+        missing = {key for key in pending if key not in existing}
+        if missing:
+            TeacherAttendance.objects.bulk_create([
+                TeacherAttendance(
+                    teacher_id=teacher_id,
+                    date=day,
+                    check_in_time=pending[(teacher_id, day)]['first_time'].time(),
+                    first_activity_time=pending[(teacher_id, day)]['first_time'],
+                    ip_address=pending[(teacher_id, day)]['ip_address'],
+                    device_info=pending[(teacher_id, day)]['device_info'],
+                    is_auto_marked=True,
+                    validation_method='schedule_based',
+                    location_verified=pending[(teacher_id, day)]['location_verified'],
+                    status='present',  # Will be recalculated
+                )
+                for teacher_id, day in missing
+            ], ignore_conflicts=True)
+
+            # Reload so every row has a primary key for bulk_update
+            existing.update({
+                (attendance.teacher_id, attendance.date): attendance
+                for attendance in TeacherAttendance.objects.filter(
+                    teacher_id__in={teacher_id for teacher_id, _ in missing},
+                    date__in={day for _, day in missing}
+                ).select_related('teacher')
+            })
+
+        to_update = []
+        now = timezone.now()
+        for key, update in pending.items():
+            attendance = existing.get(key)
+            if attendance is None:
+                continue
+
+            if key in missing:
+                # A new row already carries the first activity; later ones move the last activity
+                if update['last_time'] > update['first_time']:
+                    attendance.last_activity_time = update['last_time']
+            elif attendance.last_activity_time is None or update['last_time'] > attendance.last_activity_time:
+                attendance.last_activity_time = update['last_time']
+
+            # Last activity of the day doubles as the check-out time
+            attendance.check_out_time = update['last_time'].time()
+
+            attendance.calculate_scheduled_hours()
+            attendance.calculate_hours()
+            attendance.determine_status_advanced()
+            # bulk_update does not apply auto_now
+            attendance.updated_at = now
+            to_update.append(attendance)
+
+        TeacherAttendance.objects.bulk_update(to_update, ATTENDANCE_UPDATE_FIELDS)
+        return missing
+
+    def _write_activity_logs(self, events, created_keys):
+        first_seen = set()
+        logs = []
+        timestamps = []
+
+        for event in sorted(events, key=lambda item: item['timestamp']):
+            activity_type = event['activity_type']
+            description = event['description']
+
+            # Mark first activity of the day specially
+            if event['key'] in created_keys and event['key'] not in first_seen:
+                first_seen.add(event['key'])
+                if activity_type == 'other':
+                    activity_type = 'first_login'
+                    description = f"First system access of the day - {event['path']}"
+                else:
+                    description = f'FIRST ACTIVITY: {description}'
+
+            logs.append(TeacherActivityLog(
+                teacher_id=event['key'][0],
+                activity_type=activity_type,
+                priority_level=event['priority_level'],
+                description=description[:255],
+                ip_address=event['ip_address'],
+                user_agent=event['user_agent'],
+                location_lat=event['location'][0] if event['location'] else None,
+                location_lng=event['location'][1] if event['location'] else None,
+                is_on_campus=event['is_on_campus'],
+                related_schedule_id=event['related_schedule_id'],
+            ))
+            timestamps.append(event['timestamp'])
+
+        TeacherActivityLog.objects.bulk_create(logs)
+
+        # auto_now_add stamps every row with the flush time, so restore the real
+        # request times on backends that return primary keys from bulk_create
+        if logs and logs[0].pk is not None:
+            for log, timestamp in zip(logs, timestamps):
+                log.timestamp = timestamp
+            TeacherActivityLog.objects.bulk_update(logs, ['timestamp'])
+
+        # bulk_create does not send signals, so update the hourly rollup here
+        record_activity_rollup(
+            (log.teacher_id, log.activity_type, timestamp) for log, timestamp in zip(logs, timestamps)
+        )
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='teacher-activity-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = getattr(settings, 'TEACHER_ATTENDANCE_FLUSH_INTERVAL', 10)
+        max_delay = getattr(settings, 'TEACHER_ATTENDANCE_MAX_FLUSH_DELAY', 300)
+        delay = interval
+        while not self._stopped.wait(delay):
+            try:
+                self.flush()
+                delay = interval
+            except Exception as e:
+                # e.g. "database is locked": the batch stays buffered, retry later and back off
+                delay = min(delay * 2, max_delay)
+                print(f"Error flushing teacher activity buffer, retrying in {delay}s: {e}")
+            finally:
+                # The flusher thread owns its own connections; don't keep them open between flushes
+                connections.close_all()
+
+    def stop(self):
+        """Stop the background flusher and write whatever is still buffered"""
+        self._stopped.set()
+        try:
+            self.flush()
+        except Exception as e:
+            # Runs at interpreter exit, where raising would only hide the message
+            print(f"Error flushing teacher activity buffer on shutdown, {len(self._events)} activity events lost: {e}")
+
+
+activity_buffer = TeacherActivityBuffer()
+atexit.register(activity_buffer.stop)
@@ -0,0 +1,108 @@
+from django.db import transaction
+from academic.models import StudentEnrollment
+from .models import AttendanceRecord
+from .summary import refresh_session_summary
+
+VALID_STATUSES = {choice for choice, label in AttendanceRecord.ATTENDANCE_CHOICES}
+
+
+def clean_attendance_rows(attendance_data):
+    """
+    Validate submitted attendance rows.
+
+    Returns ``submitted`` ({student_id: (status, remarks)}, later rows for the
+    same student replacing earlier ones) and the list of ``rejected`` rows.
+    """
+    rejected = []
+    submitted = {}
+
+    for record_data in attendance_data:
+        if not isinstance(record_data, dict):
+            rejected.append({'student_id': None, 'reason': 'Invalid row'})
+            continue
+
+        student_id = record_data.get('student_id')
+        status = record_data.get('status')
+
+        try:
+            student_id = int(student_id)
+        except (TypeError, ValueError):
+            rejected.append({'student_id': student_id, 'reason': 'Invalid student ID'})
+            continue
+
+        if status not in VALID_STATUSES:
+            rejected.append({'student_id': student_id, 'reason': 'Invalid status'})
+            continue
+
+        # Later rows for the same student replace earlier ones
+        submitted[student_id] = (status, record_data.get('remarks', '') or '')
+
+    return submitted, rejected
+
+
+def reject_unenrolled(submitted, enrolled_ids, rejected):
+    """Move students that are not in ``enrolled_ids`` from ``submitted`` to ``rejected``"""
+    for student_id in list(submitted):
+        if student_id not in enrolled_ids:
+            del submitted[student_id]
+            rejected.append({'student_id': student_id, 'reason': 'Student not enrolled in this class'})
+
+
+def upsert_attendance_records(session, attendance_data):
+    """
+    Insert or update the attendance records of a session in bulk.
+
+    Every submitted row is checked against the active enrollments of the
+    session's class in one query, then all accepted rows are written with a
+    single upsert on the (session, student) unique key. The number of queries
+    does not depend on the size of the class.
+
+    Returns a dict with the ``inserted`` and ``updated`` counts and the list
+    of ``rejected`` rows together with the reason they were rejected.
+    """
+    submitted, rejected = clean_attendance_rows(attendance_data)
+
+    # Only students actively enrolled in the session's class may be marked
+    enrolled_ids = set(
+        StudentEnrollment.objects.filter(
+            class_enrolled__teachersubjectassignment=session.teacher_assignment_id,
+            student_id__in=submitted.keys(),
+            is_active=True
+        ).values_list('student_id', flat=True)
+    )
+
+    reject_unenrolled(submitted, enrolled_ids, rejected)
+
+    if not submitted:
+        return {'inserted': 0, 'updated': 0, 'rejected': rejected}
+
+    # bulk_create skips AttendanceRecord.save(), so copy the session columns here
+    session_fields = AttendanceRecord.session_fields(session.id)
+    records = [
+        AttendanceRecord(session=session, student_id=student_id, status=status, remarks=remarks, **session_fields)
+        for student_id, (status, remarks) in submitted.items()
+    ]
+
+    with transaction.atomic():
+        existing_ids = set(
+            AttendanceRecord.objects.select_for_update().filter(
+                session=session,
+                student_id__in=submitted.keys()
+            ).values_list('student_id', flat=True)
+        )
+
+        AttendanceRecord.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            unique_fields=['session', 'student'],
+            update_fields=['status', 'remarks'],
+        )
+
+        # bulk_create does not send signals, so refresh the summary rows here
+        refresh_session_summary(session.id, submitted.keys())
+
+    return {
+        'inserted': len(records) - len(existing_ids),
+        'updated': len(existing_ids),
+        'rejected': rejected,
+    }
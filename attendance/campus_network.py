@@ -0,0 +1,80 @@
+import ipaddress
+import threading
+import time as timer
+from bisect import bisect_right
+from .models import CampusNetwork
+
+# Networks saved in another process only reach this one through the TTL
+CAMPUS_NETWORK_TTL = 300  # seconds
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class CampusNetworkIndex:
+    """
+    Campus networks compiled into sorted, merged address intervals per IP version.
+
+    Overlapping and adjacent networks are merged, so a lookup is one bisect on
+    the interval starts and one comparison with that interval's end.
+    """
+
+    def __init__(self, cidrs):
+        ranges = {4: [], 6: []}
+        for cidr in cidrs:
+            try:
+                network = ipaddress.ip_network(cidr, strict=False)
+            except ValueError:
+                print(f"Skipping invalid campus network: {cidr}")
+                continue
+            ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+        self._starts = {}
+        self._ends = {}
+        for version, intervals in ranges.items():
+            merged = []
+            for start, end in sorted(intervals):
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[version] = [start for start, _ in merged]
+            self._ends[version] = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self._starts[4]) + len(self._starts[6])
+
+    def contains(self, ip_address):
+        """Whether an address string falls in any campus network (False for missing or invalid input)"""
+        if not ip_address:
+            return False
+        try:
+            address = ipaddress.ip_address(ip_address.strip())
+        except ValueError:
+            return False
+
+        # IPv4 clients seen through an IPv6 socket (::ffff:10.0.0.5)
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        value = int(address)
+        position = bisect_right(self._starts[address.version], value) - 1
+        return position >= 0 and value <= self._ends[address.version][position]
+
+
+def get_campus_network_index():
+    """Return the cached CampusNetworkIndex for the active networks, loading it on first use"""
+    now = timer.monotonic()
+    entry = _cache.get('index')
+    if entry is not None and now - entry[0] < CAMPUS_NETWORK_TTL:
+        return entry[1]
+
+    index = CampusNetworkIndex(CampusNetwork.objects.filter(is_active=True).values_list('cidr', flat=True))
+    with _lock:
+        _cache['index'] = (now, index)
+    return index
+
+
+def invalidate_campus_network_index():
+    with _lock:
+        _cache.clear()
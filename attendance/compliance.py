@@ -0,0 +1,158 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from .models import AttendanceSession, TeacherActivityLog
+from .schedule_index import get_week_schedules
+from .teacher_dashboard import SIGNIFICANT_ACTIVITIES
+
+
+class ComplianceEngine:
+    """
+    Schedule compliance for teachers over a date range, in a fixed number of queries.
+
+    ``load`` reads the weekly schedules, every session and the duty days of the
+    range in three queries and matches sessions to scheduled slots in memory.
+    Each (teacher, date) is memoized, so the report, missed classes and
+    performance score of the same day never query twice. Keep one engine per
+    request (see ``get_compliance_engine``).
+    """
+
+    def __init__(self):
+        self._days = {}
+
+    def load(self, teacher_ids, date_from, date_to=None):
+        """Compute and memoize every (teacher, date) of the range that is not loaded yet"""
+        date_to = date_to or date_from
+        days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+        teacher_ids = {teacher_id for teacher_id in teacher_ids if any((teacher_id, day) not in self._days for day in days)}
+        if not teacher_ids or not days:
+            return
+
+        weeks = get_week_schedules(teacher_ids)
+
+        # Sessions per (assignment, date), sorted by start time for bisect
+        sessions = defaultdict(list)
+        duty_days = set()
+        for session in AttendanceSession.objects.filter(
+            teacher_assignment__teacher_id__in=teacher_ids,
+            date__range=(date_from, date_to)
+        ).select_related('teacher_assignment').order_by('start_time', 'id'):
+            sessions[(session.teacher_assignment_id, session.date)].append(session)
+            if session.is_completed:
+                duty_days.add((session.teacher_assignment.teacher_id, session.date))
+        starts = {key: [session.start_time for session in day_sessions] for key, day_sessions in sessions.items()}
+
+        # Other significant activities count as duties too
+        duty_days.update(
+            TeacherActivityLog.objects.filter(
+                teacher_id__in=teacher_ids,
+                timestamp__date__range=(date_from, date_to),
+                activity_type__in=SIGNIFICANT_ACTIVITIES
+            ).values_list('teacher_id', 'timestamp__date').distinct()
+        )
+
+        for teacher_id in teacher_ids:
+            for day in days:
+                if (teacher_id, day) in self._days:
+                    continue
+
+                slots = []
+                for schedule in weeks[teacher_id].for_day(day.weekday()):
+                    # The first session starting inside the scheduled window belongs to the slot
+                    key = (schedule.subject_assignment_id, day)
+                    day_starts = starts.get(key, [])
+                    position = bisect_left(day_starts, schedule.start_time)
+                    session = None
+                    if position < len(day_starts) and day_starts[position] <= schedule.end_time:
+                        session = sessions[key][position]
+                    slots.append(self._slot(day, schedule, session))
+
+                self._days[(teacher_id, day)] = {
+                    'date': day,
+                    'slots': slots,
+                    'performed_duties': (teacher_id, day) in duty_days,
+                }
+
+    def _slot(self, day, schedule, session):
+        delay = None
+        if session:
+            scheduled = datetime.combine(day, schedule.start_time)
+            actual = datetime.combine(day, session.start_time)
+            delay = int((actual - scheduled).total_seconds() / 60) if actual > scheduled else 0
+
+        return {
+            'schedule': schedule,
+            'session': session,
+            'conducted': session is not None and session.is_completed,
+            'on_time': session is not None and session.start_time <= schedule.start_time,
+            'delay_minutes': delay,
+        }
+
+    def day(self, teacher_id, day):
+        """Compliance of one teacher on one day: {'date', 'slots', 'performed_duties'}"""
+        if (teacher_id, day) not in self._days:
+            self.load([teacher_id], day)
+        return self._days[(teacher_id, day)]
+
+    def report(self, teacher_id, day):
+        """Same rows as TeacherAttendance.get_schedule_compliance_report"""
+        return self.day(teacher_id, day)['slots']
+
+    def missed_classes(self, teacher_id, day):
+        return [slot for slot in self.report(teacher_id, day) if not slot['conducted']]
+
+    def performance_score(self, attendance):
+        """Same score as TeacherAttendance.get_performance_score, from the memoized day"""
+        compliance = self.day(attendance.teacher_id, attendance.date)
+        score = Decimal('0')
+
+        # Schedule compliance (40 points)
+        if attendance.classes_scheduled > 0:
+            score += (Decimal(str(attendance.attendance_percentage)) / Decimal('100')) * Decimal('40')
+        else:
+            score += Decimal('40')  # Full points if no classes scheduled but other duties performed
+
+        # Punctuality (20 points)
+        on_time_classes = sum(1 for slot in compliance['slots'] if slot['on_time'])
+        if attendance.classes_scheduled > 0:
+            score += (Decimal(str(on_time_classes)) / Decimal(str(attendance.classes_scheduled))) * Decimal('20')
+        else:
+            score += Decimal('20')
+
+        # Activity performance (40 points)
+        if compliance['performed_duties']:
+            score += Decimal('40')
+
+        return min(100, float(score.quantize(Decimal('0.1'))))
+
+    def summary(self, teacher_id, date_from, date_to):
+        """Totals for one teacher over a loaded range"""
+        self.load([teacher_id], date_from, date_to)
+        slots = []
+        day = date_from
+        while day <= date_to:
+            slots.extend(self._days[(teacher_id, day)]['slots'])
+            day += timedelta(days=1)
+
+        conducted = [slot for slot in slots if slot['conducted']]
+        delays = [slot['delay_minutes'] for slot in conducted if slot['delay_minutes'] is not None]
+        on_time = sum(1 for slot in conducted if slot['on_time'])
+        return {
+            'scheduled': len(slots),
+            'conducted': len(conducted),
+            'missed': len(slots) - len(conducted),
+            'on_time': on_time,
+            'late': len(conducted) - on_time,
+            'average_delay': round(sum(delays) / len(delays), 1) if delays else 0,
+            'compliance_percentage': round(len(conducted) / len(slots) * 100, 1) if slots else 0,
+            'punctuality_percentage': round(on_time / len(conducted) * 100, 1) if conducted else 0,
+        }
+
+
+def get_compliance_engine(request):
+    """The ComplianceEngine of this request, created on first use"""
+    engine = getattr(request, '_compliance_engine', None)
+    if engine is None:
+        engine = request._compliance_engine = ComplianceEngine()
+    return engine
@@ -0,0 +1,81 @@
+import math
+import threading
+import time as timer
+import numpy as np
+from .models import GeofenceLocation
+
+EARTH_RADIUS_METERS = 6371000
+
+# Fences saved in another process only reach this one through the TTL
+GEOFENCE_CACHE_TTL = 300  # seconds
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class GeofenceEngine:
+    """
+    All active geofences held as arrays of radians, for checking many points at once.
+
+    A point is inside a fence when its haversine term ``a`` is at most
+    sin²(radius / 2R), so containment needs no asin or sqrt. ``distances``
+    returns real distances in meters when they are needed.
+    """
+
+    def __init__(self, fences):
+        fences = list(fences)
+        self.fence_ids = [fence.id for fence in fences]
+        lats = [math.radians(float(fence.center_lat)) for fence in fences]
+        lngs = [math.radians(float(fence.center_lng)) for fence in fences]
+        radii = [float(fence.radius_meters) for fence in fences]
+        limits = [math.sin(min(radius / (2 * EARTH_RADIUS_METERS), math.pi / 2)) ** 2 for radius in radii]
+
+        self._lats = np.array(lats)
+        self._lngs = np.array(lngs)
+        self._cos_lats = np.cos(self._lats)
+        self._limits = np.array(limits)
+
+    def __len__(self):
+        return len(self.fence_ids)
+
+    def _haversine_terms(self, lats, lngs):
+        """(points x fences) matrix of the haversine term ``a``"""
+        lats = np.radians(np.asarray(lats, dtype=float))[:, None]
+        lngs = np.radians(np.asarray(lngs, dtype=float))[:, None]
+        return (
+            np.sin((lats - self._lats) / 2) ** 2
+            + np.cos(lats) * self._cos_lats * np.sin((lngs - self._lngs) / 2) ** 2
+        )
+
+    def contains_many(self, lats, lngs):
+        """For each point, whether it lies inside any active fence. Returns a list of bools."""
+        if not self.fence_ids or len(lats) == 0:
+            return [False] * len(lats)
+
+        return (self._haversine_terms(lats, lngs) <= self._limits).any(axis=1).tolist()
+
+    def contains(self, lat, lng):
+        return self.contains_many([lat], [lng])[0]
+
+    def distances(self, lats, lngs):
+        """Distance in meters from each point to each fence center, as a (points x fences) array"""
+        terms = np.clip(self._haversine_terms(lats, lngs), 0, 1)
+        return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(terms))
+
+
+def get_geofence_engine():
+    """Return the cached GeofenceEngine for the active fences, loading it on first use"""
+    now = timer.monotonic()
+    entry = _cache.get('engine')
+    if entry is not None and now - entry[0] < GEOFENCE_CACHE_TTL:
+        return entry[1]
+
+    engine = GeofenceEngine(GeofenceLocation.objects.filter(is_active=True).order_by('id'))
+    with _lock:
+        _cache['engine'] = (now, engine)
+    return engine
+
+
+def invalidate_geofence_engine():
+    with _lock:
+        _cache.clear()
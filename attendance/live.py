@@ -0,0 +1,272 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from uuid import uuid4
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+from academic.models import TeacherSubjectAssignment
+from accounts.models import TeacherProfile
+from .exports import full_name
+from .models import TeacherAttendance, AttendanceSession
+
+ATTENDANCE_FIELDS = [
+    'id', 'teacher_id', 'status', 'first_activity_time', 'last_activity_time',
+    'check_in_time', 'check_out_time', 'total_hours',
+]
+SESSION_FIELDS = ['id', 'teacher_assignment_id', 'start_time', 'end_time', 'is_completed', 'marked']
+STATUS_DISPLAY = dict(TeacherAttendance.STATUS_CHOICES)
+
+# Sent instead of the missed events when they are no longer known; the page reloads
+RESET_FRAME = 'event: reset\ndata: {}\n\n'
+
+
+def _clock(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = timezone.localtime(value)
+    return value.strftime('%H:%M')
+
+
+class _Subscriber:
+    def __init__(self, size):
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+
+class LiveBoard:
+    """
+    Today's TeacherAttendance and AttendanceSession changes as server-sent events.
+
+    There is one board per server process. While anyone is subscribed, a single
+    poller reads today's rows every ``LIVE_BOARD_POLL_INTERVAL`` seconds, diffs
+    them against the previous read and fans the changes out to every
+    subscriber, so idle viewers cost a queue each and no queries. Diffing also
+    catches bulk writes (the activity buffer, evaluate_many, offline sync) and
+    writes made by other processes, which signals would miss.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._task = None
+        self._token = None
+        self._sequence = 0
+        self._backlog = deque(maxlen=getattr(settings, 'LIVE_BOARD_BACKLOG', 500))
+        self._idle_since = 0
+        self._rows = None
+        self._day = None
+        self._teachers = {}
+        self._assignments = {}
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register a subscriber and start the poller if needed. Returns the
+        subscriber and the frames it missed since ``last_event_id``, or None
+        when they are no longer known (another process, a restart or a gap).
+        """
+        running = self._task is not None and not self._task.done()
+        missed = []
+        if last_event_id:
+            token, _, sequence = last_event_id.partition('-')
+            first_kept = self._backlog[0][0] if self._backlog else self._sequence + 1
+            if not running or token != self._token or not sequence.isdigit():
+                missed = None
+            elif not first_kept - 1 <= int(sequence) <= self._sequence:
+                missed = None
+            else:
+                missed = [frame for number, frame in self._backlog if number > int(sequence)]
+
+        subscriber = _Subscriber(getattr(settings, 'LIVE_BOARD_QUEUE_SIZE', 100))
+        self._subscribers.add(subscriber)
+        if not running:
+            self._token = uuid4().hex[:8]
+            self._sequence = 0
+            self._rows = None
+            self._backlog.clear()
+            self._task = asyncio.ensure_future(self._run())
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+        if not self._subscribers:
+            self._idle_since = asyncio.get_running_loop().time()
+
+    async def stream(self, last_event_id=None):
+        """
+        SSE frames for one viewer. The stream ends after ``LIVE_BOARD_STREAM_SECONDS``
+        and the browser reconnects with Last-Event-ID, so a client that went
+        away without the server noticing is dropped within that time.
+        """
+        loop = asyncio.get_running_loop()
+        heartbeat = getattr(settings, 'LIVE_BOARD_HEARTBEAT', 15)
+        deadline = loop.time() + getattr(settings, 'LIVE_BOARD_STREAM_SECONDS', 300)
+        subscriber, missed = self.subscribe(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            if missed is None:
+                yield RESET_FRAME
+                return
+            for frame in missed:
+                yield frame
+
+            while not subscriber.overflowed:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield frame
+
+            # This viewer fell too far behind to catch up event by event
+            yield RESET_FRAME
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = getattr(settings, 'LIVE_BOARD_POLL_INTERVAL', 2)
+        # Keep polling a little after the last viewer leaves, so reconnects can resume
+        grace = getattr(settings, 'LIVE_BOARD_IDLE_SECONDS', 30)
+        try:
+            while self._subscribers or loop.time() - self._idle_since < grace:
+                try:
+                    events = await sync_to_async(self._poll, thread_sensitive=False)()
+                except Exception as e:
+                    print(f"Error polling live attendance board: {e}")
+                    events = []
+                for kind, data in events:
+                    self._publish(kind, data)
+                await asyncio.sleep(interval)
+        finally:
+            self._task = None
+            self._rows = None
+            self._backlog.clear()
+
+    def _publish(self, kind, data):
+        self._sequence += 1
+        # Encode once, whatever the number of viewers
+        frame = f'id: {self._token}-{self._sequence}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+        self._backlog.append((self._sequence, frame))
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self._subscribers.discard(subscriber)
+
+    def _poll(self):
+        """Read today's rows and return the (kind, data) events since the previous read"""
+        close_old_connections()
+        try:
+            today = timezone.localdate()
+            rows = {}
+            for row in TeacherAttendance.objects.filter(date=today).values_list(*ATTENDANCE_FIELDS):
+                rows[('attendance', row[0])] = row
+            for row in AttendanceSession.objects.filter(date=today).annotate(
+                marked=Count('attendancerecord')
+            ).values_list(*SESSION_FIELDS):
+                rows[('session', row[0])] = row
+
+            previous, previous_day = self._rows, self._day
+            self._rows, self._day = rows, today
+            if previous is None:
+                return []  # Baseline read
+            if previous_day != today:
+                return [('reset', {'date': today.isoformat()})]
+
+            changed = [key for key, row in rows.items() if previous.get(key) != row]
+            removed = [key for key in previous if key not in rows]
+            if not changed and not removed:
+                return []
+
+            self._load_names(changed, rows)
+            events = [(kind, self._serialize(kind, rows[(kind, pk)])) for kind, pk in changed]
+            events.extend((kind, {'id': pk, 'deleted': True}) for kind, pk in removed)
+            if any(kind == 'attendance' for kind, _ in changed + removed):
+                events.append(('summary', self._summary(rows)))
+            return events
+        finally:
+            close_old_connections()
+
+    def _load_names(self, keys, rows):
+        """Teacher names and session subjects not seen before, in at most two queries"""
+        # Both row layouts hold the teacher or assignment id second
+        teacher_ids = {rows[key][1] for key in keys if key[0] == 'attendance'} - self._teachers.keys()
+        assignment_ids = {rows[key][1] for key in keys if key[0] == 'session'} - self._assignments.keys()
+
+        if teacher_ids:
+            for pk, first_name, last_name, username in TeacherProfile.objects.filter(
+                id__in=teacher_ids
+            ).values_list('id', 'user__first_name', 'user__last_name', 'user__username'):
+                self._teachers[pk] = full_name(first_name, last_name) or username
+
+        if assignment_ids:
+            for pk, teacher_id, first_name, last_name, username, subject, class_name in TeacherSubjectAssignment.objects.filter(
+                id__in=assignment_ids
+            ).values_list(
+                'id', 'teacher_id', 'teacher__user__first_name', 'teacher__user__last_name',
+                'teacher__user__username', 'subject__name', 'class_assigned__name'
+            ):
+                self._teachers[teacher_id] = full_name(first_name, last_name) or username
+                self._assignments[pk] = (teacher_id, subject, class_name)
+
+    def _serialize(self, kind, row):
+        if kind == 'attendance':
+            pk, teacher_id, status, first_activity, last_activity, check_in, check_out, total_hours = row
+            return {
+                'id': pk,
+                'teacher_id': teacher_id,
+                'teacher': self._teachers.get(teacher_id, ''),
+                'status': status,
+                'status_display': STATUS_DISPLAY.get(status, status),
+                'first_activity': _clock(first_activity),
+                'last_activity': _clock(last_activity),
+                'check_in': _clock(check_in),
+                'check_out': _clock(check_out),
+                'total_hours': f'{total_hours:.1f}',
+            }
+
+        pk, assignment_id, start_time, end_time, is_completed, marked = row
+        teacher_id, subject, class_name = self._assignments.get(assignment_id, (None, '', ''))
+        return {
+            'id': pk,
+            'teacher_id': teacher_id,
+            'teacher': self._teachers.get(teacher_id, ''),
+            'subject': subject,
+            'class': class_name,
+            'start_time': _clock(start_time),
+            'end_time': _clock(end_time),
+            'is_completed': is_completed,
+            'marked': marked,
+        }
+
+    def _summary(self, rows):
+        """The dashboard's summary cards, from today's attendance rows"""
+        statuses = [row[2] for (kind, _), row in rows.items() if kind == 'attendance']
+        total = len(statuses)
+        present = statuses.count('present')
+        late = statuses.count('late')
+        on_leave = statuses.count('on_leave')
+        return {
+            'present': present,
+            'late': late,
+            'on_leave': on_leave,
+            'absent': total - present - late - on_leave,
+            'total': total,
+            'attendance_percentage': round(present / total * 100, 1) if total else 0,
+        }
+
+
+_board = LiveBoard()
+
+
+def get_live_board():
+    """The LiveBoard of this process"""
+    return _board
@@ -0,0 +1,116 @@
+import csv
+import gzip
+import os
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+from attendance.models import TeacherActivityLog
+from attendance.activity_rollup import hour_start, rebuild_activity_rollup
+
+ARCHIVE_FIELDS = [
+    'id', 'teacher_id', 'activity_type', 'priority_level', 'description', 'timestamp', 'ip_address',
+    'user_agent', 'location_lat', 'location_lng', 'is_on_campus', 'related_schedule_id', 'related_session_id',
+]
+
+
+class Command(BaseCommand):
+    help = 'Move teacher activity logs older than N days into compressed per-month CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Archive logs older than this many days (default: 90)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            default=None,
+            help='Directory for the archive files. Defaults to settings.TEACHER_ACTIVITY_ARCHIVE_DIR.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per query (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only show how many logs would be archived per month',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['chunk_size'] < 1:
+            self.stdout.write(self.style.ERROR('--days and --chunk-size must be positive.'))
+            return
+
+        output_dir = options['output_dir'] or getattr(
+            settings, 'TEACHER_ACTIVITY_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archives', 'teacher_activity')
+        )
+
+        # Archive whole UTC days so no rollup hour is split between archived and live logs
+        cutoff_day = (timezone.now() - timedelta(days=options['days'])).astimezone(dt_timezone.utc).date()
+        cutoff = datetime.combine(cutoff_day, time.min, tzinfo=dt_timezone.utc)
+
+        oldest = TeacherActivityLog.objects.filter(timestamp__lt=cutoff).aggregate(oldest=Min('timestamp'))['oldest']
+        if oldest is None:
+            self.stdout.write(self.style.WARNING(f'No activity logs before {cutoff_day}. Nothing to archive.'))
+            return
+
+        self.stdout.write(f'Archiving teacher activity logs before {cutoff_day} into {output_dir}')
+        if not options['dry_run']:
+            os.makedirs(output_dir, exist_ok=True)
+
+        total_archived = 0
+        range_start = hour_start(oldest)
+        while range_start < cutoff:
+            month_start = range_start.replace(day=1, hour=0)
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            range_end = min(next_month, cutoff)
+
+            logs = TeacherActivityLog.objects.filter(timestamp__gte=range_start, timestamp__lt=range_end)
+            label = month_start.strftime('%Y-%m')
+
+            if options['dry_run']:
+                self.stdout.write(f'  {label}: {logs.count()} logs')
+            else:
+                # Make sure the rollup covers these logs before the raw rows go away
+                rebuild_activity_rollup(range_start, range_end)
+
+                path = os.path.join(output_dir, f'teacher_activity_{label}.csv.gz')
+                written = self._write_archive(path, logs)
+                deleted = self._delete_in_chunks(logs, options['chunk_size'])
+                total_archived += deleted
+                self.stdout.write(f'  {label}: wrote {written} logs to {path}, deleted {deleted}')
+
+            range_start = range_end
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Dry run complete. Nothing was changed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Completed! Archived {total_archived} activity logs.'))
+
+    def _write_archive(self, path, logs):
+        """Append the logs to the month's gzip file (a new gzip member per run)"""
+        new_file = not os.path.exists(path)
+        written = 0
+        with gzip.open(path, 'at', newline='', encoding='utf-8') as archive:
+            writer = csv.writer(archive)
+            if new_file:
+                writer.writerow(ARCHIVE_FIELDS)
+            for row in logs.order_by('id').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=2000):
+                writer.writerow(row)
+                written += 1
+        return written
+
+    def _delete_in_chunks(self, logs, chunk_size):
+        deleted = 0
+        while True:
+            ids = list(logs.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            deleted += TeacherActivityLog.objects.filter(id__in=ids).delete()[0]
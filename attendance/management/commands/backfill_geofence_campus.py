@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from attendance.models import TeacherActivityLog, GeofenceLocation
+from attendance.geofence import GeofenceEngine
+
+
+class Command(BaseCommand):
+    help = 'Recompute is_on_campus for activity logs with coordinates against the active geofences'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Logs checked per pass (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the logs that would change',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            self.stdout.write(self.style.ERROR('--chunk-size must be positive.'))
+            return
+
+        # Load the fences fresh instead of using the per-process cache
+        engine = GeofenceEngine(GeofenceLocation.objects.filter(is_active=True).order_by('id'))
+        if not len(engine):
+            self.stdout.write(self.style.WARNING('No active geofence locations. Every log with coordinates will be marked off campus.'))
+
+        logs = TeacherActivityLog.objects.filter(
+            location_lat__isnull=False,
+            location_lng__isnull=False
+        ).annotate(
+            # Floats straight from the database, skipping the Decimal conversion
+            lat=Cast('location_lat', FloatField()),
+            lng=Cast('location_lng', FloatField())
+        ).order_by('id')
+
+        checked = moved_on = moved_off = 0
+        last_id = 0
+        while True:
+            rows = list(logs.filter(id__gt=last_id).values_list('id', 'lat', 'lng', 'is_on_campus')[:chunk_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            ids, lats, lngs, current = zip(*rows)
+            inside = engine.contains_many(lats, lngs)
+
+            on_ids = [log_id for log_id, now_in, was_in in zip(ids, inside, current) if now_in and not was_in]
+            off_ids = [log_id for log_id, now_in, was_in in zip(ids, inside, current) if was_in and not now_in]
+            if not options['dry_run']:
+                if on_ids:
+                    TeacherActivityLog.objects.filter(id__in=on_ids).update(is_on_campus=True)
+                if off_ids:
+                    TeacherActivityLog.objects.filter(id__in=off_ids).update(is_on_campus=False)
+
+            checked += len(rows)
+            moved_on += len(on_ids)
+            moved_off += len(off_ids)
+            self.stdout.write(f'  checked {checked} logs (up to id {last_id})')
+
+        summary = f'{checked} logs checked, {moved_on} now on campus, {moved_off} now off campus.'
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Dry run complete. {summary} Nothing was changed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Completed! {summary}'))
@@ -0,0 +1,127 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from datetime import date, time
+import time as timer
+from accounts.models import User, StudentProfile, TeacherProfile
+from academic.models import (
+    AcademicYear, Department, Course, Subject, Class, StudentEnrollment, TeacherSubjectAssignment
+)
+from attendance.models import AttendanceSession
+from attendance.bulk import upsert_attendance_records
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the bulk attendance upsert and show that its query count does not grow with class size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='10,30,120,480',
+            help='Comma separated class sizes to benchmark (default: 10,30,120,480)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            self.stdout.write(self.style.ERROR('Invalid --sizes value. Use e.g. 10,30,120'))
+            return
+
+        self.stdout.write('Benchmarking bulk attendance upsert (all data is rolled back)')
+        self.stdout.write(f"{'Students':>10} {'Insert queries':>16} {'Update queries':>16} {'Insert ms':>10} {'Update ms':>10}")
+
+        # Everything created here is discarded at the end of the block
+        with transaction.atomic():
+            for size in sizes:
+                session, attendance_data = self._build_class(size)
+
+                insert_queries, insert_ms, result = self._measure(session, attendance_data)
+                if result['inserted'] != size or result['rejected']:
+                    self.stdout.write(self.style.ERROR(f'  Unexpected insert result for {size} students: {result}'))
+
+                for row in attendance_data:
+                    row['status'] = 'absent'
+                update_queries, update_ms, result = self._measure(session, attendance_data)
+                if result['updated'] != size or result['rejected']:
+                    self.stdout.write(self.style.ERROR(f'  Unexpected update result for {size} students: {result}'))
+
+                self.stdout.write(
+                    f'{size:>10} {insert_queries:>16} {update_queries:>16} {insert_ms:>10.1f} {update_ms:>10.1f}'
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed.'))
+
+    def _measure(self, session, attendance_data):
+        """Run one upsert and return (query count, elapsed milliseconds, result)"""
+        start = timer.perf_counter()
+        with CaptureQueriesContext(connection) as context:
+            result = upsert_attendance_records(session, attendance_data)
+        elapsed_ms = (timer.perf_counter() - start) * 1000
+        return len(context.captured_queries), elapsed_ms, result
+
+    def _build_class(self, size):
+        """Create a class with ``size`` enrolled students and an attendance session"""
+        tag = f'BENCH{size}'
+
+        academic_year = AcademicYear.objects.create(
+            year=f'{tag}-YEAR',
+            start_date=date(2025, 8, 1),
+            end_date=date(2026, 7, 31)
+        )
+        department = Department.objects.create(name=f'{tag} Department', code=tag[:10])
+        course = Course.objects.create(name=f'{tag} Course', code=f'{tag}-C', department=department)
+        subject = Subject.objects.create(name=f'{tag} Subject', code=f'{tag}-S', course=course, semester=1, year=1)
+        class_obj = Class.objects.create(
+            name=f'{tag} Class', course=course, year=1, semester=1, section='A', academic_year=academic_year
+        )
+
+        teacher_user = User.objects.create(username=f'{tag.lower()}_teacher', user_type='teacher')
+        teacher = TeacherProfile.objects.create(
+            user=teacher_user,
+            employee_id=f'{tag}-T',
+            qualification='Benchmark',
+            specialization='Benchmark',
+            joining_date=date(2025, 8, 1)
+        )
+        assignment = TeacherSubjectAssignment.objects.create(
+            teacher=teacher, subject=subject, class_assigned=class_obj, academic_year=academic_year
+        )
+
+        users = User.objects.bulk_create([
+            User(username=f'{tag.lower()}_student_{i}', user_type='student') for i in range(size)
+        ])
+        if users[0].pk is None:
+            users = list(User.objects.filter(username__startswith=f'{tag.lower()}_student_'))
+
+        students = StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user=user,
+                student_id=f'{tag}-{i}',
+                admission_date=date(2025, 8, 1),
+                guardian_name='Benchmark',
+                guardian_phone='9800000000',
+                guardian_email='benchmark@example.com',
+                emergency_contact='9800000000'
+            )
+            for i, user in enumerate(users)
+        ])
+        if students[0].pk is None:
+            students = list(StudentProfile.objects.filter(student_id__startswith=f'{tag}-'))
+
+        StudentEnrollment.objects.bulk_create([
+            StudentEnrollment(student=student, class_enrolled=class_obj) for student in students
+        ])
+
+        session = AttendanceSession.objects.create(
+            teacher_assignment=assignment,
+            date=date(2025, 9, 1),
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            is_completed=True
+        )
+        attendance_data = [{'student_id': student.id, 'status': 'present'} for student in students]
+        return session, attendance_data
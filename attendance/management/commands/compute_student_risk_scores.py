@@ -0,0 +1,63 @@
+import time as timer
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from attendance.risk import RiskScorer, HIGH_RISK_SCORE, MEDIUM_RISK_SCORE
+
+
+class Command(BaseCommand):
+    help = 'Recompute the at-risk score of every student (run nightly, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Score as of this date (YYYY-MM-DD format). If not provided, uses today.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows written per query (default: 2000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute and show the risk levels without saving them',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                self.stdout.write(self.style.ERROR('Invalid date format. Use YYYY-MM-DD.'))
+                return
+
+        if options['batch_size'] < 1:
+            self.stdout.write(self.style.ERROR('--batch-size must be positive.'))
+            return
+
+        started = timer.monotonic()
+        scorer = RiskScorer(today)
+
+        self.stdout.write(f'Scoring {len(scorer.student_ids)} students as of {scorer.today}')
+        results = scorer.compute()
+        computed = timer.monotonic()
+        self.stdout.write(f'  Computed in {computed - started:.1f}s')
+
+        levels = results['risk_level']
+        self.stdout.write(
+            f'  High risk (>= {HIGH_RISK_SCORE}): {(levels == "high").sum()}, '
+            f'medium (>= {MEDIUM_RISK_SCORE}): {(levels == "medium").sum()}, low: {(levels == "low").sum()}'
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing saved.'))
+            return
+
+        saved = scorer.save(results, batch_size=options['batch_size'])
+        self.stdout.write(f'  Saved in {timer.monotonic() - computed:.1f}s')
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCompleted! Saved risk scores for {saved} students in {timer.monotonic() - started:.1f}s.')
+        )
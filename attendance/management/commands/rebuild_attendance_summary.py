@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+from datetime import datetime
+from attendance.models import AttendanceSession
+from attendance.summary import rebuild_attendance_summary
+
+
+class Command(BaseCommand):
+    help = 'Recompute monthly AttendanceSummary rows from attendance records for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            type=str,
+            help='First date to rebuild (YYYY-MM-DD format). Defaults to the start of the current month.',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            type=str,
+            help='Last date to rebuild (YYYY-MM-DD format). Defaults to today.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild every month that has attendance sessions',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+
+        if options['all']:
+            bounds = AttendanceSession.objects.aggregate(first=Min('date'), last=Max('date'))
+            if bounds['first'] is None:
+                self.stdout.write(self.style.WARNING('No attendance sessions found. Nothing to rebuild.'))
+                return
+            date_from, date_to = bounds['first'], bounds['last']
+        else:
+            try:
+                date_from = (
+                    datetime.strptime(options['date_from'], '%Y-%m-%d').date()
+                    if options['date_from'] else today.replace(day=1)
+                )
+                date_to = (
+                    datetime.strptime(options['date_to'], '%Y-%m-%d').date()
+                    if options['date_to'] else today
+                )
+            except ValueError:
+                self.stdout.write(self.style.ERROR('Invalid date format. Use YYYY-MM-DD.'))
+                return
+
+        if date_from > date_to:
+            self.stdout.write(self.style.ERROR('--from must not be after --to.'))
+            return
+
+        self.stdout.write(f'Rebuilding attendance summaries from {date_from} to {date_to} (whole months)')
+
+        written = rebuild_attendance_summary(date_from, date_to)
+
+        self.stdout.write(self.style.SUCCESS(f'Completed! Wrote {written} summary rows.'))
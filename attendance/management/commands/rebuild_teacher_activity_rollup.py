@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from attendance.models import TeacherActivityLog
+from attendance.activity_rollup import rebuild_activity_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the hourly TeacherActivityHourly rollup from raw activity logs for a date range. '
+        'Run it after deleting logs outside archive_teacher_activity, which the rollup does not subtract.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            type=str,
+            help='First date to rebuild (YYYY-MM-DD format). Defaults to today.',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            type=str,
+            help='Last date to rebuild (YYYY-MM-DD format). Defaults to today.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild every day that has raw activity logs',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+
+        if options['all']:
+            bounds = TeacherActivityLog.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+            if bounds['first'] is None:
+                self.stdout.write(self.style.WARNING('No activity logs found. Nothing to rebuild.'))
+                return
+            date_from, date_to = bounds['first'].date(), bounds['last'].date()
+        else:
+            try:
+                date_from = datetime.strptime(options['date_from'], '%Y-%m-%d').date() if options['date_from'] else today
+                date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date() if options['date_to'] else today
+            except ValueError:
+                self.stdout.write(self.style.ERROR('Invalid date format. Use YYYY-MM-DD.'))
+                return
+
+        if date_from > date_to:
+            self.stdout.write(self.style.ERROR('--from must not be after --to.'))
+            return
+
+        self.stdout.write(f'Rebuilding teacher activity rollup from {date_from} to {date_to}')
+
+        written = rebuild_activity_rollup(
+            datetime.combine(date_from, time.min, tzinfo=dt_timezone.utc),
+            datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Completed! Wrote {written} rollup rows.'))
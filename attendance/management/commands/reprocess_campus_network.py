@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from attendance.models import TeacherActivityLog, CampusNetwork
+from attendance.campus_network import CampusNetworkIndex
+
+# Addresses per IN (...) list, well below SQLite's bound parameter limit
+IP_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluate is_on_campus of past activity logs from their IP address and the current campus networks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Reprocess the last N days including today (default: 7). Ignored when --from is given.',
+        )
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            type=str,
+            help='First date to reprocess (YYYY-MM-DD format)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            type=str,
+            help='Last date to reprocess (YYYY-MM-DD format). Defaults to today.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the logs that would change',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        try:
+            if options['date_from']:
+                date_from = datetime.strptime(options['date_from'], '%Y-%m-%d').date()
+            else:
+                date_from = today - timedelta(days=max(options['days'], 1) - 1)
+            date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date() if options['date_to'] else today
+        except ValueError:
+            self.stdout.write(self.style.ERROR('Invalid date format. Use YYYY-MM-DD.'))
+            return
+
+        if date_from > date_to:
+            self.stdout.write(self.style.ERROR('--from must not be after --to.'))
+            return
+
+        # Compile the table fresh instead of using the per-process cache
+        index = CampusNetworkIndex(CampusNetwork.objects.filter(is_active=True).values_list('cidr', flat=True))
+        self.stdout.write(f'Reprocessing activity logs from {date_from} to {date_to} against {len(index)} campus address ranges')
+
+        # Logs with coordinates are decided by the geofences (see backfill_geofence_campus)
+        logs = TeacherActivityLog.objects.filter(
+            timestamp__gte=datetime.combine(date_from, time.min, tzinfo=dt_timezone.utc),
+            timestamp__lt=datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+            location_lat__isnull=True,
+            ip_address__isnull=False
+        )
+
+        # Every log from one address gets the same answer, so look up each distinct address once
+        on_campus_ips = []
+        off_campus_ips = []
+        for ip_address in logs.order_by().values_list('ip_address', flat=True).distinct():
+            (on_campus_ips if index.contains(ip_address) else off_campus_ips).append(ip_address)
+
+        moved_on = self._update(logs.filter(is_on_campus=False), on_campus_ips, True, options['dry_run'])
+        moved_off = self._update(logs.filter(is_on_campus=True), off_campus_ips, False, options['dry_run'])
+
+        summary = (f'{len(on_campus_ips) + len(off_campus_ips)} addresses checked, '
+                   f'{moved_on} logs now on campus, {moved_off} logs now off campus.')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Dry run complete. {summary} Nothing was changed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Completed! {summary}'))
+
+    def _update(self, logs, ip_addresses, is_on_campus, dry_run):
+        changed = 0
+        for start in range(0, len(ip_addresses), IP_BATCH_SIZE):
+            batch = logs.filter(ip_address__in=ip_addresses[start:start + IP_BATCH_SIZE])
+            changed += batch.count() if dry_run else batch.update(is_on_campus=is_on_campus)
+        return changed
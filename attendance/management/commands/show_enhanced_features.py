@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from accounts.models import TeacherProfile
 from attendance.models import TeacherAttendance, TeacherActivityLog, TeacherSchedule, GeofenceLocation
+from attendance.compliance import ComplianceEngine
 
 User = get_user_model()
 
@@ -156,7 +157,11 @@ class Command(BaseCommand):
         # Recent Performance Summary
         if today_attendance > 0:
             attendances = TeacherAttendance.objects.filter(date=today)
-            avg_performance = sum(att.get_performance_score() for att in attendances) / attendances.count()
+            
+            # Compliance for every teacher of the day in one pass
+            compliance = ComplianceEngine()
+            compliance.load([att.teacher_id for att in attendances], today)
+            avg_performance = sum(att.get_performance_score(compliance) for att in attendances) / attendances.count()
             present_count = attendances.filter(status__in=['present', 'late']).count()
             
             self.stdout.write(f'\n📈 TODAY\'S PERFORMANCE SUMMARY:')
@@ -167,7 +172,7 @@ class Command(BaseCommand):
             # Show top performer
             top_performer = attendances.order_by('-attendance_percentage', '-total_hours').first()
             if top_performer:
-                self.stdout.write(f'  🏆 Top Performer: {top_performer.teacher.user.get_full_name()} ({top_performer.get_performance_score()}/100)')
+                self.stdout.write(f'  🏆 Top Performer: {top_performer.teacher.user.get_full_name()} ({top_performer.get_performance_score(compliance)}/100)')
         
         self.stdout.write('\n' + '=' * 70)
         self.stdout.write(self.style.SUCCESS('🎉 ENHANCED AUTOMATIC ATTENDANCE SYSTEM READY!'))
@@ -1,8 +1,49 @@
+import hashlib
+import json
+import os
+import tempfile
+import time as timer
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-from attendance.models import TeacherAttendance
-from accounts.models import TeacherProfile
+
+# Models are imported inside the functions: spawn/forkserver pool workers import this
+# module to unpickle _init_worker and _evaluate_chunk before Django is set up.
+
+# A chunk that fails with OperationalError (e.g. "database is locked") is retried
+# this many times, waiting 1s, 2s, 4s... in between
+CHUNK_RETRIES = 3
+
+
+def _init_worker():
+    """Give every pool process its own database connections"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Forked workers inherit the parent's connections, which must not be shared
+    connections.close_all()
+
+
+def _evaluate_chunk(chunk):
+    """Evaluate one (teachers, date range) chunk. Runs in a pool process or inline."""
+    from attendance.models import TeacherAttendance
+
+    index, teacher_ids, date_from, date_to, create_missing = chunk
+    result = TeacherAttendance.evaluate_many(teacher_ids, date_from, date_to, create_missing=create_missing)
+    return {
+        'index': index,
+        'created': result['created'],
+        'evaluated': len(result['records']),
+        'changed': [
+            (attendance.id, attendance.teacher_id, attendance.date.isoformat(), old_status, attendance.status)
+            for attendance, old_status in result['changed']
+        ],
+    }
+
 
 class Command(BaseCommand):
     help = 'Update teacher attendance status based on real activities'
@@ -24,8 +65,40 @@ class Command(BaseCommand):
             action='store_true',
             help='Update all teachers, creating attendance records if they don\'t exist',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes, each with its own database connection (default: 1, no pool)',
+        )
+        parser.add_argument(
+            '--chunk-teachers',
+            type=int,
+            default=50,
+            help='Teachers per chunk (default: 50)',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Days per chunk (default: 31)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the chunks an interrupted run with the same options already finished',
+        )
+        parser.add_argument(
+            '--state-file',
+            type=str,
+            default=os.path.join(tempfile.gettempdir(), 'update_teacher_attendance_status.json'),
+            help='Where finished chunks are recorded for --resume',
+        )
 
     def handle(self, *args, **options):
+        from attendance.models import TeacherAttendance
+        from accounts.models import TeacherProfile
+
         # Determine date range
         if options['date']:
             try:
@@ -38,88 +111,201 @@ class Command(BaseCommand):
         else:
             start_date = timezone.now().date()
 
+        if min(options['days'], options['workers'], options['chunk_teachers'], options['chunk_days']) < 1:
+            self.stdout.write(self.style.ERROR('--days, --workers, --chunk-teachers and --chunk-days must be positive.'))
+            return
+
         days = options['days']
-        dates_to_update = [start_date - timedelta(days=i) for i in range(days)]
+        first_date = start_date - timedelta(days=days - 1)
 
         self.stdout.write(f'Updating teacher attendance for {days} day(s) starting from {start_date}')
 
-        total_updated = 0
-        total_created = 0
-
-        for date in dates_to_update:
-            self.stdout.write(f'\nProcessing date: {date}')
-            
-            if options['all_teachers']:
-                # Get all teachers and ensure they have attendance records
-                teachers = TeacherProfile.objects.all()
-                
-                for teacher in teachers:
-                    attendance, created = TeacherAttendance.objects.get_or_create(
-                        teacher=teacher,
-                        date=date,
-                        defaults={
-                            'status': 'absent',
-                            'is_auto_marked': True
-                        }
-                    )
-                    
-                    if created:
-                        total_created += 1
-                        self.stdout.write(f'  Created attendance record for {teacher.user.get_full_name()}')
-                    
-                    # Update status based on real activities
-                    old_status = attendance.status
-                    attendance.determine_status_advanced()
-                    attendance.save()
-                    
-                    if old_status != attendance.status:
-                        total_updated += 1
-                        self.stdout.write(
-                            f'  Updated {teacher.user.get_full_name()}: {old_status} → {attendance.status}'
-                        )
-                        
-                        # Show duties performed
-                        duties = attendance.get_duties_performed()
-                        if duties:
-                            self.stdout.write(f'    Duties: {len(duties)} activities performed')
-                        else:
-                            self.stdout.write(f'    No duties performed')
-                        
-                        # Show subjects not attended
-                        not_attended = attendance.get_subjects_not_attended()
-                        if not_attended:
-                            self.stdout.write(f'    Subjects not attended: {len(not_attended)}')
-            else:
-                # Update existing attendance records only
-                attendance_records = TeacherAttendance.objects.filter(date=date)
-                
-                for attendance in attendance_records:
-                    old_status = attendance.status
-                    attendance.determine_status_advanced()
-                    attendance.save()
-                    
-                    if old_status != attendance.status:
-                        total_updated += 1
-                        self.stdout.write(
-                            f'  Updated {attendance.teacher.user.get_full_name()}: {old_status} → {attendance.status}'
-                        )
+        if options['all_teachers']:
+            # Evaluate all teachers, creating attendance records if they don't exist
+            teacher_ids = list(TeacherProfile.objects.order_by('id').values_list('id', flat=True))
+        else:
+            # Update existing attendance records only
+            teacher_ids = list(TeacherAttendance.objects.filter(
+                date__range=(first_date, start_date)
+            ).order_by('teacher_id').values_list('teacher_id', flat=True).distinct())
+        create_missing = options['all_teachers']
+
+        # Split the (teacher, date) space into chunks
+        chunks = []
+        for offset in range(0, len(teacher_ids), options['chunk_teachers']):
+            chunk_teachers = teacher_ids[offset:offset + options['chunk_teachers']]
+            window_start = first_date
+            while window_start <= start_date:
+                window_end = min(window_start + timedelta(days=options['chunk_days'] - 1), start_date)
+                chunks.append((len(chunks), chunk_teachers, window_start, window_end, create_missing))
+                window_start = window_end + timedelta(days=1)
+
+        state = self._load_state(options, teacher_ids, start_date)
+        if state is None:
+            return
+        pending = [chunk for chunk in chunks if chunk[0] not in state['done']]
+        if len(pending) < len(chunks):
+            self.stdout.write(f'Resuming: {len(chunks) - len(pending)} of {len(chunks)} chunks already done')
+
+        self.stdout.write(
+            f'{len(teacher_ids)} teachers x {days} day(s) in {len(chunks)} chunks, {options["workers"]} worker(s)'
+        )
+
+        started = timer.monotonic()
+        finished = evaluated = 0
+        changed = []
+        self.failed = []
+        for result in self._run(pending, options['workers']):
+            state['done'].append(result['index'])
+            state['created'] += result['created']
+            state['updated'] += len(result['changed'])
+            self._save_state(options['state_file'], state)
+
+            finished += 1
+            evaluated += result['evaluated']
+            changed.extend(result['changed'])
+            elapsed = timer.monotonic() - started
+            done = len(state['done'])
+            rate = evaluated / elapsed if elapsed else 0
+            remaining = (len(pending) - finished) * elapsed / finished
+            self.stdout.write(
+                f'  [{done}/{len(chunks)}] {done / len(chunks) * 100:.1f}% - {evaluated} records in {elapsed:.1f}s '
+                f'({rate:.0f} records/s), about {remaining:.0f}s left'
+            )
+
+        if options['verbosity'] > 1:
+            self._show_changes(changed, options['all_teachers'])
+
+        if self.failed:
+            # Keep the state file so --resume only reruns the failed chunks
+            self.stdout.write(self.style.ERROR(
+                f'\n{len(self.failed)} chunk(s) still failed after retrying: '
+                + ', '.join(f'#{index} ({error})' for index, error in self.failed)
+                + '. Run again with --resume to finish them.'
+            ))
+        elif os.path.exists(options['state_file']):
+            os.remove(options['state_file'])
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'\nCompleted! Created {total_created} new records, updated {total_updated} existing records.'
+                f'\nCompleted! Created {state["created"]} new records, updated {state["updated"]} existing records.'
             )
         )
-        
+
         # Show summary statistics
         self.stdout.write('\nSummary for processed dates:')
-        for date in dates_to_update:
-            attendance_records = TeacherAttendance.objects.filter(date=date)
-            present_count = attendance_records.filter(status__in=['present', 'late']).count()
-            absent_count = attendance_records.filter(status='absent').count()
-            total_count = attendance_records.count()
-            
-            if total_count > 0:
-                percentage = (present_count / total_count) * 100
-                self.stdout.write(
-                    f'  {date}: {present_count}/{total_count} present ({percentage:.1f}%), {absent_count} absent'
-                )
+        summary = TeacherAttendance.objects.filter(
+            date__range=(first_date, start_date)
+        ).values('date').annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status__in=['present', 'late'])),
+            absent=Count('id', filter=Q(status='absent')),
+        ).order_by('-date')
+        for row in summary:
+            percentage = (row['present'] / row['total']) * 100
+            self.stdout.write(
+                f'  {row["date"]}: {row["present"]}/{row["total"]} present ({percentage:.1f}%), {row["absent"]} absent'
+            )
+
+    def _run(self, chunks, workers):
+        """Yield chunk results as they finish. Chunks that keep failing are added to self.failed."""
+        if workers == 1 or len(chunks) < 2:
+            retry = chunks
+        else:
+            retry = []
+            # Workers open their own connections; close ours so none is inherited mid-use
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {pool.submit(_evaluate_chunk, chunk): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    try:
+                        yield future.result()
+                    except OperationalError as e:
+                        # Don't let one locked chunk abort the others; run it again once the pool is done
+                        self.stdout.write(self.style.WARNING(f'  Chunk #{futures[future][0]} failed ({e}), will retry'))
+                        retry.append(futures[future])
+
+        for chunk in retry:
+            result = self._evaluate_with_retry(chunk)
+            if result is not None:
+                yield result
+
+    def _evaluate_with_retry(self, chunk):
+        """Run one chunk inline, backing off on OperationalError. Returns None when it still fails."""
+        delay = 1
+        for attempt in range(CHUNK_RETRIES + 1):
+            try:
+                return _evaluate_chunk(chunk)
+            except OperationalError as e:
+                if attempt == CHUNK_RETRIES:
+                    self.failed.append((chunk[0], e))
+                    return None
+                self.stdout.write(self.style.WARNING(f'  Chunk #{chunk[0]} failed ({e}), retrying in {delay}s'))
+                timer.sleep(delay)
+                delay *= 2
+
+    def _load_state(self, options, teacher_ids, start_date):
+        """The resume state for this run, or None when --resume does not match the previous run"""
+        signature = {
+            'start_date': start_date.isoformat(),
+            'days': options['days'],
+            'all_teachers': options['all_teachers'],
+            'chunk_teachers': options['chunk_teachers'],
+            'chunk_days': options['chunk_days'],
+            'teachers': hashlib.sha1(json.dumps(teacher_ids).encode()).hexdigest(),
+        }
+        fresh = {'signature': signature, 'done': [], 'created': 0, 'updated': 0}
+
+        if not options['resume']:
+            return fresh
+        try:
+            with open(options['state_file']) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            self.stdout.write(self.style.WARNING('No previous run to resume. Starting from the beginning.'))
+            return fresh
+
+        if state.get('signature') != signature:
+            self.stdout.write(self.style.ERROR(
+                'The previous run used different options or teachers. Run again without --resume.'
+            ))
+            return None
+        return state
+
+    def _save_state(self, path, state):
+        # Write then rename, so an interruption never leaves a half-written file
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as state_file:
+            json.dump(state, state_file)
+        os.replace(temporary, path)
+
+    def _show_changes(self, changed, all_teachers):
+        from attendance.models import TeacherAttendance
+
+        attendance_ids = [attendance_id for attendance_id, *_ in changed]
+        attendances = {}
+        for offset in range(0, len(attendance_ids), 500):
+            attendances.update(TeacherAttendance.objects.filter(
+                id__in=attendance_ids[offset:offset + 500]
+            ).select_related('teacher__user').in_bulk())
+
+        for attendance_id, teacher_id, date, old_status, new_status in sorted(changed, key=lambda item: item[2], reverse=True):
+            attendance = attendances.get(attendance_id)
+            if attendance is None:
+                continue
+            self.stdout.write(
+                f'  {date} Updated {attendance.teacher.user.get_full_name()}: {old_status} → {new_status}'
+            )
+
+            if all_teachers:
+                # Show duties performed
+                duties = attendance.get_duties_performed()
+                if duties:
+                    self.stdout.write(f'    Duties: {len(duties)} activities performed')
+                else:
+                    self.stdout.write(f'    No duties performed')
+
+                # Show subjects not attended
+                not_attended = attendance.get_subjects_not_attended()
+                if not_attended:
+                    self.stdout.write(f'    Subjects not attended: {len(not_attended)}')
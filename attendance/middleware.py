@@ -1,11 +1,26 @@
+from django.conf import settings
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
-from datetime import datetime, time
-from .models import TeacherAttendance, TeacherActivityLog, TeacherSchedule, GeofenceLocation
+from datetime import time
+from decimal import Decimal, InvalidOperation
+from .models import TeacherAttendance, TeacherActivityLog, GeofenceLocation
+from .buffer import activity_buffer
+from .schedule_index import get_week_schedule
+from .activity_rules import classify
+from .geofence import get_geofence_engine
+from .campus_network import get_campus_network_index
+
+# Same precision as TeacherActivityLog.location_lat / location_lng
+COORDINATE_PLACES = Decimal('0.00000001')
 
 class EnhancedTeacherAttendanceMiddleware(MiddlewareMixin):
     """
     Enhanced middleware for automatic teacher attendance tracking with schedule validation
+
+    With ``TEACHER_ATTENDANCE_WRITE_BEHIND`` enabled, requests are only queued in
+    the in-process activity buffer and written in bulk by a background flusher.
+    Otherwise every request is written synchronously (the default, and what
+    tests rely on).
     """
     
     def process_request(self, request):
@@ -34,8 +49,16 @@ class EnhancedTeacherAttendanceMiddleware(MiddlewareMixin):
         # Get user agent for device tracking
         user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
         
-        # Check if teacher is on campus (simulated for now)
-        is_on_campus = self._verify_location(ip_address)
+        # Coordinates sent by the client, if any
+        location = self._get_location(request)
+        
+        # Check if teacher is on campus
+        is_on_campus = self._verify_location(ip_address, location)
+        
+        if getattr(settings, 'TEACHER_ATTENDANCE_WRITE_BEHIND', False):
+            activity = self._classify_activity(request, teacher)
+            activity_buffer.add(teacher.id, current_time, ip_address, user_agent, is_on_campus, activity, location)
+            return None
         
         # Get or create today's attendance record
         attendance, created = TeacherAttendance.objects.get_or_create(
@@ -55,11 +78,11 @@ class EnhancedTeacherAttendanceMiddleware(MiddlewareMixin):
         # If this is the first activity of the day, set real check-in time
         if created:
             attendance.first_activity_time = current_time
-            self._log_activity(request, teacher, ip_address, user_agent, is_on_campus, is_first_activity=True)
+            self._log_activity(request, teacher, ip_address, user_agent, is_on_campus, location, is_first_activity=True)
         else:
             # Update last activity time
             attendance.last_activity_time = current_time
-            self._log_activity(request, teacher, ip_address, user_agent, is_on_campus, is_first_activity=False)
+            self._log_activity(request, teacher, ip_address, user_agent, is_on_campus, location, is_first_activity=False)
         
         # Always update check-out time with current activity (last activity = check out)
         attendance.check_out_time = current_time_only
@@ -72,80 +95,62 @@ class EnhancedTeacherAttendanceMiddleware(MiddlewareMixin):
         
         return None
     
-    def _verify_location(self, ip_address):
-        """Verify if teacher is on campus based on IP or geolocation"""
-        # For now, simulate campus verification
-        # In real implementation, you would:
-        # 1. Check IP against known campus IP ranges
-        # 2. Use geolocation API to get coordinates
-        # 3. Check against GeofenceLocation boundaries
-        
-        # Simulate: local IPs are considered on-campus
-        if ip_address and (ip_address.startswith('192.168.') or 
-                          ip_address.startswith('10.') or 
-                          ip_address == '127.0.0.1'):
-            return True
-        
-        return False
+    def _get_location(self, request):
+        """Read (lat, lng) from the X-Location-Lat / X-Location-Lng headers, or None"""
+        lat = request.META.get('HTTP_X_LOCATION_LAT')
+        lng = request.META.get('HTTP_X_LOCATION_LNG')
+        if not lat or not lng:
+            return None
+        
+        try:
+            lat = Decimal(lat).quantize(COORDINATE_PLACES)
+            lng = Decimal(lng).quantize(COORDINATE_PLACES)
+        except (InvalidOperation, ValueError):
+            return None
+        
+        if not (lat.is_finite() and lng.is_finite() and -90 <= lat <= 90 and -180 <= lng <= 180):
+            return None
+        return lat, lng
+    
+    def _verify_location(self, ip_address, location=None):
+        """Verify if teacher is on campus based on geolocation, or on the IP address when no coordinates were sent"""
+        if location is not None:
+            return get_geofence_engine().contains(*location)
+        
+        # Otherwise the request must come from a campus network (see CampusNetwork)
+        return get_campus_network_index().contains(ip_address)
     
-    def _log_activity(self, request, teacher, ip_address, user_agent, is_on_campus, is_first_activity=False):
-        """Log specific teacher activities with enhanced tracking"""
+    def _classify_activity(self, request, teacher):
+        """Determine activity type, priority and description from the resolved URL name (see activity_rules)"""
         path = request.path
-        method = request.method
-        
-        # Determine activity type and priority based on URL pattern
-        activity_type = 'other'
-        priority_level = 'low'
-        description = ''
-        related_schedule = None
-        
-        if 'login' in path or 'accounts/login' in path:
-            activity_type = 'login'
-            priority_level = 'medium'
-            description = 'Teacher logged in to system'
-        elif 'logout' in path:
-            activity_type = 'logout'
-            priority_level = 'medium'
-            description = 'Teacher logged out from system'
-        elif ('attendance/mark' in path or 'attendance/save' in path or 
-              'save_attendance_ajax' in path) and method == 'POST':
-            activity_type = 'mark_attendance'
-            priority_level = 'high'
-            description = 'Marked student attendance'
+        activity_rule = classify(request.path_info, request.method)
+        
+        # Try to link attendance marking to the scheduled class
+        related_schedule = self._find_current_schedule(teacher) if activity_rule.link_schedule else None
+        
+        return {
+            'path': path,
+            'activity_type': activity_rule.activity_type,
+            'priority_level': activity_rule.priority_level,
+            'description': activity_rule.description.format(path=path),
+            'related_schedule_id': related_schedule.id if related_schedule else None,
+        }
+    
+    def _log_activity(self, request, teacher, ip_address, user_agent, is_on_campus, location=None, is_first_activity=False):
+        """Log specific teacher activities with enhanced tracking"""
+        activity = self._classify_activity(request, teacher)
+        activity_type = activity['activity_type']
+        description = activity['description']
+        
+        if activity_type == 'mark_attendance':
             # This is a significant activity - update teacher attendance status
             self._update_teacher_attendance_status(teacher)
-            # Try to link to scheduled class
-            related_schedule = self._find_current_schedule(teacher)
-        elif 'assignment' in path and method == 'POST':
-            activity_type = 'create_assignment'
-            priority_level = 'high'
-            description = 'Created/updated assignment'
-        elif 'exam' in path or 'result' in path:
-            activity_type = 'grade_exam'
-            priority_level = 'high'
-            description = 'Graded exam/entered results'
-        elif 'message' in path and method == 'POST':
-            activity_type = 'send_message'
-            priority_level = 'medium'
-            description = 'Sent message'
-        elif 'report' in path:
-            activity_type = 'view_report'
-            priority_level = 'medium'
-            description = 'Viewed reports'
-        elif 'dashboard' in path:
-            activity_type = 'dashboard_access'
-            priority_level = 'low'
-            description = 'Accessed dashboard'
-        elif method == 'GET' and any(x in path for x in ['academic', 'attendance', 'accounts']):
-            activity_type = 'system_navigation'
-            priority_level = 'low'
-            description = f'Navigated to {path}'
         
         # Mark first activity of the day specially
         if is_first_activity:
             if activity_type == 'other':
                 activity_type = 'first_login'
-                description = f'First system access of the day - {path}'
+                description = f"First system access of the day - {activity['path']}"
             else:
                 description = f'FIRST ACTIVITY: {description}'
         
@@ -153,39 +158,26 @@ class EnhancedTeacherAttendanceMiddleware(MiddlewareMixin):
         TeacherActivityLog.objects.create(
             teacher=teacher,
             activity_type=activity_type,
-            priority_level=priority_level,
+            priority_level=activity['priority_level'],
             description=description,
             ip_address=ip_address,
             user_agent=user_agent,
+            location_lat=location[0] if location else None,
+            location_lng=location[1] if location else None,
             is_on_campus=is_on_campus,
-            related_schedule=related_schedule
+            related_schedule_id=activity['related_schedule_id']
         )
     
     def _find_current_schedule(self, teacher):
         """Find the current scheduled class for the teacher"""
         current_time = timezone.now()
-        weekday = current_time.weekday()
-        current_time_only = current_time.time()
         
-        # Find schedule that matches current time (within 30 minutes)
-        schedules = TeacherSchedule.objects.filter(
-            teacher=teacher,
-            day_of_week=weekday,
-            is_active=True,
-            start_time__lte=current_time_only
+        # Find schedule that matches current time (with 30 min buffer after the class ends)
+        return get_week_schedule(teacher.id).current(
+            current_time.weekday(),
+            current_time.time(),
+            grace_minutes=30
         )
-        
-        for schedule in schedules:
-            # Check if current time is within class period (with 30 min buffer)
-            end_time_with_buffer = datetime.combine(
-                current_time.date(), 
-                schedule.end_time
-            ) + timezone.timedelta(minutes=30)
-            
-            if current_time <= end_time_with_buffer:
-                return schedule
-        
-        return None
     
     def _update_teacher_attendance_status(self, teacher):
         """Update teacher attendance status when they perform significant activities"""
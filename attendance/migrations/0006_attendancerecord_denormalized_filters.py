@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_session_fields(apps, schema_editor):
+    """Fill the new columns of existing records from their session in one UPDATE"""
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSession = apps.get_model('attendance', 'AttendanceSession')
+
+    session = AttendanceSession.objects.filter(pk=models.OuterRef('session_id'))
+    AttendanceRecord.objects.update(
+        date=models.Subquery(session.values('date')[:1]),
+        start_time=models.Subquery(session.values('start_time')[:1]),
+        subject_id=models.Subquery(session.values('teacher_assignment__subject_id')[:1]),
+        class_assigned_id=models.Subquery(session.values('teacher_assignment__class_assigned_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_semesterenrollment'),
+        ('attendance', '0005_geofencelocation_teacherschedule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='class_assigned',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academic.class'),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='start_time',
+            field=models.TimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='subject',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academic.subject'),
+        ),
+        migrations.RunPython(copy_session_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'date', 'start_time'], name='attendance__student_cb3cb1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['subject', 'date', 'start_time'], name='attendance__subject_cd5a23_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['class_assigned', 'date', 'start_time'], name='attendance__class_a_f89fbc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'start_time'], name='attendance__date_5f687f_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_parentteachermessage'),
+        ('attendance', '0006_attendancerecord_denormalized_filters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherActivityHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('login', 'Login'), ('logout', 'Logout'), ('first_login', 'First Login'), ('mark_attendance', 'Mark Student Attendance'), ('create_assignment', 'Create Assignment'), ('grade_exam', 'Grade Exam'), ('send_message', 'Send Message'), ('view_report', 'View Report'), ('dashboard_access', 'Dashboard Access'), ('system_navigation', 'System Navigation'), ('classroom_entry', 'Classroom Entry'), ('biometric_scan', 'Biometric Verification'), ('location_check', 'Location Verification'), ('other', 'Other Activity')], max_length=50)),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_hours', to='accounts.teacherprofile')),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour', 'activity_type'], name='attendance__hour_45d158_idx')],
+                'unique_together': {('teacher', 'activity_type', 'hour')},
+            },
+        ),
+    ]
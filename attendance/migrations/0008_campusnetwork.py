@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+def add_default_networks(apps, schema_editor):
+    """Start with the ranges the middleware used to hard-code, so nothing changes on upgrade"""
+    CampusNetwork = apps.get_model('attendance', 'CampusNetwork')
+    for name, cidr in [
+        ('Private network (192.168.x.x)', '192.168.0.0/16'),
+        ('Private network (10.x.x.x)', '10.0.0.0/8'),
+        ('Localhost', '127.0.0.1/32'),
+    ]:
+        CampusNetwork.objects.get_or_create(cidr=cidr, defaults={'name': name})
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_teacheractivityhourly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampusNetwork',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('cidr', models.CharField(help_text='e.g. 10.20.0.0/16 or 2001:db8:10::/48', max_length=50, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(add_default_networks, migrations.RunPython.noop),
+    ]
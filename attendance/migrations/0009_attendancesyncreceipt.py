@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_parentteachermessage'),
+        ('attendance', '0008_campusnetwork'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSyncReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.attendancesession')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_sync_receipts', to='accounts.teacherprofile')),
+            ],
+            options={
+                'unique_together': {('teacher', 'idempotency_key')},
+            },
+        ),
+    ]
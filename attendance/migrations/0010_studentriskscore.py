@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_parentteachermessage'),
+        ('attendance', '0009_attendancesyncreceipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentRiskScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attendance_rate', models.FloatField(blank=True, help_text='Attendance % over the whole lookback', null=True)),
+                ('rolling_attendance_rate', models.FloatField(blank=True, help_text='Attendance % over the recent window', null=True)),
+                ('absence_streak', models.PositiveIntegerField(default=0, help_text='School days missed in a row, up to the latest')),
+                ('exam_average', models.FloatField(blank=True, null=True)),
+                ('grade_trend', models.FloatField(blank=True, help_text='Change in exam percentage per exam', null=True)),
+                ('outstanding_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('risk_score', models.FloatField(default=0)),
+                ('risk_level', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='low', max_length=10)),
+                ('computed_at', models.DateTimeField()),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='risk_score', to='accounts.studentprofile')),
+            ],
+            options={
+                'ordering': ['-risk_score'],
+                'indexes': [models.Index(fields=['risk_level', 'risk_score'], name='attendance__risk_le_3c950f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_summaries(apps, schema_editor):
+    """Build the monthly summaries from the existing records (rebuild_attendance_summary() does the same later)"""
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSummary = apps.get_model('attendance', 'AttendanceSummary')
+
+    rows = AttendanceRecord.objects.annotate(
+        summary_year=ExtractYear('session__date'),
+        summary_month=ExtractMonth('session__date'),
+    ).values(
+        'student_id',
+        'summary_year',
+        'summary_month',
+        summary_subject_id=models.F('session__teacher_assignment__subject_id'),
+        class_id=models.F('session__teacher_assignment__class_assigned_id'),
+    ).annotate(
+        total=models.Count('id'),
+        present=models.Count('id', filter=models.Q(status='present')),
+        late=models.Count('id', filter=models.Q(status='late')),
+        excused=models.Count('id', filter=models.Q(status='excused')),
+    ).order_by()
+
+    AttendanceSummary.objects.all().delete()
+    batch = []
+    for row in rows.iterator():
+        batch.append(AttendanceSummary(
+            student_id=row['student_id'],
+            subject_id=row['summary_subject_id'],
+            class_enrolled_id=row['class_id'],
+            year=row['summary_year'],
+            month=row['summary_month'],
+            total_sessions=row['total'],
+            sessions_attended=row['present'],
+            sessions_late=row['late'],
+            sessions_excused=row['excused'],
+            attendance_percentage=round((row['present'] + row['late'] + row['excused']) / row['total'] * 100, 2),
+        ))
+        if len(batch) >= 1000:
+            AttendanceSummary.objects.bulk_create(batch)
+            batch = []
+    AttendanceSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_studentriskscore'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
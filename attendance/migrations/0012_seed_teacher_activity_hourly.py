@@ -0,0 +1,42 @@
+from datetime import timezone as dt_timezone
+from django.db import migrations, models
+from django.db.models.functions import TruncHour
+
+
+def fill_rollup(apps, schema_editor):
+    """Build the hourly rollup from the existing activity logs (rebuild_teacher_activity_rollup --all does the same later)"""
+    TeacherActivityLog = apps.get_model('attendance', 'TeacherActivityLog')
+    TeacherActivityHourly = apps.get_model('attendance', 'TeacherActivityHourly')
+
+    rows = TeacherActivityLog.objects.annotate(
+        hour=TruncHour('timestamp', tzinfo=dt_timezone.utc)
+    ).values('teacher_id', 'activity_type', 'hour').annotate(
+        total=models.Count('id'), first_seen=models.Min('timestamp'), last_seen=models.Max('timestamp')
+    ).order_by()
+
+    TeacherActivityHourly.objects.all().delete()
+    batch = []
+    for row in rows.iterator():
+        batch.append(TeacherActivityHourly(
+            teacher_id=row['teacher_id'],
+            activity_type=row['activity_type'],
+            hour=row['hour'],
+            count=row['total'],
+            first_seen=row['first_seen'],
+            last_seen=row['last_seen'],
+        ))
+        if len(batch) >= 1000:
+            TeacherActivityHourly.objects.bulk_create(batch)
+            batch = []
+    TeacherActivityHourly.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_backfill_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from accounts.models import StudentProfile, TeacherProfile
 from academic.models import Subject, Class, TeacherSubjectAssignment
 from datetime import datetime, time, timedelta
+from decimal import Decimal
+import ipaddress
 
 class AttendanceSession(models.Model):
     """Represents a single class session for attendance marking"""
@@ -35,11 +37,59 @@ class AttendanceRecord(models.Model):
     remarks = models.TextField(blank=True)
     marked_at = models.DateTimeField(auto_now_add=True)
     
+    # Copied from the session and its assignment so record lists can be filtered and
+    # ordered without joins. Filled on save and kept in sync by attendance.signals.
+    date = models.DateField(null=True, blank=True, editable=False)
+    start_time = models.TimeField(null=True, blank=True, editable=False)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True, editable=False,
+                                db_index=False, related_name='+')
+    class_assigned = models.ForeignKey(Class, on_delete=models.CASCADE, null=True, blank=True, editable=False,
+                                       db_index=False, related_name='+')
+    
     class Meta:
         unique_together = ['session', 'student']
+        indexes = [
+            models.Index(fields=['student', 'date', 'start_time']),
+            models.Index(fields=['subject', 'date', 'start_time']),
+            models.Index(fields=['class_assigned', 'date', 'start_time']),
+            models.Index(fields=['date', 'start_time']),
+        ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.session} - {self.status}"
+    
+    @staticmethod
+    def session_fields(session_id):
+        """The denormalized column values for records of a session, in one query"""
+        return AttendanceSession.objects.filter(id=session_id).values(
+            'date',
+            'start_time',
+            subject_id=models.F('teacher_assignment__subject_id'),
+            class_assigned_id=models.F('teacher_assignment__class_assigned_id'),
+        ).first() or {}
+    
+    def save(self, *args, **kwargs):
+        if self.date is None and self.session_id:
+            for field, value in self.session_fields(self.session_id).items():
+                setattr(self, field, value)
+        super().save(*args, **kwargs)
+
+class AttendanceSyncReceipt(models.Model):
+    """
+    Outcome of one offline-queued session applied through the batch sync API.
+    Replaying a session with the same idempotency key returns the stored result.
+    """
+    teacher = models.ForeignKey(TeacherProfile, on_delete=models.CASCADE, related_name='attendance_sync_receipts')
+    idempotency_key = models.CharField(max_length=64)
+    session = models.ForeignKey(AttendanceSession, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['teacher', 'idempotency_key']
+    
+    def __str__(self):
+        return f"{self.teacher} - {self.idempotency_key}"
 
 class AttendanceSummary(models.Model):
     student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE)
@@ -69,6 +119,36 @@ class AttendanceSummary(models.Model):
         return self.attendance_percentage
 
 
+class StudentRiskScore(models.Model):
+    """
+    Nightly at-risk score of a student, written in bulk by the
+    compute_student_risk_scores command (see attendance/risk.py).
+    """
+    RISK_LEVELS = (
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+    )
+    
+    student = models.OneToOneField(StudentProfile, on_delete=models.CASCADE, related_name='risk_score')
+    attendance_rate = models.FloatField(null=True, blank=True, help_text="Attendance % over the whole lookback")
+    rolling_attendance_rate = models.FloatField(null=True, blank=True, help_text="Attendance % over the recent window")
+    absence_streak = models.PositiveIntegerField(default=0, help_text="School days missed in a row, up to the latest")
+    exam_average = models.FloatField(null=True, blank=True)
+    grade_trend = models.FloatField(null=True, blank=True, help_text="Change in exam percentage per exam")
+    outstanding_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    risk_score = models.FloatField(default=0)
+    risk_level = models.CharField(max_length=10, choices=RISK_LEVELS, default='low')
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-risk_score']
+        indexes = [models.Index(fields=['risk_level', 'risk_score'])]
+    
+    def __str__(self):
+        return f"{self.student} - {self.risk_level} ({self.risk_score})"
+
+
 class TeacherSchedule(models.Model):
     """Weekly schedule for teachers"""
     WEEKDAYS = [
@@ -162,16 +242,13 @@ class TeacherAttendance(models.Model):
     
     def calculate_scheduled_hours(self):
         """Calculate total scheduled hours for the day"""
-        weekday = self.date.weekday()
-        schedules = TeacherSchedule.objects.filter(
-            teacher=self.teacher,
-            day_of_week=weekday,
-            is_active=True
-        )
+        from .schedule_index import get_week_schedule
+        
+        schedules = get_week_schedule(self.teacher_id).for_day(self.date.weekday())
         
         total_minutes = sum(schedule.duration_minutes for schedule in schedules)
         self.scheduled_hours = round(total_minutes / 60, 2)
-        self.classes_scheduled = schedules.count()
+        self.classes_scheduled = len(schedules)
         return self.scheduled_hours
     
     def calculate_hours(self):
@@ -202,12 +279,8 @@ class TeacherAttendance(models.Model):
         self.calculate_scheduled_hours()
         
         # Count classes actually attended (where attendance was marked)
-        weekday = self.date.weekday()
-        scheduled_classes = TeacherSchedule.objects.filter(
-            teacher=self.teacher,
-            day_of_week=weekday,
-            is_active=True
-        )
+        from .schedule_index import get_week_schedule
+        scheduled_classes = get_week_schedule(self.teacher_id).for_day(self.date.weekday())
         
         attended_classes = 0
         for schedule in scheduled_classes:
@@ -226,10 +299,16 @@ class TeacherAttendance(models.Model):
         self.classes_attended = attended_classes
         self.calculate_attendance_percentage()
         
-        # Determine status based on comprehensive criteria
+        return self._apply_status(scheduled_classes, self.has_performed_duties)
+    
+    def _apply_status(self, scheduled_classes, performed_duties):
+        """
+        Set the status from the attendance percentage and the first class of the day.
+        ``performed_duties`` is a callable so the duty check only runs when needed.
+        """
         if self.classes_scheduled == 0:
             # No classes scheduled - check for other activities
-            if self.has_performed_duties():
+            if performed_duties():
                 self.status = 'present'
             else:
                 self.status = 'absent'
@@ -240,11 +319,9 @@ class TeacherAttendance(models.Model):
             if attendance_rate >= 100:
                 # Attended all scheduled classes
                 if self.first_activity_time:
-                    first_class_time = scheduled_classes.first().start_time if scheduled_classes.exists() else time(9, 0)
+                    first_class_time = scheduled_classes[0].start_time if scheduled_classes else time(9, 0)
                     if self.first_activity_time.time() <= first_class_time:
                         self.status = 'present'
-                    elif self.first_activity_time.time() <= time(first_class_time.hour, first_class_time.minute + 30):
-                        self.status = 'late'
                     else:
                         self.status = 'late'
                 else:
@@ -260,13 +337,139 @@ class TeacherAttendance(models.Model):
                 self.status = 'partial'
             else:
                 # Attended no scheduled classes
-                if self.has_performed_duties():
+                if performed_duties():
                     self.status = 'partial'  # Did some work but missed classes
                 else:
                     self.status = 'absent'
         
         return self.status
     
+    @classmethod
+    def evaluate_many(cls, teachers, date_from, date_to=None, create_missing=True, batch_size=500):
+        """
+        Run determine_status_advanced for many teachers over a date range in bulk.
+
+        Schedules, completed sessions and significant activities are loaded with a
+        handful of set-based queries and matched to the schedule windows in memory,
+        then rows are written with one UPDATE per distinct outcome (unchanged rows
+        are skipped). Missing rows are created
+        first when ``create_missing`` is set, otherwise only existing rows are evaluated.
+
+        Returns {'created': int, 'records': [...], 'changed': [(attendance, old_status), ...]}
+        """
+        from bisect import bisect_left
+        from collections import defaultdict
+        from contextlib import nullcontext
+        from .schedule_index import get_week_schedules
+
+        date_to = date_to or date_from
+        teacher_ids = {getattr(teacher, 'pk', teacher) for teacher in teachers}
+        result = {'created': 0, 'records': [], 'changed': []}
+        if not teacher_ids or date_from > date_to:
+            return result
+
+        rows = cls.objects.filter(teacher_id__in=teacher_ids, date__range=(date_from, date_to))
+
+        missing = []
+        if create_missing:
+            existing = set(rows.values_list('teacher_id', 'date'))
+            days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+            missing = [
+                cls(teacher_id=teacher_id, date=day, status='absent', is_auto_marked=True)
+                for teacher_id in teacher_ids
+                for day in days
+                if (teacher_id, day) not in existing
+            ]
+
+        # Created rows are evaluated in the same transaction, so a call that fails halfway
+        # (e.g. "database is locked") leaves nothing behind and can simply be retried. The
+        # insert must come first in it: on SQLite a read before the first write keeps a lock
+        # that concurrent workers cannot upgrade. Without an insert the UPDATEs autocommit.
+        with transaction.atomic() if missing else nullcontext():
+            if missing:
+                # ignore_conflicts skips pairs another run inserted meanwhile, so count what is
+                # really new by re-querying the range
+                cls.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+                result['created'] = rows.count() - len(existing)
+
+            records = list(rows)
+            if not records:
+                return result
+
+            weeks = get_week_schedules(teacher_ids)
+
+            # Completed session start times per (assignment, date), sorted for bisect
+            session_starts = defaultdict(list)
+            duty_days = set()
+            sessions = AttendanceSession.objects.filter(
+                teacher_assignment__teacher_id__in=teacher_ids,
+                date__range=(date_from, date_to),
+                is_completed=True
+            ).values_list('teacher_assignment__teacher_id', 'teacher_assignment_id', 'date', 'start_time')
+            for teacher_id, assignment_id, day, start_time in sessions:
+                session_starts[(assignment_id, day)].append(start_time)
+                duty_days.add((teacher_id, day))
+            for starts in session_starts.values():
+                starts.sort()
+
+            # Other significant activities count as duties too
+            duty_days.update(
+                TeacherActivityLog.objects.filter(
+                    teacher_id__in=teacher_ids,
+                    timestamp__date__range=(date_from, date_to),
+                    activity_type__in=['mark_attendance', 'create_assignment', 'grade_exam']
+                ).values_list('teacher_id', 'timestamp__date').distinct()
+            )
+
+            # Rows that end up with identical values share one UPDATE, so the write
+            # costs one query per distinct outcome instead of one per row
+            pending = defaultdict(list)
+            for attendance in records:
+                scheduled_classes = weeks[attendance.teacher_id].for_day(attendance.date.weekday())
+
+                attended_classes = 0
+                for schedule in scheduled_classes:
+                    # A completed session starting inside the scheduled window counts as attended
+                    starts = session_starts.get((schedule.subject_assignment_id, attendance.date), [])
+                    position = bisect_left(starts, schedule.start_time)
+                    if position < len(starts) and starts[position] <= schedule.end_time:
+                        attended_classes += 1
+
+                before = (
+                    attendance.status, attendance.scheduled_hours, attendance.classes_scheduled,
+                    attendance.classes_attended, attendance.attendance_percentage,
+                )
+                attendance.scheduled_hours = round(sum(schedule.duration_minutes for schedule in scheduled_classes) / 60, 2)
+                attendance.classes_scheduled = len(scheduled_classes)
+                attendance.classes_attended = attended_classes
+                attendance.calculate_attendance_percentage()
+                key = (attendance.teacher_id, attendance.date)
+                attendance._apply_status(scheduled_classes, lambda: key in duty_days)
+
+                after = (
+                    attendance.status, Decimal(str(attendance.scheduled_hours)), attendance.classes_scheduled,
+                    attendance.classes_attended, Decimal(str(round(attendance.attendance_percentage, 2))),
+                )
+                if before[0] != after[0]:
+                    result['changed'].append((attendance, before[0]))
+                if before != after:
+                    pending[after].append(attendance.pk)
+
+            now = timezone.now()
+            for (status, scheduled_hours, classes_scheduled, classes_attended, percentage), pks in pending.items():
+                for offset in range(0, len(pks), batch_size):
+                    cls.objects.filter(pk__in=pks[offset:offset + batch_size]).update(
+                        status=status,
+                        scheduled_hours=scheduled_hours,
+                        classes_scheduled=classes_scheduled,
+                        classes_attended=classes_attended,
+                        attendance_percentage=percentage,
+                        updated_at=now,
+                    )
+
+        result['records'] = records
+        return result
+    
     def has_performed_duties(self):
         """Check if teacher has performed actual duties today"""
         # Check if teacher marked attendance for any of their subjects
@@ -288,79 +491,26 @@ class TeacherAttendance(models.Model):
         
         return significant_activities.exists()
     
-    def get_schedule_compliance_report(self):
-        """Get detailed report of schedule compliance"""
-        weekday = self.date.weekday()
-        scheduled_classes = TeacherSchedule.objects.filter(
-            teacher=self.teacher,
-            day_of_week=weekday,
-            is_active=True
-        ).order_by('start_time')
-        
-        compliance_report = []
-        
-        for schedule in scheduled_classes:
-            # Check if class was conducted
-            session = AttendanceSession.objects.filter(
-                teacher_assignment=schedule.subject_assignment,
-                date=self.date,
-                start_time__gte=schedule.start_time,
-                start_time__lte=schedule.end_time
-            ).first()
-            
-            compliance_report.append({
-                'schedule': schedule,
-                'session': session,
-                'conducted': session is not None and session.is_completed,
-                'on_time': session and session.start_time <= schedule.start_time if session else False,
-                'delay_minutes': self._calculate_delay(schedule, session) if session else None
-            })
-        
-        return compliance_report
+    def _compliance(self, engine=None):
+        """The ComplianceEngine to use: the one passed in, or one kept on this instance"""
+        if engine is not None:
+            return engine
+        if not hasattr(self, '_compliance_engine'):
+            from .compliance import ComplianceEngine
+            self._compliance_engine = ComplianceEngine()
+        return self._compliance_engine
     
-    def _calculate_delay(self, schedule, session):
-        """Calculate delay in minutes between scheduled and actual time"""
-        if not session:
-            return None
-        
-        scheduled_datetime = datetime.combine(self.date, schedule.start_time)
-        actual_datetime = datetime.combine(self.date, session.start_time)
-        
-        if actual_datetime > scheduled_datetime:
-            return int((actual_datetime - scheduled_datetime).total_seconds() / 60)
-        return 0
+    def get_schedule_compliance_report(self, engine=None):
+        """Get detailed report of schedule compliance (see attendance.compliance)"""
+        return self._compliance(engine).report(self.teacher_id, self.date)
     
-    def get_missed_classes(self):
+    def get_missed_classes(self, engine=None):
         """Get list of classes that were scheduled but not conducted"""
-        compliance_report = self.get_schedule_compliance_report()
-        return [item for item in compliance_report if not item['conducted']]
+        return self._compliance(engine).missed_classes(self.teacher_id, self.date)
     
-    def get_performance_score(self):
+    def get_performance_score(self, engine=None):
         """Calculate overall performance score (0-100)"""
-        from decimal import Decimal
-        
-        score = Decimal('0')
-        
-        # Schedule compliance (40 points)
-        if self.classes_scheduled > 0:
-            score += (Decimal(str(self.attendance_percentage)) / Decimal('100')) * Decimal('40')
-        else:
-            score += Decimal('40')  # Full points if no classes scheduled but other duties performed
-        
-        # Punctuality (20 points)
-        compliance_report = self.get_schedule_compliance_report()
-        on_time_classes = sum(1 for item in compliance_report if item['on_time'])
-        if self.classes_scheduled > 0:
-            punctuality_score = (Decimal(str(on_time_classes)) / Decimal(str(self.classes_scheduled))) * Decimal('20')
-            score += punctuality_score
-        else:
-            score += Decimal('20')
-        
-        # Activity performance (40 points)
-        if self.has_performed_duties():
-            score += Decimal('40')
-        
-        return min(100, float(score.quantize(Decimal('0.1'))))
+        return self._compliance(engine).performance_score(self)
     
     def get_duties_performed(self):
         """Get list of duties performed today"""
@@ -494,6 +644,25 @@ class TeacherActivityLog(models.Model):
         super().save(*args, **kwargs)
 
 
+class TeacherActivityHourly(models.Model):
+    """Hourly rollup of TeacherActivityLog, maintained incrementally by attendance.activity_rollup"""
+    teacher = models.ForeignKey(TeacherProfile, on_delete=models.CASCADE, related_name='activity_hours')
+    activity_type = models.CharField(max_length=50, choices=TeacherActivityLog.ACTIVITY_CHOICES)
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    count = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['teacher', 'activity_type', 'hour']
+        ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['hour', 'activity_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.teacher} - {self.activity_type} - {self.hour:%Y-%m-%d %H:00} ({self.count})"
+
 class TeacherLeave(models.Model):
     """Leave requests and approvals for teachers"""
     LEAVE_TYPES = (
@@ -570,4 +739,29 @@ class GeofenceLocation(models.Model):
         distance_km = 6371 * c  # Earth's radius in kilometers
         distance_meters = distance_km * 1000
         
-        return distance_meters <= self.radius_meters
\ No newline at end of file
+        return distance_meters <= self.radius_meters
+
+class CampusNetwork(models.Model):
+    """IP network (IPv4 or IPv6, in CIDR notation) that counts as being on campus"""
+    name = models.CharField(max_length=100)
+    cidr = models.CharField(max_length=50, unique=True, help_text='e.g. 10.20.0.0/16 or 2001:db8:10::/48')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return f"{self.name} ({self.cidr})"
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        try:
+            ipaddress.ip_network(self.cidr.strip(), strict=False)
+        except ValueError:
+            raise ValidationError({'cidr': 'Enter a valid IPv4 or IPv6 network, e.g. 10.20.0.0/16.'})
+    
+    def save(self, *args, **kwargs):
+        # Store the normalized form so the same network cannot be entered twice
+        self.cidr = str(ipaddress.ip_network(self.cidr.strip(), strict=False))
+        super().save(*args, **kwargs)
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from django.db.models import Count, Q
+from academic.models import StudentEnrollment
+from .models import AttendanceRecord, AttendanceSession
+
+# Students below this attendance percentage are rated 'Poor' and flagged as at risk
+AT_RISK_PERCENTAGE = 70
+
+
+def attendance_status(percentage):
+    """Return the (status, status_class) label used by the reports for a percentage"""
+    if percentage >= 90:
+        return 'Excellent', 'success'
+    elif percentage >= 80:
+        return 'Good', 'success'
+    elif percentage >= AT_RISK_PERCENTAGE:
+        return 'Average', 'warning'
+    return 'Poor', 'danger'
+
+
+def build_attendance_report(assignments, year=None, month=None, students_per_assignment=None):
+    """
+    Build the student x assignment attendance matrix for a set of teacher assignments.
+
+    All present/late/absent/excused counts come from a single grouped query with
+    conditional counts, so the number of queries is fixed no matter how many
+    students or classes are involved:
+
+    1. the assignments themselves (with subject and class)
+    2. the active enrollments of every class involved
+    3. the number of sessions per assignment
+    4. the grouped attendance counts per (assignment, student)
+
+    ``year`` and ``month`` restrict the report to sessions held in that month.
+    ``students_per_assignment`` caps the number of student rows kept per assignment.
+    """
+    assignments = list(assignments.select_related('subject', 'class_assigned'))
+    assignment_ids = [assignment.id for assignment in assignments]
+    class_ids = {assignment.class_assigned_id for assignment in assignments}
+
+    session_filter = Q(teacher_assignment_id__in=assignment_ids)
+    record_filter = Q(session__teacher_assignment_id__in=assignment_ids)
+    if year and month:
+        session_filter &= Q(date__year=year, date__month=month)
+        record_filter &= Q(session__date__year=year, session__date__month=month)
+
+    # Active students of every class, grouped by class
+    class_students = defaultdict(list)
+    enrollments = StudentEnrollment.objects.filter(
+        class_enrolled_id__in=class_ids,
+        is_active=True
+    ).select_related('student__user')
+    for enrollment in enrollments:
+        class_students[enrollment.class_enrolled_id].append(enrollment.student)
+
+    sessions_per_assignment = dict(
+        AttendanceSession.objects.filter(session_filter)
+        .values('teacher_assignment_id')
+        .annotate(total=Count('id'))
+        .values_list('teacher_assignment_id', 'total')
+    )
+
+    matrix = {}
+    rows = AttendanceRecord.objects.filter(record_filter).values(
+        'session__teacher_assignment_id', 'student_id'
+    ).annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+        excused=Count('id', filter=Q(status='excused')),
+    ).order_by()
+    for row in rows:
+        matrix[(row['session__teacher_assignment_id'], row['student_id'])] = row
+
+    student_reports = []
+    class_summaries = []
+    overall_present = 0
+    overall_total = 0
+    best_class = None
+    best_class_percentage = 0
+
+    for assignment in assignments:
+        students = class_students[assignment.class_assigned_id]
+        class_present = 0
+        class_total = 0
+        kept = 0
+
+        for student in students:
+            counts = matrix.get((assignment.id, student.id))
+            if not counts:
+                continue
+
+            present_count = counts['present'] + counts['late']
+            class_present += present_count
+            class_total += counts['total']
+
+            if students_per_assignment is not None and kept >= students_per_assignment:
+                continue
+            kept += 1
+
+            percentage = present_count / counts['total'] * 100
+            status, status_class = attendance_status(percentage)
+            student_reports.append({
+                'student': student,
+                'class_name': assignment.class_assigned.name,
+                'subject_name': assignment.subject.name,
+                'total_classes': counts['total'],
+                'present': counts['present'],
+                'absent': counts['absent'],
+                'late': counts['late'],
+                'excused': counts['excused'],
+                'percentage': round(percentage, 1),
+                'status': status,
+                'status_class': status_class,
+                'at_risk': percentage < AT_RISK_PERCENTAGE,
+            })
+
+        # Calculate class average
+        if class_total > 0:
+            avg_attendance = class_present / class_total * 100
+            if avg_attendance > best_class_percentage:
+                best_class_percentage = avg_attendance
+                best_class = assignment.class_assigned.name
+        else:
+            avg_attendance = 0
+
+        overall_present += class_present
+        overall_total += class_total
+
+        class_summaries.append({
+            'assignment': assignment,
+            'total_sessions': sessions_per_assignment.get(assignment.id, 0),
+            'total_students': len(students),
+            'avg_attendance': round(avg_attendance, 2),
+        })
+
+    # Sort student reports by percentage (descending)
+    student_reports.sort(key=lambda report: report['percentage'], reverse=True)
+
+    return {
+        'class_summaries': class_summaries,
+        'student_reports': student_reports,
+        'at_risk_reports': [report for report in student_reports if report['at_risk']],
+        'overall_attendance': (overall_present / overall_total * 100) if overall_total > 0 else 0,
+        'best_class': best_class,
+        'best_class_percentage': best_class_percentage,
+    }
@@ -0,0 +1,253 @@
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+from accounts.models import StudentProfile
+from examination.models import ExamResult
+from fees.balances import BALANCE, UNPAID_STATUSES
+from fees.models import StudentFee
+from .models import AttendanceRecord, StudentRiskScore
+
+# History the scores look at
+ATTENDANCE_LOOKBACK_DAYS = 120
+ROLLING_WINDOW_DAYS = 30
+EXAM_LOOKBACK_DAYS = 365
+
+# Points of the 0-100 risk score each signal can add
+RISK_WEIGHTS = {
+    'attendance': 35,  # rolling attendance between ATTENDANCE_TARGET and ATTENDANCE_FLOOR
+    'streak': 15,      # school days missed in a row, full at STREAK_DAYS
+    'grades': 25,      # exam average between GRADE_TARGET and GRADE_FLOOR
+    'trend': 10,       # exam percentage falling, full at TREND_POINTS per exam
+    'fees': 15,        # share of the billed fees still outstanding
+}
+ATTENDANCE_TARGET, ATTENDANCE_FLOOR = 90, 50
+GRADE_TARGET, GRADE_FLOOR = 60, 30
+STREAK_DAYS = 5
+TREND_POINTS = 10
+
+# Risk levels by score
+HIGH_RISK_SCORE = 50
+MEDIUM_RISK_SCORE = 25
+
+SCORE_FIELDS = [
+    'attendance_rate', 'rolling_attendance_rate', 'absence_streak', 'exam_average', 'grade_trend',
+    'outstanding_balance', 'risk_score', 'risk_level', 'computed_at',
+]
+
+
+def _scale(values, target, floor):
+    """0 at or above ``target``, 1 at or below ``floor``, linear in between"""
+    return np.clip((target - values) / (target - floor), 0, 1)
+
+
+def _groups(index):
+    """Start and end positions of the runs of equal values in a sorted index array"""
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    ends = np.r_[starts[1:], len(index)] - 1
+    return starts, ends
+
+
+class RiskScorer:
+    """
+    At-risk scores for every student, computed in vectorized passes.
+
+    Attendance counts, exam percentages and fee balances are read with a few
+    grouped queries into NumPy arrays indexed by the student's position in
+    ``student_ids``. Rates, absence streaks, grade trends and the combined
+    score then come from bincount and masked passes over whole arrays instead
+    of a loop per student.
+    """
+
+    def __init__(self, today=None):
+        self.today = today or timezone.localdate()
+        self.student_ids = np.array(
+            StudentProfile.objects.order_by('id').values_list('id', flat=True), dtype=np.int64
+        )
+
+    def _positions(self, ids):
+        """Positions of ``ids`` in student_ids, and a mask of the ids that are there"""
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(self.student_ids, ids)
+        found = positions < len(self.student_ids)
+        found[found] = self.student_ids[positions[found]] == ids[found]
+        return positions, found
+
+    def load_attendance(self):
+        """
+        Attendance counts per student as arrays aligned with student_ids:
+        sessions held and attended over the lookback and the rolling window,
+        and the number of school days missed since the last one attended.
+
+        Counting happens in two grouped queries: transferring one status code per
+        record (millions of rows for 50k students) costs far more than the counting.
+        """
+        count = len(self.student_ids)
+        first_day = self.today - timedelta(days=ATTENDANCE_LOOKBACK_DAYS - 1)
+        window_start = self.today - timedelta(days=ROLLING_WINDOW_DAYS - 1)
+        records = AttendanceRecord.objects.filter(date__range=(first_day, self.today))
+        attended = Q(status__in=['present', 'late'])
+        recent = Q(date__gte=window_start)
+
+        columns = {name: np.zeros(count) for name in ['held', 'attended', 'held_recent', 'attended_recent']}
+        # Day number (from first_day) of the last day with a session attended, -1 when none
+        last_attended = np.full(count, -1, dtype=np.int64)
+        rows = list(records.values('student_id').annotate(
+            held=Count('id'),
+            attended=Count('id', filter=attended),
+            held_recent=Count('id', filter=recent),
+            attended_recent=Count('id', filter=attended & recent),
+            last_attended=Max('date', filter=attended),
+        ).order_by().values_list('student_id', 'held', 'attended', 'held_recent', 'attended_recent', 'last_attended'))
+        if rows:
+            student_ids, *counts, last_dates = zip(*rows)
+            positions, found = self._positions(student_ids)
+            for name, values in zip(columns, counts):
+                columns[name][positions[found]] = np.array(values, dtype=float)[found]
+            days = np.array([(day - first_day).days if day else -1 for day in last_dates], dtype=np.int64)
+            last_attended[positions[found]] = days[found]
+
+        # Days with sessions but none attended; the ones after the last attended day are the streak
+        absence_streak = np.zeros(count, dtype=np.int64)
+        rows = list(records.values('student_id', 'date').annotate(
+            attended=Count('id', filter=attended)
+        ).filter(attended=0).order_by().values_list('student_id', 'date'))
+        if rows:
+            student_ids, dates = zip(*rows)
+            positions, found = self._positions(student_ids)
+            days = (np.array(dates, dtype='datetime64[D]') - np.datetime64(first_day)).astype(np.int64)
+            positions, days = positions[found], days[found]
+            absence_streak = np.bincount(positions[days > last_attended[positions]], minlength=count)
+
+        columns['absence_streak'] = absence_streak
+        return columns
+
+    def load_exams(self):
+        """(student position, percentage) per exam result, oldest exam first for each student"""
+        rows = list(ExamResult.objects.filter(
+            examination__exam_date__range=(self.today - timedelta(days=EXAM_LOOKBACK_DAYS), self.today),
+            examination__total_marks__gt=0
+        ).order_by('student_id', 'examination__exam_date', 'examination_id').values_list(
+            'student_id', 'marks_obtained', 'examination__total_marks'
+        ))
+
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        student_ids, marks, total_marks = zip(*rows)
+        positions, found = self._positions(student_ids)
+        percentages = np.array(marks, dtype=float) / np.array(total_marks, dtype=float) * 100
+        return positions[found], percentages[found]
+
+    def load_fees(self):
+        """(student position, amount billed, amount outstanding) per student with fees"""
+        rows = list(StudentFee.objects.values('student_id').annotate(
+            billed=Sum(F('amount_due') + F('late_fee_charged') - F('discount_amount'), filter=~Q(payment_status='waived')),
+            outstanding=Sum(BALANCE, filter=Q(payment_status__in=UNPAID_STATUSES)),
+        ).order_by().values_list('student_id', 'billed', 'outstanding'))
+
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+        student_ids, billed, outstanding = zip(*rows)
+        positions, found = self._positions(student_ids)
+        billed = np.array([amount or 0 for amount in billed], dtype=float)
+        outstanding = np.array([amount or 0 for amount in outstanding], dtype=float)
+        return positions[found], billed[found], outstanding[found]
+
+    def compute(self):
+        """Every score column as an array aligned with student_ids"""
+        count = len(self.student_ids)
+
+        # Attendance rates over the lookback and the rolling window
+        attendance = self.load_attendance()
+        attendance_rate = np.divide(
+            attendance['attended'] * 100, attendance['held'], out=np.full(count, np.nan), where=attendance['held'] > 0
+        )
+        rolling_rate = np.divide(
+            attendance['attended_recent'] * 100, attendance['held_recent'],
+            out=np.full(count, np.nan), where=attendance['held_recent'] > 0
+        )
+        absence_streak = attendance['absence_streak']
+
+        # Exam average and trend (least squares slope of percentage over exam number)
+        positions, percentages = self.load_exams()
+        exams = np.bincount(positions, minlength=count)
+        sum_y = np.bincount(positions, weights=percentages, minlength=count)
+        exam_average = np.divide(sum_y, exams, out=np.full(count, np.nan), where=exams > 0)
+        grade_trend = np.full(count, np.nan)
+        if len(positions):
+            starts, ends = _groups(positions)
+            exam_number = np.arange(len(positions)) - np.repeat(starts, ends - starts + 1)
+            sum_x = np.bincount(positions, weights=exam_number, minlength=count)
+            sum_xx = np.bincount(positions, weights=exam_number ** 2, minlength=count)
+            sum_xy = np.bincount(positions, weights=exam_number * percentages, minlength=count)
+            denominator = exams * sum_xx - sum_x ** 2
+            np.divide(exams * sum_xy - sum_x * sum_y, denominator, out=grade_trend, where=denominator > 0)
+
+        # Share of the billed fees still outstanding
+        positions, billed, outstanding = self.load_fees()
+        outstanding = np.maximum(outstanding, 0)
+        shares = np.divide(outstanding, billed, out=np.zeros(len(positions)), where=billed > 0)
+        outstanding_balance = np.zeros(count)
+        outstanding_share = np.zeros(count)
+        outstanding_balance[positions] = outstanding
+        outstanding_share[positions] = np.clip(shares, 0, 1)
+
+        # Missing data adds no risk; without recent sessions the whole lookback counts
+        recent_rate = np.where(np.isnan(rolling_rate), attendance_rate, rolling_rate)
+        risk_score = (
+            RISK_WEIGHTS['attendance'] * _scale(np.nan_to_num(recent_rate, nan=ATTENDANCE_TARGET), ATTENDANCE_TARGET, ATTENDANCE_FLOOR)
+            + RISK_WEIGHTS['streak'] * np.clip(absence_streak / STREAK_DAYS, 0, 1)
+            + RISK_WEIGHTS['grades'] * _scale(np.nan_to_num(exam_average, nan=GRADE_TARGET), GRADE_TARGET, GRADE_FLOOR)
+            + RISK_WEIGHTS['trend'] * np.clip(-np.nan_to_num(grade_trend) / TREND_POINTS, 0, 1)
+            + RISK_WEIGHTS['fees'] * outstanding_share
+        ).round(1)
+        risk_level = np.where(
+            risk_score >= HIGH_RISK_SCORE, 'high', np.where(risk_score >= MEDIUM_RISK_SCORE, 'medium', 'low')
+        )
+
+        return {
+            'attendance_rate': attendance_rate.round(1),
+            'rolling_attendance_rate': rolling_rate.round(1),
+            'absence_streak': absence_streak,
+            'exam_average': exam_average.round(1),
+            'grade_trend': grade_trend.round(2),
+            'outstanding_balance': outstanding_balance.round(2),
+            'risk_score': risk_score,
+            'risk_level': risk_level,
+        }
+
+    def save(self, results, batch_size=2000):
+        """Upsert one StudentRiskScore row per student. Returns the number of rows written."""
+        computed_at = timezone.now()
+        columns = {name: values.tolist() for name, values in results.items()}
+
+        def optional(value):
+            return None if value != value else value  # NaN means no data
+
+        scores = [
+            StudentRiskScore(
+                student_id=student_id,
+                attendance_rate=optional(columns['attendance_rate'][i]),
+                rolling_attendance_rate=optional(columns['rolling_attendance_rate'][i]),
+                absence_streak=columns['absence_streak'][i],
+                exam_average=optional(columns['exam_average'][i]),
+                grade_trend=optional(columns['grade_trend'][i]),
+                outstanding_balance=Decimal(f"{columns['outstanding_balance'][i]:.2f}"),
+                risk_score=columns['risk_score'][i],
+                risk_level=columns['risk_level'][i],
+                computed_at=computed_at,
+            )
+            for i, student_id in enumerate(self.student_ids.tolist())
+        ]
+
+        with transaction.atomic():
+            StudentRiskScore.objects.bulk_create(
+                scores,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=SCORE_FIELDS,
+            )
+        return len(scores)
@@ -0,0 +1,127 @@
+import threading
+import time as timer
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from .models import TeacherSchedule
+
+# Schedules saved in another process only reach this one through the TTL
+SCHEDULE_INDEX_TTL = 300  # seconds
+
+_index = {}
+_lock = threading.Lock()
+
+
+class TeacherWeekSchedule:
+    """A teacher's active weekly schedule held as sorted interval lists, one per weekday"""
+
+    def __init__(self, schedules):
+        days = defaultdict(list)
+        for schedule in schedules:
+            days[schedule.day_of_week].append(schedule)
+
+        self._days = {}
+        self._starts = {}
+        self._latest_ends = {}
+        for weekday, day_schedules in days.items():
+            day_schedules.sort(key=lambda schedule: schedule.start_time)
+            self._days[weekday] = day_schedules
+            self._starts[weekday] = [schedule.start_time for schedule in day_schedules]
+
+            # latest_ends[i] is the latest end time among the first i + 1 classes
+            latest_ends = []
+            for schedule in day_schedules:
+                latest_ends.append(max(latest_ends[-1], schedule.end_time) if latest_ends else schedule.end_time)
+            self._latest_ends[weekday] = latest_ends
+
+    def for_day(self, weekday):
+        """Active schedules for a weekday, ordered by start time"""
+        return self._days.get(weekday, [])
+
+    def scheduled_minutes(self, weekday):
+        return sum(schedule.duration_minutes for schedule in self.for_day(weekday))
+
+    def current(self, weekday, at_time, grace_minutes=0):
+        """
+        Return the class on at ``at_time``: the latest class that has started and
+        has not ended more than ``grace_minutes`` ago. Uses a bisect on start times.
+        """
+        starts = self._starts.get(weekday)
+        if not starts:
+            return None
+
+        position = bisect_right(starts, at_time)
+        moment = datetime.combine(datetime.min.date(), at_time)
+        grace = timedelta(minutes=grace_minutes)
+
+        # Walk back from the latest started class. The running latest end time
+        # stops the walk as soon as no earlier class can still be on, so only
+        # overlapping classes cost more than one step.
+        day_schedules = self._days[weekday]
+        latest_ends = self._latest_ends[weekday]
+        for index in range(position - 1, -1, -1):
+            if moment > datetime.combine(datetime.min.date(), latest_ends[index]) + grace:
+                break
+            schedule = day_schedules[index]
+            if moment <= datetime.combine(datetime.min.date(), schedule.end_time) + grace:
+                return schedule
+        return None
+
+
+def get_week_schedule(teacher_id):
+    """Return the cached TeacherWeekSchedule for a teacher, loading it on first use"""
+    now = timer.monotonic()
+    entry = _index.get(teacher_id)
+    if entry is not None and now - entry[0] < SCHEDULE_INDEX_TTL:
+        return entry[1]
+
+    schedules = TeacherSchedule.objects.filter(
+        teacher_id=teacher_id,
+        is_active=True
+    ).select_related('subject_assignment__subject', 'subject_assignment__class_assigned')
+    week = TeacherWeekSchedule(schedules)
+
+    with _lock:
+        _index[teacher_id] = (now, week)
+    return week
+
+
+def get_week_schedules(teacher_ids):
+    """
+    Return {teacher_id: TeacherWeekSchedule} for many teachers, loading every
+    teacher missing from the cache with a single query
+    """
+    now = timer.monotonic()
+    weeks = {}
+    missing = []
+    for teacher_id in set(teacher_ids):
+        entry = _index.get(teacher_id)
+        if entry is not None and now - entry[0] < SCHEDULE_INDEX_TTL:
+            weeks[teacher_id] = entry[1]
+        else:
+            missing.append(teacher_id)
+
+    if missing:
+        by_teacher = defaultdict(list)
+        schedules = TeacherSchedule.objects.filter(
+            teacher_id__in=missing,
+            is_active=True
+        ).select_related('subject_assignment__subject', 'subject_assignment__class_assigned')
+        for schedule in schedules:
+            by_teacher[schedule.teacher_id].append(schedule)
+
+        with _lock:
+            for teacher_id in missing:
+                weeks[teacher_id] = TeacherWeekSchedule(by_teacher[teacher_id])
+                _index[teacher_id] = (now, weeks[teacher_id])
+
+    return weeks
+
+
+def invalidate_schedule_index(teacher_id=None):
+    """Drop one teacher's cached schedule, or every teacher's when no id is given"""
+    with _lock:
+        if teacher_id is None:
+            _index.clear()
+        else:
+            _index.pop(teacher_id, None)
@@ -0,0 +1,123 @@
+from collections import defaultdict
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from academic.models import TeacherSubjectAssignment
+from .models import AttendanceRecord, AttendanceSession, TeacherSchedule, TeacherActivityLog, GeofenceLocation, CampusNetwork
+from .summary import refresh_session_summary, refresh_month_summary
+from .schedule_index import invalidate_schedule_index
+from .activity_rollup import record_activity_rollup
+from .geofence import invalidate_geofence_engine
+from .campus_network import invalidate_campus_network_index
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_attendance_summary_on_save(sender, instance, **kwargs):
+    """
+    Keep the monthly AttendanceSummary current when a record is created or its status changes
+    """
+    refresh_session_summary(instance.session_id, [instance.student_id])
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def update_attendance_summary_on_delete(sender, instance, **kwargs):
+    """
+    Remove a deleted record from the monthly AttendanceSummary
+    """
+    refresh_session_summary(instance.session_id, [instance.student_id])
+
+
+@receiver(post_save, sender=TeacherSchedule)
+@receiver(post_delete, sender=TeacherSchedule)
+def invalidate_schedule_index_on_change(sender, instance, **kwargs):
+    """
+    Drop cached weekly schedules when a schedule changes (it may also have moved between teachers)
+    """
+    invalidate_schedule_index()
+
+
+@receiver(post_save, sender=GeofenceLocation)
+@receiver(post_delete, sender=GeofenceLocation)
+def invalidate_geofence_engine_on_change(sender, instance, **kwargs):
+    """
+    Rebuild the cached geofence arrays after a fence is added, moved or switched off
+    """
+    invalidate_geofence_engine()
+
+
+@receiver(post_save, sender=CampusNetwork)
+@receiver(post_delete, sender=CampusNetwork)
+def invalidate_campus_network_index_on_change(sender, instance, **kwargs):
+    """
+    Recompile the cached campus network intervals after a network is added, changed or removed
+    """
+    invalidate_campus_network_index()
+
+
+def _refresh_moved_summaries(moves):
+    """
+    Refresh the monthly summaries records left and the ones they moved into.
+    ``moves`` holds (student_id, old key, new key) with keys (subject, class, year, month).
+    """
+    students = defaultdict(set)
+    for student_id, old_key, new_key in moves:
+        if old_key != new_key:
+            students[old_key].add(student_id)
+            students[new_key].add(student_id)
+    for (subject_id, class_id, year, month), student_ids in students.items():
+        if subject_id is not None and class_id is not None:
+            refresh_month_summary(subject_id, class_id, year, month, student_ids)
+
+
+@receiver(post_save, sender=AttendanceSession)
+def sync_record_session_fields(sender, instance, created, **kwargs):
+    """
+    Copy a session's date, start time, subject and class onto its records after it changes,
+    and move their counts to the right monthly summaries
+    """
+    if created:
+        return
+    fields = AttendanceRecord.session_fields(instance.id)
+    stale = AttendanceRecord.objects.filter(session=instance).exclude(**fields)
+    # The records still hold the old values, i.e. the summaries they are counted in
+    moved = list(stale.values_list('student_id', 'subject_id', 'class_assigned_id', 'date'))
+    stale.update(**fields)
+
+    new_key = (fields['subject_id'], fields['class_assigned_id'], fields['date'].year, fields['date'].month)
+    _refresh_moved_summaries(
+        (student_id, (subject_id, class_id, day.year, day.month), new_key)
+        for student_id, subject_id, class_id, day in moved
+    )
+
+
+@receiver(post_save, sender=TeacherSubjectAssignment)
+def sync_record_assignment_fields(sender, instance, created, **kwargs):
+    """
+    Copy an assignment's subject and class onto the records of its sessions after it changes,
+    and move their counts to the right monthly summaries
+    """
+    if created:
+        return
+    stale = AttendanceRecord.objects.filter(session__teacher_assignment=instance).exclude(
+        subject_id=instance.subject_id,
+        class_assigned_id=instance.class_assigned_id
+    )
+    moved = list(stale.values_list('student_id', 'subject_id', 'class_assigned_id', 'date'))
+    stale.update(subject_id=instance.subject_id, class_assigned_id=instance.class_assigned_id)
+
+    _refresh_moved_summaries(
+        (
+            student_id,
+            (subject_id, class_id, day.year, day.month),
+            (instance.subject_id, instance.class_assigned_id, day.year, day.month),
+        )
+        for student_id, subject_id, class_id, day in moved
+    )
+
+
+@receiver(post_save, sender=TeacherActivityLog)
+def update_activity_rollup(sender, instance, created, **kwargs):
+    """
+    Count a new activity log in the hourly TeacherActivityHourly rollup
+    """
+    if created:
+        record_activity_rollup([(instance.teacher_id, instance.activity_type, instance.timestamp)])
@@ -0,0 +1,198 @@
+from calendar import monthrange
+from datetime import date
+from django.db import transaction
+from django.db.models import Count, Q, Sum, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from accounts.dashboard_cache import bump_dashboard_versions
+from .models import AttendanceRecord, AttendanceSession, AttendanceSummary
+
+SUMMARY_UPDATE_FIELDS = [
+    'total_sessions', 'sessions_attended', 'sessions_late', 'sessions_excused', 'attendance_percentage'
+]
+
+EMPTY_COUNTS = {'total': 0, 'present': 0, 'late': 0, 'excused': 0, 'absent': 0}
+
+
+def _status_counts():
+    """Conditional counts used to fill an AttendanceSummary row"""
+    return {
+        'total': Count('id'),
+        'present': Count('id', filter=Q(status='present')),
+        'late': Count('id', filter=Q(status='late')),
+        'excused': Count('id', filter=Q(status='excused')),
+    }
+
+
+def _build_summary(student_id, subject_id, class_id, year, month, counts):
+    summary = AttendanceSummary(
+        student_id=student_id,
+        subject_id=subject_id,
+        class_enrolled_id=class_id,
+        year=year,
+        month=month,
+        total_sessions=counts['total'],
+        sessions_attended=counts['present'],
+        sessions_late=counts['late'],
+        sessions_excused=counts['excused'],
+    )
+    summary.calculate_percentage()
+    return summary
+
+
+def _upsert_summaries(summaries):
+    AttendanceSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['student', 'subject', 'class_enrolled', 'month', 'year'],
+        update_fields=SUMMARY_UPDATE_FIELDS,
+    )
+
+
+def refresh_session_summary(session_id, student_ids):
+    """
+    Recompute the monthly summary rows touched by a session for the given students.
+
+    Runs a fixed number of queries regardless of how many students are passed.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+
+    key = AttendanceSession.objects.filter(id=session_id).values(
+        'date',
+        subject_id=F('teacher_assignment__subject_id'),
+        class_id=F('teacher_assignment__class_assigned_id'),
+    ).first()
+    if key is None:
+        return
+
+    refresh_month_summary(key['subject_id'], key['class_id'], key['date'].year, key['date'].month, student_ids)
+
+
+def refresh_month_summary(subject_id, class_id, year, month, student_ids):
+    """
+    Recompute the summary rows of one subject, class and month for the given students.
+
+    Sessions of the same subject, class and month share summary rows, so callers
+    writing many sessions at once can refresh each month once.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+
+    rows = AttendanceRecord.objects.filter(
+        student_id__in=student_ids,
+        session__teacher_assignment__subject_id=subject_id,
+        session__teacher_assignment__class_assigned_id=class_id,
+        session__date__year=year,
+        session__date__month=month
+    ).values('student_id').annotate(**_status_counts())
+
+    summaries = [
+        _build_summary(row['student_id'], subject_id, class_id, year, month, row)
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        if summaries:
+            _upsert_summaries(summaries)
+
+        # Students left without any record in this month no longer have a summary
+        remaining = {summary.student_id for summary in summaries}
+        empty = [student_id for student_id in student_ids if student_id not in remaining]
+        if empty:
+            AttendanceSummary.objects.filter(
+                student_id__in=empty,
+                subject_id=subject_id,
+                class_enrolled_id=class_id,
+                year=year,
+                month=month
+            ).delete()
+
+    # Bulk writes send no signals, so cached dashboards learn about them here
+    bump_dashboard_versions('attendance')
+
+
+def rebuild_attendance_summary(date_from, date_to, batch_size=1000):
+    """
+    Recompute every summary row for the months covered by [date_from, date_to].
+
+    Summaries are monthly, so the range is widened to whole months. Returns the
+    number of summary rows written.
+    """
+    if date_from > date_to:
+        raise ValueError('date_from must not be after date_to')
+
+    start = date(date_from.year, date_from.month, 1)
+    end = date(date_to.year, date_to.month, monthrange(date_to.year, date_to.month)[1])
+
+    months = Q()
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months |= Q(year=year, month=month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    rows = AttendanceRecord.objects.filter(
+        session__date__gte=start,
+        session__date__lte=end
+    ).annotate(
+        summary_year=ExtractYear('session__date'),
+        summary_month=ExtractMonth('session__date'),
+    ).values(
+        'student_id',
+        'summary_year',
+        'summary_month',
+        # Not 'subject_id': AttendanceRecord has its own (denormalized) subject column
+        summary_subject_id=F('session__teacher_assignment__subject_id'),
+        class_id=F('session__teacher_assignment__class_assigned_id'),
+    ).annotate(**_status_counts()).order_by()
+
+    written = 0
+    with transaction.atomic():
+        AttendanceSummary.objects.filter(months).delete()
+
+        batch = []
+        for row in rows.iterator():
+            batch.append(_build_summary(
+                row['student_id'], row['summary_subject_id'], row['class_id'],
+                row['summary_year'], row['summary_month'], row
+            ))
+            if len(batch) >= batch_size:
+                AttendanceSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+
+        if batch:
+            AttendanceSummary.objects.bulk_create(batch)
+            written += len(batch)
+
+    bump_dashboard_versions('attendance')
+    return written
+
+
+def attendance_counts(**filters):
+    """
+    Return per-student attendance counts read from the summary table.
+
+    The result maps student_id to a dict with ``total``, ``present``, ``late``,
+    ``excused`` and ``absent`` session counts, summed over every summary row
+    matching ``filters``.
+    """
+    rows = AttendanceSummary.objects.filter(**filters).values('student_id').annotate(
+        total=Sum('total_sessions'),
+        present=Sum('sessions_attended'),
+        late=Sum('sessions_late'),
+        excused=Sum('sessions_excused'),
+    ).order_by()
+
+    counts = {}
+    for row in rows:
+        counts[row['student_id']] = {
+            'total': row['total'],
+            'present': row['present'],
+            'late': row['late'],
+            'excused': row['excused'],
+            'absent': row['total'] - row['present'] - row['late'] - row['excused'],
+        }
+    return counts
+
@@ -0,0 +1,239 @@
+from collections import defaultdict
+from datetime import datetime
+from django.db import IntegrityError, transaction
+from academic.models import StudentEnrollment, TeacherSubjectAssignment
+from .bulk import clean_attendance_rows, reject_unenrolled
+from .models import AttendanceRecord, AttendanceSession, AttendanceSyncReceipt
+from .summary import refresh_month_summary
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+# Records written per INSERT
+RECORD_BATCH_SIZE = 500
+
+
+def _parse_time(value):
+    for time_format in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.strptime(value, time_format).time()
+        except (TypeError, ValueError):
+            continue
+    raise ValueError
+
+
+def _parse_session(item):
+    """Validate one queued session. Returns (fields, error message)."""
+    if not isinstance(item, dict):
+        return None, 'Invalid session'
+
+    key = item.get('idempotency_key')
+    if not isinstance(key, str) or not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return None, f'idempotency_key is required (at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters)'
+
+    if not all([item.get('assignment_id'), item.get('date'), item.get('start_time'), item.get('end_time')]):
+        return {'key': key}, 'Missing required fields'
+
+    try:
+        fields = {
+            'key': key,
+            'assignment_id': int(item['assignment_id']),
+            'date': datetime.strptime(item['date'], '%Y-%m-%d').date(),
+            'start_time': _parse_time(item['start_time']),
+            'end_time': _parse_time(item['end_time']),
+        }
+    except (TypeError, ValueError):
+        return {'key': key}, 'Invalid assignment, date or time'
+
+    attendance_data = item.get('attendance_data', [])
+    if not isinstance(attendance_data, list):
+        return {'key': key}, 'attendance_data must be a list'
+
+    fields['topic_covered'] = str(item.get('topic_covered', '') or '')[:200]
+    fields['attendance_data'] = attendance_data
+    return fields, None
+
+
+def sync_attendance_batch(teacher, items):
+    """
+    Apply a batch of offline-queued attendance sessions for ``teacher``.
+
+    Each item is a session as sent to save_attendance_ajax plus an
+    ``idempotency_key``. Keys that were applied before return their stored
+    result without touching anything else, so replaying a batch costs one
+    query. All new sessions are applied in one transaction with bulk writes.
+
+    Returns one result dict per item, in order, with ``status`` 'applied',
+    'duplicate' or 'rejected'.
+    """
+    for attempt in range(2):
+        try:
+            return _sync(teacher, items)
+        except IntegrityError:
+            # A concurrent replay stored some of the same keys first; the retry returns their results
+            if attempt:
+                raise
+
+
+def _sync(teacher, items):
+    results = [None] * len(items)
+    parsed = []
+    seen_keys = {}
+
+    for position, item in enumerate(items):
+        fields, error = _parse_session(item)
+        if fields is None:
+            results[position] = {'idempotency_key': None, 'status': 'rejected', 'error': error}
+        elif fields['key'] in seen_keys:
+            # Same key twice in one batch: the first occurrence wins
+            results[position] = {'duplicate_of': seen_keys[fields['key']]}
+        else:
+            seen_keys[fields['key']] = position
+            parsed.append((position, fields, error))
+
+    if parsed:
+        stored = dict(AttendanceSyncReceipt.objects.filter(
+            teacher=teacher,
+            idempotency_key__in=list(seen_keys)
+        ).values_list('idempotency_key', 'result'))
+
+        new = []
+        for position, fields, error in parsed:
+            if fields['key'] in stored:
+                results[position] = {**stored[fields['key']], 'status': 'duplicate'}
+            elif error:
+                results[position] = {'idempotency_key': fields['key'], 'status': 'rejected', 'error': error}
+            else:
+                new.append((position, fields))
+
+        if new:
+            with transaction.atomic():
+                _apply(teacher, new, results)
+
+    for position, result in enumerate(results):
+        if 'duplicate_of' in result:
+            first = results[result['duplicate_of']]
+            results[position] = first if first['status'] == 'rejected' else {**first, 'status': 'duplicate'}
+
+    return results
+
+
+def _apply(teacher, new, results):
+    """Write the sessions, records, summaries and receipts of the new items with bulk queries"""
+    assignments = TeacherSubjectAssignment.objects.filter(
+        teacher=teacher,
+        id__in={fields['assignment_id'] for _, fields in new}
+    ).in_bulk()
+
+    accepted = []
+    for position, fields in new:
+        if fields['assignment_id'] in assignments:
+            accepted.append((position, fields))
+        else:
+            results[position] = {'idempotency_key': fields['key'], 'status': 'rejected', 'error': 'Assignment not found'}
+    if not accepted:
+        return
+
+    def slot(fields):
+        return fields['assignment_id'], fields['date'], fields['start_time']
+
+    # Sessions: create missing ones, then complete the existing ones
+    def load_sessions():
+        return {
+            (session.teacher_assignment_id, session.date, session.start_time): session
+            for session in AttendanceSession.objects.filter(
+                teacher_assignment_id__in={fields['assignment_id'] for _, fields in accepted},
+                date__in={fields['date'] for _, fields in accepted}
+            )
+        }
+
+    sessions = load_sessions()
+    latest = {slot(fields): fields for _, fields in accepted}
+
+    missing = [AttendanceSession(
+        teacher_assignment_id=fields['assignment_id'],
+        date=fields['date'],
+        start_time=fields['start_time'],
+        end_time=fields['end_time'],
+        topic_covered=fields['topic_covered'],
+        is_completed=True
+    ) for key, fields in latest.items() if key not in sessions]
+    if missing:
+        AttendanceSession.objects.bulk_create(missing, ignore_conflicts=True)
+        sessions = load_sessions()
+
+    changed = []
+    for key, fields in latest.items():
+        session = sessions[key]
+        if (session.end_time, session.topic_covered, session.is_completed) != (fields['end_time'], fields['topic_covered'], True):
+            session.end_time = fields['end_time']
+            session.topic_covered = fields['topic_covered']
+            session.is_completed = True
+            changed.append(session)
+    if changed:
+        AttendanceSession.objects.bulk_update(changed, ['end_time', 'topic_covered', 'is_completed'])
+
+    # Only students actively enrolled in each session's class may be marked
+    cleaned = [(position, fields) + clean_attendance_rows(fields['attendance_data']) for position, fields in accepted]
+    enrolled = defaultdict(set)
+    for class_id, student_id in StudentEnrollment.objects.filter(
+        class_enrolled_id__in={assignments[fields['assignment_id']].class_assigned_id for _, fields in accepted},
+        student_id__in={student_id for _, _, submitted, _ in cleaned for student_id in submitted},
+        is_active=True
+    ).values_list('class_enrolled_id', 'student_id'):
+        enrolled[class_id].add(student_id)
+
+    session_ids = [sessions[key].id for key in latest]
+    existing = set(AttendanceRecord.objects.filter(session_id__in=session_ids).values_list('session_id', 'student_id'))
+
+    records = {}
+    months = defaultdict(set)
+    receipts = []
+    for position, fields, submitted, rejected in cleaned:
+        assignment = assignments[fields['assignment_id']]
+        session = sessions[slot(fields)]
+        reject_unenrolled(submitted, enrolled[assignment.class_assigned_id], rejected)
+
+        # Later sessions in the batch for the same slot replace earlier rows
+        for student_id, (status, remarks) in submitted.items():
+            records[(session.id, student_id)] = AttendanceRecord(
+                session_id=session.id,
+                student_id=student_id,
+                status=status,
+                remarks=remarks,
+                date=session.date,
+                start_time=session.start_time,
+                subject_id=assignment.subject_id,
+                class_assigned_id=assignment.class_assigned_id,
+            )
+        months[(assignment.subject_id, assignment.class_assigned_id, session.date.year, session.date.month)].update(submitted)
+
+        updated = sum(1 for student_id in submitted if (session.id, student_id) in existing)
+        results[position] = {
+            'idempotency_key': fields['key'],
+            'status': 'applied',
+            'session_id': session.id,
+            'inserted': len(submitted) - updated,
+            'updated': updated,
+            'rejected': rejected,
+        }
+        receipts.append(AttendanceSyncReceipt(
+            teacher=teacher,
+            idempotency_key=fields['key'],
+            session_id=session.id,
+            result=results[position]
+        ))
+
+    if records:
+        AttendanceRecord.objects.bulk_create(
+            list(records.values()),
+            update_conflicts=True,
+            unique_fields=['session', 'student'],
+            update_fields=['status', 'remarks'],
+            batch_size=RECORD_BATCH_SIZE,
+        )
+
+    # bulk_create does not send signals, so refresh each touched summary month once
+    for (subject_id, class_id, year, month), student_ids in months.items():
+        refresh_month_summary(subject_id, class_id, year, month, student_ids)
+
+    AttendanceSyncReceipt.objects.bulk_create(receipts)
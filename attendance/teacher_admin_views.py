@@ -1,15 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q, Count, Avg, Sum
+from django.db.models import Q, Count, Avg, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.core.paginator import Paginator
+from calendar import monthrange
 from datetime import datetime, timedelta, date
-import csv
 from .models import TeacherAttendance, TeacherActivityLog, TeacherLeave, AttendanceSession
 from accounts.models import TeacherProfile
 from academic.models import TeacherSubjectAssignment
+from .teacher_dashboard import build_teacher_day_rows
+from .exports import stream_csv, stream_rows_csv, full_name
+from .activity_rollup import activity_counts, online_teacher_count
+from .activity_rules import ACTIVITY_RULES, classifier_stats
+from .compliance import get_compliance_engine
+from .live import get_live_board
 
 def is_admin(user):
     return user.is_authenticated and user.user_type == 'admin'
@@ -35,94 +44,54 @@ def teacher_attendance_dashboard(request):
         year, month = today.year, today.month
     
     # Get all teachers
-    all_teachers = TeacherProfile.objects.select_related('user').order_by('user__first_name')
-    total_teachers = all_teachers.count()
+    all_teachers = list(TeacherProfile.objects.select_related('user').order_by('user__first_name'))
+    total_teachers = len(all_teachers)
     
-    # Process each teacher's attendance for the selected date
-    enhanced_attendance = []
-    present_count = 0
-    absent_count = 0
-    late_count = 0
-    on_leave_count = 0
+    # Create missing records and update every status based on real activities in one pass
+    evaluated = TeacherAttendance.evaluate_many(all_teachers, filter_date)
+    attendance_by_teacher = {attendance.teacher_id: attendance for attendance in evaluated['records']}
     
+    attendances = []
     for teacher in all_teachers:
-        # Get or create attendance record
-        attendance, created = TeacherAttendance.objects.get_or_create(
-            teacher=teacher,
-            date=filter_date,
-            defaults={
-                'status': 'absent',
-                'is_auto_marked': True
-            }
-        )
-        
-        # Update status based on real activities
-        attendance.determine_status_advanced()
-        attendance.save()
-        
-        # Count statuses
-        if attendance.status in ['present', 'late']:
-            if attendance.status == 'present':
-                present_count += 1
-            else:
-                late_count += 1
-        elif attendance.status == 'on_leave':
-            on_leave_count += 1
-        else:
-            absent_count += 1
-        
-        # Get teacher's subject assignments
-        subject_assignments = TeacherSubjectAssignment.objects.filter(
-            teacher=teacher
-        ).select_related('subject', 'class_assigned')
-        
-        # Get attendance sessions for the selected date
-        attendance_sessions = AttendanceSession.objects.filter(
-            teacher_assignment__teacher=teacher,
-            date=filter_date
-        ).select_related('teacher_assignment__subject', 'teacher_assignment__class_assigned')
-        
-        # Get duties performed and subjects not attended
-        duties_performed = attendance.get_duties_performed()
-        subjects_not_attended = attendance.get_subjects_not_attended()
-        
-        enhanced_attendance.append({
-            'attendance': attendance,
-            'subject_assignments': subject_assignments,
-            'attendance_sessions': attendance_sessions,
-            'subjects_taught_today': attendance_sessions.count(),
-            'classes_attended': attendance_sessions.filter(is_completed=True).count(),
-            'duties_performed': duties_performed,
-            'subjects_not_attended': subjects_not_attended,
-            'has_real_activities': attendance.has_performed_duties(),
-            'real_check_in': attendance.first_activity_time.time() if attendance.first_activity_time else None,
-            'real_check_out': attendance.last_activity_time.time() if attendance.last_activity_time else None,
-        })
+        attendance = attendance_by_teacher[teacher.id]
+        attendance.teacher = teacher
+        attendances.append(attendance)
+    
+    # Assignments, sessions and duties for every teacher, grouped in memory
+    enhanced_attendance = build_teacher_day_rows(attendances, filter_date)
+    
+    # Count statuses
+    present_count = sum(1 for attendance in attendances if attendance.status == 'present')
+    late_count = sum(1 for attendance in attendances if attendance.status == 'late')
+    on_leave_count = sum(1 for attendance in attendances if attendance.status == 'on_leave')
+    absent_count = total_teachers - present_count - late_count - on_leave_count
     
     # Calculate attendance percentage
     attendance_percentage = (present_count / total_teachers * 100) if total_teachers > 0 else 0
     
-    # Monthly statistics
-    monthly_attendance = TeacherAttendance.objects.filter(
+    # Monthly statistics in one conditional aggregate
+    monthly_totals = TeacherAttendance.objects.filter(
         date__year=year,
         date__month=month
+    ).aggregate(
+        working_days=Count('date', distinct=True),
+        attended=Count('id', filter=Q(status__in=['present', 'late'])),
+        late=Count('id', filter=Q(status='late')),
+        leaves=Count('id', filter=Q(status='on_leave')),
     )
     
     monthly_stats = {
-        'total_working_days': monthly_attendance.values('date').distinct().count(),
-        'avg_attendance': monthly_attendance.filter(status__in=['present', 'late']).count() / total_teachers if total_teachers > 0 else 0,
-        'total_late_instances': monthly_attendance.filter(status='late').count(),
-        'total_leaves': monthly_attendance.filter(status='on_leave').count(),
+        'total_working_days': monthly_totals['working_days'],
+        'avg_attendance': monthly_totals['attended'] / total_teachers if total_teachers > 0 else 0,
+        'total_late_instances': monthly_totals['late'],
+        'total_leaves': monthly_totals['leaves'],
     }
     
     # Recent activity
     recent_activities = TeacherActivityLog.objects.select_related('teacher__user').order_by('-timestamp')[:10]
     
     # Teachers currently online (active in last 30 minutes)
-    thirty_minutes_ago = timezone.now() - timedelta(minutes=30)
-    online_teachers = TeacherActivityLog.objects.filter(
-        timestamp__gte=thirty_minutes_ago
-    ).values('teacher').distinct().count()
+    online_teachers = online_teacher_count(30)
     
     context = {
         'today': today,
@@ -154,29 +123,11 @@ def teacher_attendance_reports(request):
     end_date = request.GET.get('end_date')
     status_filter = request.GET.get('status')
     
-    # Base queryset
-    attendance_records = TeacherAttendance.objects.select_related('teacher__user').order_by('-date')
-    
-    # Apply filters
-    if teacher_id:
-        attendance_records = attendance_records.filter(teacher_id=teacher_id)
-    
-    if start_date:
-        try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            attendance_records = attendance_records.filter(date__gte=start_date_obj)
-        except:
-            pass
+    attendance_records = filter_teacher_attendance(request).select_related('teacher__user')
     
-    if end_date:
-        try:
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            attendance_records = attendance_records.filter(date__lte=end_date_obj)
-        except:
-            pass
-    
-    if status_filter:
-        attendance_records = attendance_records.filter(status=status_filter)
+    # Handle CSV export (every matching record, streamed)
+    if request.GET.get('export') == 'csv':
+        return export_enhanced_teacher_attendance(request, attendance_records)
     
     # Limit to 100 records for performance
     attendance_records = attendance_records[:100]
@@ -212,10 +163,6 @@ def teacher_attendance_reports(request):
     # Get all teachers for filter dropdown
     teachers = TeacherProfile.objects.select_related('user').order_by('user__first_name')
     
-    # Handle CSV export
-    if request.GET.get('export') == 'csv':
-        return export_enhanced_teacher_attendance(enhanced_records)
-    
     context = {
         'enhanced_records': enhanced_records,
         'teachers': teachers,
@@ -233,19 +180,15 @@ def teacher_attendance_reports(request):
     
     return render(request, 'admin/attendance/teacher_attendance_reports.html', context)
 
-@login_required
-@user_passes_test(is_admin)
-def export_teacher_attendance(request):
-    """Export teacher attendance to CSV"""
-    
-    # Get filter parameters (same as reports view)
+def filter_teacher_attendance(request):
+    """TeacherAttendance queryset filtered by the teacher/start_date/end_date/status GET parameters"""
     teacher_id = request.GET.get('teacher')
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     status_filter = request.GET.get('status')
     
     # Base queryset
-    attendance_records = TeacherAttendance.objects.select_related('teacher__user').order_by('-date')
+    attendance_records = TeacherAttendance.objects.order_by('-date')
     
     # Apply filters
     if teacher_id:
@@ -265,74 +208,103 @@ def export_teacher_attendance(request):
     if status_filter:
         attendance_records = attendance_records.filter(status=status_filter)
     
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="teacher_attendance.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Teacher Name', 'Date', 'Status', 'Check In', 'Check Out', 
-        'Total Hours', 'IP Address', 'Remarks'
-    ])
-    
-    for record in attendance_records:
-        writer.writerow([
-            record.teacher.user.get_full_name(),
-            record.date,
-            record.get_status_display(),
-            record.check_in_time or '',
-            record.check_out_time or '',
-            record.total_hours,
-            record.ip_address or '',
-            record.remarks
-        ])
-    
-    return response
+    return attendance_records
 
-def export_enhanced_teacher_attendance(enhanced_records):
+@login_required
+@user_passes_test(is_admin)
+def export_teacher_attendance(request):
+    """Export teacher attendance to CSV"""
+    status_labels = dict(TeacherAttendance.STATUS_CHOICES)
+    
+    def format_row(row):
+        first_name, last_name, date, status, check_in, check_out, total_hours, ip_address, remarks = row
+        return [
+            full_name(first_name, last_name),
+            date,
+            status_labels.get(status, status),
+            check_in or '',
+            check_out or '',
+            total_hours,
+            ip_address or '',
+            remarks
+        ]
+    
+    return stream_csv(
+        request,
+        'teacher_attendance.csv',
+        ['Teacher Name', 'Date', 'Status', 'Check In', 'Check Out',
+         'Total Hours', 'IP Address', 'Remarks'],
+        filter_teacher_attendance(request),
+        ['teacher__user__first_name', 'teacher__user__last_name', 'date', 'status', 'check_in_time',
+         'check_out_time', 'total_hours', 'ip_address', 'remarks'],
+        format_row,
+    )
+
+def export_enhanced_teacher_attendance(request, attendance_records):
     """Export enhanced teacher attendance to CSV"""
+    status_labels = dict(TeacherAttendance.STATUS_CHOICES)
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="enhanced_teacher_attendance.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Teacher Name', 'Date', 'Status', 'Check In', 'Check Out', 
-        'Total Hours', 'Subjects Assigned', 'Classes Conducted', 'Total Sessions',
-        'Auto Marked', 'Remarks'
-    ])
+    # Subjects per teacher, loaded once
+    subjects_by_teacher = {}
+    assignments = TeacherSubjectAssignment.objects.values_list(
+        'teacher_id', 'subject__name', 'class_assigned__course__name',
+        'class_assigned__year', 'class_assigned__semester', 'class_assigned__section'
+    )
+    for teacher_id, subject, course, year, semester, section in assignments:
+        subjects_by_teacher.setdefault(teacher_id, []).append(
+            f"{subject} ({course} - Year {year}, Sem {semester} - {section})"
+        )
     
-    for item in enhanced_records:
-        record = item['record']
-        subjects = ', '.join([f"{sa.subject.name} ({sa.class_assigned})" for sa in item['subject_assignments']])
-        
-        writer.writerow([
-            record.teacher.user.get_full_name(),
-            record.date,
-            record.get_status_display(),
-            record.check_in_time or '',
-            record.check_out_time or '',
-            record.total_hours,
-            subjects,
-            item['classes_conducted'],
-            item['total_sessions'],
-            'Yes' if record.is_auto_marked else 'No',
-            record.remarks
-        ])
+    # Session counts per row come from correlated subqueries in the same SELECT
+    day_sessions = AttendanceSession.objects.filter(
+        teacher_assignment__teacher=OuterRef('teacher_id'),
+        date=OuterRef('date')
+    ).order_by().values('teacher_assignment__teacher')
+    attendance_records = attendance_records.annotate(
+        total_sessions=Coalesce(Subquery(day_sessions.annotate(count=Count('id')).values('count')), 0),
+        classes_conducted=Coalesce(Subquery(
+            day_sessions.filter(is_completed=True).annotate(count=Count('id')).values('count')
+        ), 0),
+    )
     
-    return response
+    def format_row(row):
+        (teacher_id, first_name, last_name, date, status, check_in, check_out, total_hours,
+         classes_conducted, total_sessions, is_auto_marked, remarks) = row
+        return [
+            full_name(first_name, last_name),
+            date,
+            status_labels.get(status, status),
+            check_in or '',
+            check_out or '',
+            total_hours,
+            ', '.join(subjects_by_teacher.get(teacher_id, [])),
+            classes_conducted,
+            total_sessions,
+            'Yes' if is_auto_marked else 'No',
+            remarks
+        ]
+    
+    return stream_csv(
+        request,
+        'enhanced_teacher_attendance.csv',
+        ['Teacher Name', 'Date', 'Status', 'Check In', 'Check Out',
+         'Total Hours', 'Subjects Assigned', 'Classes Conducted', 'Total Sessions',
+         'Auto Marked', 'Remarks'],
+        attendance_records,
+        ['teacher_id', 'teacher__user__first_name', 'teacher__user__last_name', 'date', 'status',
+         'check_in_time', 'check_out_time', 'total_hours', 'classes_conducted', 'total_sessions',
+         'is_auto_marked', 'remarks'],
+        format_row,
+    )
 
-@login_required
-@user_passes_test(is_admin)
-def teacher_activity_logs(request):
-    """View teacher activity logs"""
-    
+def filter_activity_logs(request):
+    """TeacherActivityLog queryset filtered by the teacher/activity_type/date GET parameters"""
     teacher_id = request.GET.get('teacher')
     activity_type = request.GET.get('activity_type')
     date_filter = request.GET.get('date')
     
     # Base queryset
-    activities = TeacherActivityLog.objects.select_related('teacher__user').order_by('-timestamp')
+    activities = TeacherActivityLog.objects.order_by('-timestamp')
     
     # Apply filters
     if teacher_id:
@@ -348,6 +320,19 @@ def teacher_activity_logs(request):
         except:
             pass
     
+    return activities
+
+@login_required
+@user_passes_test(is_admin)
+def teacher_activity_logs(request):
+    """View teacher activity logs"""
+    
+    teacher_id = request.GET.get('teacher')
+    activity_type = request.GET.get('activity_type')
+    date_filter = request.GET.get('date')
+    
+    activities = filter_activity_logs(request).select_related('teacher__user')
+    
     # Pagination
     paginator = Paginator(activities, 50)
     page_number = request.GET.get('page')
@@ -368,6 +353,36 @@ def teacher_activity_logs(request):
     
     return render(request, 'attendance/teacher_activity_logs.html', context)
 
+@login_required
+@user_passes_test(is_admin)
+def export_teacher_activity_logs(request):
+    """Export teacher activity logs to CSV, with the same filters as the log view"""
+    activity_labels = dict(TeacherActivityLog.ACTIVITY_CHOICES)
+    
+    def format_row(row):
+        first_name, last_name, timestamp, activity_type, priority, description, ip_address, is_on_campus, user_agent = row
+        return [
+            full_name(first_name, last_name),
+            timezone.localtime(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+            activity_labels.get(activity_type, activity_type),
+            priority,
+            description,
+            ip_address or '',
+            'Yes' if is_on_campus else 'No',
+            user_agent
+        ]
+    
+    return stream_csv(
+        request,
+        'teacher_activity_logs.csv',
+        ['Teacher Name', 'Timestamp', 'Activity', 'Priority', 'Description',
+         'IP Address', 'On Campus', 'User Agent'],
+        filter_activity_logs(request),
+        ['teacher__user__first_name', 'teacher__user__last_name', 'timestamp', 'activity_type',
+         'priority_level', 'description', 'ip_address', 'is_on_campus', 'user_agent'],
+        format_row,
+    )
+
 @login_required
 @user_passes_test(is_admin)
 def teacher_detailed_activities(request):
@@ -420,13 +435,14 @@ def teacher_detailed_activities(request):
             grading_activities = all_activities.filter(activity_type='grade_exam')
             communication_activities = all_activities.filter(activity_type='send_message')
             
-            # Activity counts
+            # Activity counts from the hourly rollup
+            counts = activity_counts(filter_date, teacher_id=selected_teacher.id)
             context.update({
-                'attendance_count': attendance_activities.count(),
-                'assignment_count': assignment_activities.count(),
-                'grading_count': grading_activities.count(),
-                'message_count': communication_activities.count(),
-                'total_activities': all_activities.count(),
+                'attendance_count': counts.get('mark_attendance', 0),
+                'assignment_count': counts.get('create_assignment', 0),
+                'grading_count': counts.get('grade_exam', 0),
+                'message_count': counts.get('send_message', 0),
+                'total_activities': counts['total'],
                 
                 'attendance_activities': attendance_activities,
                 'assignment_activities': assignment_activities,
@@ -435,8 +451,8 @@ def teacher_detailed_activities(request):
             })
             
             # Calculate productivity metrics
-            educational_activities = attendance_activities.count() + assignment_activities.count() + grading_activities.count()
-            total_activities_count = all_activities.count()
+            educational_activities = context['attendance_count'] + context['assignment_count'] + context['grading_count']
+            total_activities_count = counts['total']
             
             if total_activities_count > 0:
                 educational_percentage = (educational_activities / total_activities_count) * 100
@@ -489,16 +505,14 @@ def teacher_activity_timeline(request):
     if selected_activity_type:
         activities = activities.filter(activity_type=selected_activity_type)
     
-    # Statistics
-    total_activities = activities.count()
-    attendance_activities = activities.filter(activity_type='mark_attendance').count()
-    assignment_activities = activities.filter(activity_type='create_assignment').count()
+    # Statistics from the hourly rollup
+    counts = activity_counts(filter_date, teacher_id=selected_teacher, activity_type=selected_activity_type)
+    total_activities = counts['total']
+    attendance_activities = counts.get('mark_attendance', 0)
+    assignment_activities = counts.get('create_assignment', 0)
     
     # Active teachers (last 30 minutes)
-    thirty_minutes_ago = timezone.now() - timedelta(minutes=30)
-    active_teachers = TeacherActivityLog.objects.filter(
-        timestamp__gte=thirty_minutes_ago
-    ).values('teacher').distinct().count()
+    active_teachers = online_teacher_count(30)
     
     # Pagination
     paginator = Paginator(activities, 20)
@@ -524,6 +538,91 @@ def teacher_activity_timeline(request):
     
     return render(request, 'attendance/teacher_activity_timeline.html', context)
 
+@login_required
+@user_passes_test(is_admin)
+def teacher_compliance_report(request):
+    """Monthly schedule compliance per teacher, with every scheduled slot for one selected teacher"""
+    today = timezone.now().date()
+    selected_month = request.GET.get('month', today.strftime('%Y-%m'))
+    selected_teacher = request.GET.get('teacher', '')
+    
+    try:
+        year, month = map(int, selected_month.split('-'))
+        month_start = date(year, month, 1)
+    except:
+        month_start = date(today.year, today.month, 1)
+        selected_month = month_start.strftime('%Y-%m')
+    
+    # Days that have not happened yet cannot be missed
+    month_end = date(month_start.year, month_start.month, monthrange(month_start.year, month_start.month)[1])
+    range_end = min(month_end, today)
+    
+    teachers = list(TeacherProfile.objects.select_related('user').order_by('user__first_name'))
+    compliance = get_compliance_engine(request)
+    
+    rows = []
+    slots = []
+    if month_start <= range_end:
+        compliance.load([teacher.id for teacher in teachers], month_start, range_end)
+        rows = [{'teacher': teacher, **compliance.summary(teacher.id, month_start, range_end)} for teacher in teachers]
+        
+        if selected_teacher.isdigit():
+            day = month_start
+            while day <= range_end:
+                slots.extend({'date': day, **slot} for slot in compliance.report(int(selected_teacher), day))
+                day += timedelta(days=1)
+    
+    if request.GET.get('export') == 'csv':
+        if selected_teacher.isdigit():
+            return stream_rows_csv(
+                request,
+                f'teacher_compliance_{selected_teacher}_{selected_month}.csv',
+                ['Date', 'Subject', 'Class', 'Scheduled Start', 'Scheduled End', 'Session Start',
+                 'Conducted', 'On Time', 'Delay (minutes)'],
+                ([
+                    slot['date'].strftime('%Y-%m-%d'),
+                    slot['schedule'].subject_assignment.subject.name,
+                    slot['schedule'].subject_assignment.class_assigned.name,
+                    slot['schedule'].start_time.strftime('%H:%M'),
+                    slot['schedule'].end_time.strftime('%H:%M'),
+                    slot['session'].start_time.strftime('%H:%M') if slot['session'] else '',
+                    'Yes' if slot['conducted'] else 'No',
+                    'Yes' if slot['on_time'] else 'No',
+                    slot['delay_minutes'] if slot['delay_minutes'] is not None else '',
+                ] for slot in slots)
+            )
+        
+        return stream_rows_csv(
+            request,
+            f'teacher_compliance_{selected_month}.csv',
+            ['Teacher', 'Employee ID', 'Scheduled', 'Conducted', 'Missed', 'On Time', 'Late',
+             'Average Delay (minutes)', 'Compliance %', 'Punctuality %'],
+            ([
+                row['teacher'].user.get_full_name(),
+                row['teacher'].employee_id,
+                row['scheduled'],
+                row['conducted'],
+                row['missed'],
+                row['on_time'],
+                row['late'],
+                row['average_delay'],
+                row['compliance_percentage'],
+                row['punctuality_percentage'],
+            ] for row in rows)
+        )
+    
+    context = {
+        'rows': rows,
+        'slots': slots,
+        'teachers': teachers,
+        'selected_teacher': selected_teacher,
+        'selected_month': selected_month,
+        'month_start': month_start,
+        'range_end': range_end,
+    }
+    
+    return render(request, 'attendance/teacher_compliance_report.html', context)
+
 @login_required
 @user_passes_test(is_admin)
 def manual_teacher_attendance(request):
@@ -582,4 +681,38 @@ def manual_teacher_attendance(request):
         'status_choices': TeacherAttendance.STATUS_CHOICES,
     }
     
-    return render(request, 'attendance/manual_teacher_attendance.html', context)
\ No newline at end of file
+    return render(request, 'attendance/manual_teacher_attendance.html', context)
+
+
+@login_required
+@user_passes_test(is_admin)
+def activity_rule_stats(request):
+    """Export the activity classification rules with their hit counters (for this server process)"""
+    stats = classifier_stats()
+    stats['definitions'] = [{
+        'name': activity_rule.name,
+        'url_names': list(activity_rule.url_names),
+        'methods': list(activity_rule.methods) or ['*'],
+        'activity_type': activity_rule.activity_type,
+        'priority_level': activity_rule.priority_level,
+    } for activity_rule in ACTIVITY_RULES]
+    return JsonResponse(stats)
+
+async def teacher_dashboard_events(request):
+    """Server-sent events that keep the teacher attendance dashboard live (ASGI only)"""
+    # login_required and user_passes_test are sync-only in this Django version
+    if not await sync_to_async(is_admin)(request.user):
+        return HttpResponseForbidden()
+    
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI every open stream would hold a worker thread. 204 tells
+        # EventSource not to reconnect, so the page keeps its periodic reload.
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(
+        get_live_board().stream(request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
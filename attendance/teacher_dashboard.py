@@ -0,0 +1,96 @@
+from collections import defaultdict
+from django.db.models import OuterRef, Subquery
+from accounts.models import TeacherProfile
+from academic.models import TeacherSubjectAssignment
+from .models import AttendanceSession, TeacherActivityLog
+
+# Activities that count as real work (see TeacherAttendance.has_performed_duties)
+SIGNIFICANT_ACTIVITIES = ['mark_attendance', 'create_assignment', 'grade_exam']
+
+# Activities listed as duties next to marked sessions (see TeacherAttendance.get_duties_performed)
+DUTY_ACTIVITIES = ['create_assignment', 'grade_exam', 'send_message']
+
+
+def build_teacher_day_rows(attendances, day):
+    """
+    Build the per-teacher rows of the teacher attendance dashboards for one day.
+
+    ``attendances`` are TeacherAttendance rows for ``day`` with ``teacher`` loaded.
+    Assignments, the day's sessions, the day's activities and each teacher's latest
+    activity are loaded with one query each and grouped by teacher in memory, so
+    the number of queries does not grow with the number of teachers.
+    """
+    teacher_ids = [attendance.teacher_id for attendance in attendances]
+
+    assignments = defaultdict(list)
+    for assignment in TeacherSubjectAssignment.objects.filter(
+        teacher_id__in=teacher_ids
+    ).select_related('subject', 'class_assigned__course'):
+        assignments[assignment.teacher_id].append(assignment)
+
+    sessions = defaultdict(list)
+    for session in AttendanceSession.objects.filter(
+        teacher_assignment__teacher_id__in=teacher_ids,
+        date=day
+    ).select_related('teacher_assignment__subject', 'teacher_assignment__class_assigned').order_by('start_time'):
+        sessions[session.teacher_assignment.teacher_id].append(session)
+
+    activities = defaultdict(list)
+    for activity in TeacherActivityLog.objects.filter(
+        teacher_id__in=teacher_ids,
+        timestamp__date=day,
+        activity_type__in=set(SIGNIFICANT_ACTIVITIES) | set(DUTY_ACTIVITIES)
+    ).order_by('timestamp'):
+        activities[activity.teacher_id].append(activity)
+
+    # Latest activity per teacher: one correlated subquery, then one lookup by id
+    latest_ids = dict(
+        TeacherProfile.objects.filter(id__in=teacher_ids).annotate(
+            last_log_id=Subquery(
+                TeacherActivityLog.objects.filter(teacher=OuterRef('pk')).order_by('-timestamp').values('id')[:1]
+            )
+        ).values_list('id', 'last_log_id')
+    )
+    latest_logs = TeacherActivityLog.objects.in_bulk([log_id for log_id in latest_ids.values() if log_id])
+
+    rows = []
+    for attendance in attendances:
+        teacher_sessions = sessions[attendance.teacher_id]
+        completed = [session for session in teacher_sessions if session.is_completed]
+        completed_assignment_ids = {session.teacher_assignment_id for session in completed}
+        teacher_activities = activities[attendance.teacher_id]
+
+        duties_performed = [{
+            'type': 'attendance',
+            'description': f"Marked attendance for {session.teacher_assignment.subject.name} - {session.teacher_assignment.class_assigned.name}",
+            'time': session.created_at.time() if session.created_at else None
+        } for session in completed]
+        duties_performed += [{
+            'type': activity.activity_type,
+            'description': activity.description,
+            'time': activity.timestamp.time()
+        } for activity in teacher_activities if activity.activity_type in DUTY_ACTIVITIES]
+
+        subjects_not_attended = [{
+            'subject': assignment.subject.name,
+            'class': assignment.class_assigned.name,
+            'assignment_id': assignment.id
+        } for assignment in assignments[attendance.teacher_id] if assignment.id not in completed_assignment_ids]
+
+        rows.append({
+            'attendance': attendance,
+            'subject_assignments': assignments[attendance.teacher_id],
+            'attendance_sessions': teacher_sessions,
+            'subjects_taught_today': len(teacher_sessions),
+            'classes_attended': len(completed),
+            'duties_performed': duties_performed,
+            'subjects_not_attended': subjects_not_attended,
+            'has_real_activities': bool(completed) or any(
+                activity.activity_type in SIGNIFICANT_ACTIVITIES for activity in teacher_activities
+            ),
+            'last_activity': latest_logs.get(latest_ids.get(attendance.teacher_id)),
+            'real_check_in': attendance.first_activity_time.time() if attendance.first_activity_time else None,
+            'real_check_out': attendance.last_activity_time.time() if attendance.last_activity_time else None,
+        })
+
+    return rows
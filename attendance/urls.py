@@ -9,20 +9,26 @@ urlpatterns = [
     path('mark/<int:session_id>/', views.mark_attendance_session, name='mark_attendance_session'),
     path('view/', views.view_attendance, name='view_attendance'),
     path('reports/', views.attendance_reports, name='attendance_reports'),
+    path('export/', views.export_attendance_records, name='export_attendance_records'),
     
     # Real Teacher Attendance Tracking
     path('real-teacher-attendance/', views.real_teacher_attendance, name='real_teacher_attendance'),
     
     # Teacher Attendance (Admin)
     path('teacher-dashboard/', teacher_admin_views.teacher_attendance_dashboard, name='teacher_attendance_dashboard'),
+    path('teacher-dashboard/events/', teacher_admin_views.teacher_dashboard_events, name='teacher_dashboard_events'),
     path('teacher-activities/', teacher_admin_views.teacher_detailed_activities, name='teacher_detailed_activities'),
     path('teacher-timeline/', teacher_admin_views.teacher_activity_timeline, name='teacher_activity_timeline'),
     path('teacher-reports/', teacher_admin_views.teacher_attendance_reports, name='teacher_attendance_reports'),
     path('teacher-export/', teacher_admin_views.export_teacher_attendance, name='export_teacher_attendance'),
+    path('teacher-compliance/', teacher_admin_views.teacher_compliance_report, name='teacher_compliance_report'),
     path('teacher-activity/', teacher_admin_views.teacher_activity_logs, name='teacher_activity_logs'),
+    path('teacher-activity-export/', teacher_admin_views.export_teacher_activity_logs, name='export_teacher_activity_logs'),
     path('manual-teacher/', teacher_admin_views.manual_teacher_attendance, name='manual_teacher_attendance'),
+    path('activity-rules/', teacher_admin_views.activity_rule_stats, name='activity_rule_stats'),
     
     # AJAX endpoints
     path('ajax/get-students/', views.get_students_for_assignment, name='get_students_ajax'),
     path('ajax/save-attendance/', views.save_attendance_ajax, name='save_attendance_ajax'),
+    path('ajax/sync-attendance/', views.sync_attendance_batch_ajax, name='sync_attendance_batch'),
 ]
\ No newline at end of file
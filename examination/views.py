@@ -6,7 +6,7 @@ from django.utils import timezone
 from .models import Examination, ExamResult, ExamType
 from .forms import ExaminationForm, ExamResultForm
 from accounts.models import StudentProfile, TeacherProfile
-from academic.models import StudentEnrollment
+from academic.roster import get_class_roster
 
 def is_teacher_or_admin(user):
     return user.is_authenticated and user.user_type in ['admin', 'teacher']
@@ -51,16 +51,15 @@ def result_list(request):
     if request.user.user_type == 'student':
         # Check fee payment status first
         from fees.models import StudentFee
-        unpaid_fees = StudentFee.objects.filter(
-            student=request.user.student_profile,
-            payment_status__in=['pending', 'partial', 'overdue']
-        ).select_related('fee_structure')
-        
-        has_unpaid_fees = unpaid_fees.exists()
-        total_unpaid_amount = sum(fee.balance_amount for fee in unpaid_fees)
+        from fees.balances import get_fee_balance, UNPAID_STATUSES
+        total_unpaid_amount, unpaid_count = get_fee_balance(request.user.student_profile.id)
         
         # If fees are unpaid, show warning and restrict access
-        if has_unpaid_fees:
+        if unpaid_count:
+            unpaid_fees = StudentFee.objects.filter(
+                student=request.user.student_profile,
+                payment_status__in=UNPAID_STATUSES
+            ).select_related('fee_structure')
             context = {
                 'has_unpaid_fees': True,
                 'unpaid_fees': unpaid_fees,
@@ -256,20 +255,16 @@ def enter_results(request, exam_id):
         return redirect('examination:exam_list')
     
     # Get students enrolled in the exam's class
-    enrollments = StudentEnrollment.objects.filter(
-        class_enrolled=exam.class_for,
-        is_active=True
-    ).select_related('student__user')
+    roster = get_class_roster(exam.class_for_id)
     
     # Get existing results
     existing_results = {}
     for result in ExamResult.objects.filter(examination=exam):
-        existing_results[result.student.id] = result
+        existing_results[result.student_id] = result
     
     if request.method == 'POST':
         results_saved = 0
-        for enrollment in enrollments:
-            student = enrollment.student
+        for student in roster:
             marks_key = f'marks_{student.id}'
             remarks_key = f'remarks_{student.id}'
             
@@ -292,7 +287,7 @@ def enter_results(request, exam_id):
                     # Create or update result
                     result, created = ExamResult.objects.get_or_create(
                         examination=exam,
-                        student=student,
+                        student_id=student.id,
                         defaults={
                             'marks_obtained': marks,
                             'remarks': remarks,
@@ -316,10 +311,10 @@ def enter_results(request, exam_id):
     
     # Prepare student data with existing results
     students_data = []
-    for enrollment in enrollments:
-        existing_result = existing_results.get(enrollment.student.id)
+    for student in roster:
+        existing_result = existing_results.get(student.id)
         students_data.append({
-            'student': enrollment.student,
+            'student': student,
             'existing_marks': existing_result.marks_obtained if existing_result else '',
             'existing_remarks': existing_result.remarks if existing_result else ''
         })
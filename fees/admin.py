@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django import forms
 from django.db import models
-from .models import FeeStructure, StudentFee, FeePayment, FeeWaiver
+from .models import FeeStructure, StudentFee, FeePayment, FeeWaiver, StudentFeeBalance
+from .balances import refresh_fee_balances
 from accounts.models import User, StudentProfile
 
 
@@ -183,6 +184,8 @@ class StudentFeeAdmin(admin.ModelAdmin):
     
     def mark_as_paid(self, request, queryset):
         updated = queryset.update(payment_status='paid', amount_paid=models.F('amount_due'))
+        # update() sends no signals, so refresh the outstanding balances here
+        refresh_fee_balances(queryset.values_list('student_id', flat=True))
         self.message_user(request, f'{updated} fee records marked as paid.')
     mark_as_paid.short_description = 'Mark selected fees as paid'
     
@@ -216,3 +219,17 @@ class FeeWaiverAdmin(admin.ModelAdmin):
     def student_name(self, obj):
         return obj.student_fee.student.user.get_full_name()
     student_name.short_description = 'Student'
+
+
+@admin.register(StudentFeeBalance)
+class StudentFeeBalanceAdmin(admin.ModelAdmin):
+    list_display = ('student_name', 'outstanding_amount', 'unpaid_fee_count', 'updated_at')
+    search_fields = ('student__user__first_name', 'student__user__last_name', 'student__student_id')
+    readonly_fields = ('student', 'outstanding_amount', 'unpaid_fee_count', 'updated_at')
+    
+    def has_add_permission(self, request):
+        return False  # rows are maintained from the student fees
+    
+    def student_name(self, obj):
+        return obj.student.user.get_full_name()
+    student_name.short_description = 'Student'
@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from accounts.dashboard_cache import bump_dashboard_versions
+from .models import StudentFee, StudentFeeBalance
+
+# Fees a student still owes money on
+UNPAID_STATUSES = ['pending', 'partial', 'overdue']
+
+# StudentFee.balance_amount as a database expression, for filtering and summing in SQL
+BALANCE = F('amount_due') + F('late_fee_charged') - F('amount_paid') - F('discount_amount')
+
+
+def outstanding_by_student(student_ids=None):
+    """{student_id: (outstanding amount, unpaid fee count)} counted from StudentFee"""
+    fees = StudentFee.objects.filter(payment_status__in=UNPAID_STATUSES)
+    if student_ids is not None:
+        fees = fees.filter(student_id__in=student_ids)
+    return {
+        student_id: (outstanding, count)
+        for student_id, outstanding, count in fees.values_list('student_id').annotate(
+            outstanding=Sum(BALANCE), count=Count('id')
+        ).order_by()
+    }
+
+
+def refresh_fee_balances(student_ids=None):
+    """
+    Recompute the StudentFeeBalance rows of these students (every student when
+    None) from their unpaid fees. Students who owe nothing have no row.
+    """
+    if student_ids is not None:
+        student_ids = set(student_ids)
+        if not student_ids:
+            return
+    outstanding = outstanding_by_student(student_ids)
+
+    with transaction.atomic():
+        stale = StudentFeeBalance.objects.exclude(student_id__in=outstanding)
+        if student_ids is not None:
+            stale = stale.filter(student_id__in=student_ids)
+        stale.delete()
+
+        if outstanding:
+            StudentFeeBalance.objects.bulk_create(
+                [StudentFeeBalance(student_id=student_id, outstanding_amount=amount, unpaid_fee_count=count)
+                 for student_id, (amount, count) in outstanding.items()],
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=['outstanding_amount', 'unpaid_fee_count', 'updated_at'],
+            )
+
+    # Also reached after bulk updates that send no signals, so cached dashboards learn about them here
+    bump_dashboard_versions('fees')
+
+
+def get_fee_balance(student_id):
+    """(outstanding amount, unpaid fee count) of one student, from the ledger"""
+    row = StudentFeeBalance.objects.filter(student_id=student_id).values_list(
+        'outstanding_amount', 'unpaid_fee_count'
+    ).first()
+    return row or (0, 0)
+
+
+def class_fee_balances(class_id):
+    """{student_id: StudentFeeBalance} of the active students of a class who owe fees"""
+    return {
+        balance.student_id: balance
+        for balance in StudentFeeBalance.objects.filter(
+            student__studentenrollment__class_enrolled_id=class_id,
+            student__studentenrollment__is_active=True
+        )
+    }
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_balances(apps, schema_editor):
+    """Start the ledger from the current unpaid fees (fees.balances.refresh_fee_balances() does the same later)"""
+    StudentFee = apps.get_model('fees', 'StudentFee')
+    StudentFeeBalance = apps.get_model('fees', 'StudentFeeBalance')
+    balance = models.F('amount_due') + models.F('late_fee_charged') - models.F('amount_paid') - models.F('discount_amount')
+    rows = StudentFee.objects.filter(
+        payment_status__in=['pending', 'partial', 'overdue']
+    ).values_list('student_id').annotate(outstanding=models.Sum(balance), count=models.Count('id')).order_by()
+    StudentFeeBalance.objects.bulk_create([
+        StudentFeeBalance(student_id=student_id, outstanding_amount=outstanding, unpaid_fee_count=count)
+        for student_id, outstanding, count in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_institutioncounter'),
+        ('fees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeeBalance',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fee_balance', serialize=False, to='accounts.studentprofile')),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('unpaid_fee_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
@@ -238,3 +238,14 @@ class FeeWaiver(models.Model):
         
         self.student_fee.discount_amount = total_waiver
         self.student_fee.update_payment_status()
+
+
+class StudentFeeBalance(models.Model):
+    """Outstanding fee balance per student, kept current by fees.signals"""
+    student = models.OneToOneField(StudentProfile, on_delete=models.CASCADE, primary_key=True, related_name='fee_balance')
+    outstanding_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    unpaid_fee_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.student} - {self.outstanding_amount}"
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models import Sum
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from academic.models import StudentEnrollment
-from .models import FeeStructure, StudentFee
+from .balances import refresh_fee_balances
+from .models import FeeStructure, StudentFee, FeePayment, FeeWaiver
 
 
 @receiver(post_save, sender=StudentEnrollment)
@@ -39,3 +41,40 @@ def update_student_fee_on_enrollment_change(sender, instance, created, **kwargs)
         if not instance.is_active:
             # You can add logic here to handle fee records when enrollment is deactivated
             pass
+
+
+@receiver(post_save, sender=StudentFee)
+@receiver(post_delete, sender=StudentFee)
+def refresh_balance_on_fee_change(sender, instance, **kwargs):
+    """
+    Keep the student's outstanding balance current. FeePayment and FeeWaiver
+    saves land here too, through the StudentFee.save() they end with.
+    """
+    refresh_fee_balances([instance.student_id])
+
+
+@receiver(post_delete, sender=FeePayment)
+def reverse_payment_on_delete(sender, instance, **kwargs):
+    """
+    Take a removed payment back off its fee, so the balance owed goes up again
+    """
+    student_fee = StudentFee.objects.filter(pk=instance.student_fee_id).first()
+    if student_fee is None:
+        return  # the fee itself is being deleted
+    student_fee.amount_paid = max(student_fee.amount_paid - instance.amount, 0)
+    student_fee.update_payment_status()
+
+
+@receiver(post_delete, sender=FeeWaiver)
+def recalculate_discount_on_waiver_delete(sender, instance, **kwargs):
+    """
+    Recompute the fee discount from the waivers left, as FeeWaiver.save() does
+    """
+    student_fee = StudentFee.objects.filter(pk=instance.student_fee_id).first()
+    if student_fee is None:
+        return  # the fee itself is being deleted
+    student_fee.discount_amount = FeeWaiver.objects.filter(
+        student_fee=student_fee,
+        is_active=True
+    ).aggregate(Sum('amount'))['amount__sum'] or 0
+    student_fee.update_payment_status()
@@ -6,6 +6,7 @@ from django.http import JsonResponse
 from .models import Notification, NotificationRead
 from .forms import NotificationForm, QuickNotificationForm
 from accounts.models import User
+from accounts.api_etags import conditional_api, unread_count_etag
 
 def can_send_notifications(user):
     return user.is_authenticated and user.user_type in ['admin', 'teacher']
@@ -110,6 +111,7 @@ def mark_as_read(request, notification_id):
     return redirect('notifications:notification_list')
 
 @login_required
+@conditional_api('unread_count', unread_count_etag)
 def get_unread_count(request):
     """API endpoint to get unread notification count for current user"""
     unread_count = Notification.objects.filter(
@@ -3,6 +3,11 @@ ASGI config for student_management_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this module (e.g. ``uvicorn student_management_system.asgi:application``)
+for the live teacher attendance dashboard: its server-sent events endpoint
+(attendance:teacher_dashboard_events) holds one connection per viewer, which is
+cheap on an event loop but would tie up a worker thread each under WSGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
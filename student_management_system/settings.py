@@ -156,3 +156,41 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CSRF_TRUSTED_ORIGINS = [
     "http://192.168.18.169:8000",
 ]
+
+# Teacher attendance tracking
+# When enabled, EnhancedTeacherAttendanceMiddleware buffers teacher activity in memory
+# and a background thread writes it in bulk every TEACHER_ATTENDANCE_FLUSH_INTERVAL seconds.
+TEACHER_ATTENDANCE_WRITE_BEHIND = False
+TEACHER_ATTENDANCE_FLUSH_INTERVAL = 10  # seconds
+# When a flush fails (e.g. "database is locked") the batch stays buffered and the retry
+# interval doubles, up to this many seconds.
+TEACHER_ATTENDANCE_MAX_FLUSH_DELAY = 300
+# A batch that fails this many flushes in a row is dropped (and reported) so it can't
+# block everything queued behind it.
+TEACHER_ATTENDANCE_FLUSH_RETRIES = 5
+# At most this many activity events are buffered per process; the oldest are dropped first.
+TEACHER_ATTENDANCE_BUFFER_LIMIT = 10000
+
+# Teacher activity logs older than archive_teacher_activity --days are written here as
+# compressed per-month CSV files before being deleted from the database.
+TEACHER_ACTIVITY_ARCHIVE_DIR = BASE_DIR / 'archives' / 'teacher_activity'
+
+# Largest number of sessions accepted by one offline attendance sync request
+ATTENDANCE_SYNC_MAX_SESSIONS = 200
+
+# Seconds a cached class roster is kept. Rosters are invalidated when enrollments or student
+# names change, but with the default per-process cache other processes only notice after this.
+ROSTER_CACHE_TIMEOUT = 300
+
+# Live teacher attendance dashboard (server-sent events, needs an ASGI server).
+# Each server process polls today's rows once per interval, however many admins are watching.
+LIVE_BOARD_POLL_INTERVAL = 2
+LIVE_BOARD_STREAM_SECONDS = 300
+
+# Seconds a cached dashboard widget is kept. Widgets are invalidated by version bumps on
+# attendance, coursework, result, fee and notification writes; this bounds everything else.
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds an ETag of the polled JSON APIs (profile, teacher stats, unread count) can stay
+# valid. ETags change on version bumps; this bounds changes another process never saw.
+API_ETAG_MAX_AGE = 300